@@ -1,15 +1,23 @@
 # System libraries
 import time
+import math
+import random
+import multiprocessing
 # Third party libraries
+import numpy
 import networkx as nx
 # Our libraries
 import input_controls as inc
 import graph_topologies as gt
 import graph_traffic_matrix as tm
 import ltd_utilities as ltd
+import flow_utilities as flows
+import shared_arrays as sa
+import kernels
+import decision_trace as dt
 
 
-def LTD_random(n, n_edges, delta_in, delta_out, traffic_matrix, title = 'Random LTD - Comparisons', userView = True, withLabels = True):
+def LTD_random(n, n_edges, delta_in, delta_out, traffic_matrix, title = 'Random LTD - Comparisons', userView = True, withLabels = True, routing = 'water_fill', seed = None):
 	'''
 	This function solves the LTD problem generating a random topology, according to the input specified criteria:
 	- "n" is the number of nodes
@@ -20,6 +28,8 @@ def LTD_random(n, n_edges, delta_in, delta_out, traffic_matrix, title = 'Random
 	- title: graph's title and output files names (.txt e .png)
 	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
 	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- seed: if specified, seed of the random generator of the topology (see "graph_topologies.random_topology")
 	'''
 	# INPUT CONTROL
 	# n, delta_in, delta_out and traffic_matrix
@@ -31,12 +41,12 @@ def LTD_random(n, n_edges, delta_in, delta_out, traffic_matrix, title = 'Random
 	# Computation starting time
 	initial_time = time.time()
 	# Create the topology (oriented random graph)
-	T = gt.random_topology(n, n_edges, delta_in, delta_out)
+	T = gt.random_topology(n, n_edges, delta_in, delta_out, seed)
 	# Result
-	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Random')
+	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Random', routing = routing)
 
 
-def greedy_LTD_mesh(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 1 - Mesh LTD', userView = True, withLabels = True):
+def greedy_LTD_mesh(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 1 - Mesh LTD', userView = True, withLabels = True, batch_size = 1, seed = None, perturbation = 0.05, routing = 'water_fill', trace = None):
 	'''
 	This function generates a network topolgy in order to solve, using a greedy approach, an LTD problem.
 	Input parameters are:
@@ -47,10 +57,41 @@ def greedy_LTD_mesh(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 1 - Me
 	- title: graph's title and output files names (.txt e .png)
 	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
 	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- batch_size: maximum number of edges removed at once; every batch is verified with a single strong
+	  connectivity check (bisecting the batch if it fails). With 1, edges are removed one by one; the resulting
+	  topology does not depend on the batch size
+	- seed: if specified, edges' flow values are randomly perturbed before being sorted (randomized tie-breaking)
+	- perturbation: maximum relative perturbation of the flow values, used only if "seed" is specified
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- trace: if specified, path of a log file in which every decision of the algorithm is recorded (see
+	  "decision_trace.DecisionTrace"); "python decision_trace.py <trace>" replays it
 	'''
 	# INPUT CONTROL
 	ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	inc.check_integer(batch_size, 'batch_size', minValue = 1)
+	inc.check_number(perturbation, 'perturbation', minValue = 0)
 
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	# Print on the screen the traffic matrix content
+	tm.print_TM(traffic_matrix)
+	print('\nPlease wait...')
+	if trace is None:
+		T = greedy_mesh_topology(n, traffic_matrix, delta_in, delta_out, batch_size, seed, perturbation)
+	else:
+		with dt.DecisionTrace(trace) as log:
+			T = greedy_mesh_topology(n, traffic_matrix, delta_in, delta_out, batch_size, seed, perturbation, log)
+	# Result
+	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Mesh', routing = routing)
+
+
+def greedy_mesh_topology(n, traffic_matrix, delta_in, delta_out, batch_size = 1, seed = None, perturbation = 0.05, trace = None):
+	'''
+	This function computes the topology of "greedy_LTD_mesh" (same parameters), without routing the traffic:
+	starting from a full mesh, edges are removed by increasing flow value until the delta constraints are satisfied.
+	If specified, the decisions are recorded into "trace" (see "decision_trace.DecisionTrace")
+	'''
 	# UTILITY FUNCTIONS
 	def edges_to_check(n, traffic_matrix):
 		'''
@@ -67,14 +108,12 @@ def greedy_LTD_mesh(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 1 - Me
 				'edge': e,
 				'flow': f
 			})
-		edges_to_check.sort(key = lambda x: x['flow'])
+		perturbed_sort(edges_to_check, seed, perturbation)
 		return edges_to_check
 
-	# ALGORITHM
-	# Computation starting time
-	initial_time = time.time()
-	# Print on the screen the traffic matrix content
-	tm.print_TM(traffic_matrix)
+	if trace is not None:
+		trace.record('start', algorithm = 'mesh', n = n, delta_in = delta_in, delta_out = delta_out, batch_size = batch_size,
+			seed = seed, perturbation = perturbation, ring = delta_in == 1 or delta_out == 1)
 	# If one of the deltas is equal to 1, I know for sure that the resulting topology has to be a ring
 	if delta_in == 1 or delta_out == 1:
 		T = gt.ring_topology(n)
@@ -87,27 +126,68 @@ def greedy_LTD_mesh(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 1 - Me
 		# OPTIMIZE THE TOPOLOGY
 		# Noe, I have to remove edges until the delta contraints are satisfied 
 		# BUT: I could find edges impossible to remove...
-		print('\nPlease wait...')
-		while (not ltd.check_global_delta_constraints(T, delta_in, delta_out)) and len(edges_to_check) > 0:
+		while batch_size > 1 and (not ltd.check_global_delta_constraints(T, delta_in, delta_out)) and len(edges_to_check) > 0:
+			# Input/output degrees of the nodes, as they will be once the batch is removed
+			in_deg = T.in_degree()
+			out_deg = T.out_degree()
+			# Collect the lowest flow edges whose removal is required by the delta constraints. An edge is skipped
+			# only if it is not required with the real degrees (empty batch): otherwise the batch ends before it,
+			# since the removal of the batch could fail, so the result is the same of the edge-by-edge removal
+			batch = []
+			while len(batch) < batch_size and len(edges_to_check) > 0:
+				u, v = edges_to_check[0]['edge']
+				if out_deg[u] > delta_out or in_deg[v] > delta_in:
+					edges_to_check.pop(0)
+					batch.append((u, v))
+					out_deg[u] -= 1
+					in_deg[v] -= 1
+				elif len(batch) == 0:
+					edges_to_check.pop(0)
+					if trace is not None:
+						trace.record('skip', (u, v))
+				else:
+					break
+			# Remove the whole batch, keeping the graph connected
+			removed = gt.remove_edges_batch(T, batch)
+			if trace is not None:
+				removed = set(removed)
+				for e in batch:
+					trace.record('remove' if e in removed else 'reject', e)
+		# Input/output degrees of the nodes, and number of nodes violating the delta constraints (updated at every removal)
+		in_deg = T.in_degree()
+		out_deg = T.out_degree()
+		violating = lambda x: in_deg[x] > delta_in or out_deg[x] > delta_out
+		violations = len(filter(violating, T.nodes()))
+		while violations > 0 and len(edges_to_check) > 0:
 			# The edge I try to remove first is the one with minimum flow value
 			edge_to_remove = edges_to_check.pop(0)['edge']
 			# Nodes of the selected edge
 			u = edge_to_remove[0]
 			v = edge_to_remove[1]
 			# Analyzing the delta constraint on "u" and "v", I could find that it is not necessary to remove this edge
-			u_out_degree = T.out_degree()[u]
-			v_in_degree = T.in_degree()[v]
 			# Check if I really need to remove the edge
-			if u_out_degree > delta_out or v_in_degree > delta_in:
+			if out_deg[u] > delta_out or in_deg[v] > delta_in:
 				# Verify that, once the edge is removed, the resulting graph will not be disconnected
 				if gt.has_alternative_paths(T, edge_to_remove):
 					# I can remove the selected edge
 					T.remove_edge(u, v)
+					violations -= violating(u) + violating(v)
+					out_deg[u] -= 1
+					in_deg[v] -= 1
+					violations += violating(u) + violating(v)
+					if trace is not None:
+						trace.record('remove', (u, v))
+				elif trace is not None:
+					trace.record('reject', (u, v))
+			elif trace is not None:
+				trace.record('skip', (u, v))
+	if trace is not None:
+		trace.record('end', edges = len(T.edges()))
 	# Result
-	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Mesh')
+	return T
 
 
-def greedy_LTD_ring(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 2 - Ring LTD', userView = True, withLabels = True):
+def greedy_LTD_ring(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 2 - Ring LTD', userView = True, withLabels = True, seed = None, perturbation = 0.05, routing = 'water_fill'):
 	'''
 	This function computes a network topology in order to solve, using a greedy approach, an LTD problem.
 	With respect to the function "greedy_LTD_mesh", here the starting topology is a ring: the idea is to add edges
@@ -121,10 +201,30 @@ def greedy_LTD_ring(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 2 - Ri
 	- title: graph's title and output files names (.txt e .png)
 	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
 	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- seed: if specified, edges' flow values are randomly perturbed before being sorted (randomized tie-breaking)
+	- perturbation: maximum relative perturbation of the flow values, used only if "seed" is specified
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
 	'''
 	# INPUT CONTROL
 	ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	inc.check_number(perturbation, 'perturbation', minValue = 0)
 
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	# Print on screen the content of the traffic matrix
+	tm.print_TM(traffic_matrix)
+	print('\nPlease wait...')
+	T = greedy_ring_topology(n, traffic_matrix, delta_in, delta_out, seed, perturbation)
+	# Result
+	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Ring', routing = routing)
+
+
+def greedy_ring_topology(n, traffic_matrix, delta_in, delta_out, seed = None, perturbation = 0.05):
+	'''
+	This function computes the topology of "greedy_LTD_ring" (same parameters), without routing the traffic:
+	starting from a ring, edges are added by decreasing flow value while the delta constraints allow it
+	'''
 	# UTILITY FUNCTIONS
 	def edges_to_check(G, traffic_matrix):
 		'''
@@ -132,7 +232,7 @@ def greedy_LTD_ring(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 2 - Ri
 		'''
 		res = []
 		nodes = G.nodes()
-		edges = G.edges()
+		edges = set(G.edges())
 		# Loop on the traffic matrix values
 		for u in nodes:
 			for v in nodes:
@@ -148,41 +248,18 @@ def greedy_LTD_ring(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 2 - Ri
 							'flow': f
 						})
 		# Sort by decreasing fow value
-		res.sort(key = lambda x: x['flow'], reverse = True)
+		perturbed_sort(res, seed, perturbation, reverse = True)
 		# Result
 		return res
 
-	def check_can_add_edges(G, delta_in, delta_out):
+	def check_can_add_edges(free_in, free_out):
 		'''
 		This function verify that exist at least 2 nodes, different each other, having at least
-		a free receiver and a free transmitter
-		'''		
-		# Input/output degree of the graph's nodes
-		in_deg = G.in_degree()
-		out_deg = G.out_degree()
-		# Graph's nodes
-		nodes = G.nodes()
-		# Check the delta_in constraint
-		res_ok = False
-		for x in nodes:
-			if in_deg[x] < delta_in:
-				# I've found a node with a free receiver
-				# Check now the delta_out constraint
-				for y in nodes:
-					if y != x and out_deg[y] < delta_out:
-						# I've found another node with a free transmitter
-						res_ok = True
-						break
-				if res_ok:
-					break
-		# Result
-		return res_ok
+		a free receiver and a free transmitter ("free_in" and "free_out" are the sets of nodes with
+		a free receiver and a free transmitter)
+		'''
+		return len(free_in) > 0 and len(free_out) > 0 and not (len(free_in) == 1 and free_in == free_out)
 
-	# ALGORITHM
-	# Computation starting time
-	initial_time = time.time()
-	# Print on screen the content of the traffic matrix
-	tm.print_TM(traffic_matrix)
 	# The starting topology is a ring
 	T = gt.ring_topology(n)
 	# If one of the delta constraints is equal to 1, I know for sure that the resulting topology will be the starting one
@@ -190,27 +267,350 @@ def greedy_LTD_ring(n, traffic_matrix, delta_in, delta_out, title = 'Sol. 2 - Ri
 		# Graph's edges, serted by decreasing flow values
 		edges_to_check = edges_to_check(T, traffic_matrix)
 
+		# Input/output degrees of the nodes, and nodes with a free receiver/transmitter (updated at every addition)
+		in_deg = T.in_degree()
+		out_deg = T.out_degree()
+		free_in = set(x for x in T.nodes() if in_deg[x] < delta_in)
+		free_out = set(x for x in T.nodes() if out_deg[x] < delta_out)
+
 		# OPTIMIZE THE TOPOLOGY
 		# Now, I have to add edges until the delta constraints allow me to do that 
 		# BUT: I could find edges impossible to add...
-		print('\nPlease wait...')
-		while check_can_add_edges(T, delta_in, delta_out) and len(edges_to_check) > 0:
+		while check_can_add_edges(free_in, free_out) and len(edges_to_check) > 0:
 			# The edge I'm going to try to add is the one with the least associated flow value
 			edge_to_add = edges_to_check.pop(0)['edge']
 			# Nodes of the selected edge
 			u = edge_to_add[0]
 			v = edge_to_add[1]
 			# Check if the selected edge can be added to the topology
-			u_out_degree = T.out_degree()[u]
-			v_in_degree = T.in_degree()[v]
-			if u_out_degree < delta_out and v_in_degree < delta_in:
+			if out_deg[u] < delta_out and in_deg[v] < delta_in:
 				# Add the selected edge
 				T.add_edge(u, v, flow = 0.0)
+				out_deg[u] += 1
+				in_deg[v] += 1
+				if out_deg[u] == delta_out:
+					free_out.discard(u)
+				if in_deg[v] == delta_in:
+					free_in.discard(v)
+	# Result
+	return T
+
+
+def perturbed_sort(edges, seed = None, perturbation = 0.05, reverse = False):
+	'''
+	This function sorts a list of candidate edges ({'edge', 'flow'} dictionaries) by their flow value.
+	If a "seed" is specified, every flow value is multiplied by a random factor in [1 - perturbation, 1 + perturbation]
+	before sorting, in order to randomly break ties between (near-)equal flow values
+	'''
+	if seed is None:
+		edges.sort(key = lambda x: x['flow'], reverse = reverse)
+	else:
+		rnd = random.Random(seed)
+		keys = dict((x['edge'], x['flow'] * (1 + rnd.uniform(-perturbation, perturbation))) for x in edges)
+		edges.sort(key = lambda x: keys[x['edge']], reverse = reverse)
+
+
+def multistart_LTD(approach, n, traffic_matrix, delta_in, delta_out, runs = 8, processes = None, seed = 0, perturbation = 0.05, title = 'Multistart LTD', userView = True, withLabels = True):
+	'''
+	This function runs several randomized variants of a greedy LTD algorithm (see "perturbed_sort") across a pool
+	of processes, and returns the best obtained topology (the one with the lowest max flow).
+	The first run is the non-randomized one, so the result is never worse than the plain greedy solution.
+
+	Input parameters are:
+	- approach: greedy algorithm to use, 'mesh' ("greedy_LTD_mesh") or 'ring' ("greedy_LTD_ring")
+	- n: number of nodes
+	- traffic_matrix: traffic matrix (mean traffic value exchanged by node pairs)
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- runs: number of runs
+	- processes: number of worker processes (default: number of CPUs; with 1, runs are executed sequentially)
+	- seed: seed of the first randomized run (the following ones use "seed + 1", "seed + 2"...)
+	- perturbation: maximum relative perturbation of the flow values
+	- title: graph's title and output files names (.txt e .png)
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	The result has, in addition, the key "max_flows" with the max flow values of every run (None for failed runs)
+	'''
+	# INPUT CONTROL
+	if approach not in ('mesh', 'ring'):
+		raise ValueError('the parameter "approach" must be \'mesh\' or \'ring\'')
+	ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	inc.check_integer(runs, 'runs', minValue = 1)
+	if processes is not None:
+		inc.check_integer(processes, 'processes', minValue = 1)
+	inc.check_integer(seed, 'seed')
+	inc.check_number(perturbation, 'perturbation', minValue = 0)
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	# Print on screen the content of the traffic matrix
+	tm.print_TM(traffic_matrix)
+	print('\nPlease wait...')
+	# Parameters of the runs: the traffic matrix is shared with the workers (see "shared_arrays")
+	seeds = [None] + [seed + i for i in range(runs - 1)]
+	with sa.SharedArrays({'traffic_matrix': numpy.array(traffic_matrix, dtype = float)}) as shared:
+		jobs = [(approach, n, shared.name, delta_in, delta_out, s, perturbation) for s in seeds]
+		if processes == 1:
+			results = [multistart_run(j) for j in jobs]
+		else:
+			pool = multiprocessing.Pool(processes)
+			try:
+				results = pool.map(multistart_run, jobs)
+			finally:
+				pool.close()
+				pool.join()
+	# Select the best topology
+	max_flows = [f for (edges, f) in results]
+	valid = [r for r in results if r[1] is not None]
+	if len(valid) == 0:
+		print('ERR - %s multistart solution not found!' % (approach.capitalize()))
+		return None
+	edges = min(valid, key = lambda x: x[1])[0]
+	T = gt.topology_from_edges(range(n), edges)
+	# Result
+	res = ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Multistart %s' % (approach))
+	if res is not None:
+		res['max_flows'] = max_flows
+	return res
+
+
+def multistart_run(job):
+	'''
+	Single run of "multistart_LTD", executed by a worker process: it returns the edges of the obtained topology
+	and its max flow (None, if the topology does not satisfy the delta constraints)
+	'''
+	approach, n, name, delta_in, delta_out, seed, perturbation = job
+	# Traffic matrix, shared by "multistart_LTD"
+	traffic_matrix = sa.attach(name)['traffic_matrix']
+	if approach == 'mesh':
+		T = greedy_mesh_topology(n, traffic_matrix, delta_in, delta_out, seed = seed, perturbation = perturbation)
+	else:
+		T = greedy_ring_topology(n, traffic_matrix, delta_in, delta_out, seed = seed, perturbation = perturbation)
+	# Check the validity of the solution
+	if not ltd.check_global_delta_constraints(T, delta_in, delta_out):
+		return (T.edges(), None)
+	T = flows.complete_water_fill(T, traffic_matrix)
+	if T is None:
+		return ([], None)
+	return (T.edges(), float(flows.max_flow(T)[0]))
+
+
+def robust_LTD(approach, n, traffic_matrices, delta_in, delta_out, percentile = 100, routing = 'water_fill', title = 'Robust LTD', userView = True, withLabels = True):
+	'''
+	This function designs a single topology for a set of traffic matrices, minimizing the worst case (or the specified
+	percentile) of their max flow values. Candidate topologies are computed by a greedy LTD algorithm for the
+	element-wise mean, maximum and percentile of the traffic matrices, and for every traffic matrix; every candidate
+	is then evaluated routing all the traffic matrices at once ("flow_utilities.route_many").
+
+	Input parameters are:
+	- approach: greedy algorithm to use, 'mesh' ("greedy_LTD_mesh") or 'ring' ("greedy_LTD_ring")
+	- n: number of nodes
+	- traffic_matrices: list of traffic matrices
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- percentile: percentile of the max flow values to minimize (100 is the worst case)
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- title: graph's title and output files names (.txt e .png)
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	The returned topology is routed with the traffic matrix at the requested percentile; the result has, in addition,
+	the key "max_flows" with the max flow values of every traffic matrix
+	'''
+	# INPUT CONTROL
+	if approach not in ('mesh', 'ring'):
+		raise ValueError('the parameter "approach" must be \'mesh\' or \'ring\'')
+	if len(traffic_matrices) == 0:
+		raise ValueError('the parameter "traffic_matrices" must contain at least a traffic matrix')
+	for traffic_matrix in traffic_matrices:
+		ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	inc.check_number(percentile, 'percentile', minValue = 0, maxValue = 100)
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	print('\nPlease wait...')
+	# Traffic matrices to use for the candidate topologies
+	stack = numpy.array(traffic_matrices, dtype = float)
+	aggregates = [stack.mean(axis = 0), stack.max(axis = 0), numpy.percentile(stack, percentile, axis = 0)]
+	candidate_matrices = [x.tolist() for x in aggregates] + list(traffic_matrices)
+	# Index of the traffic matrix at the requested percentile, once sorted by max flow
+	position = int(round(percentile / 100.0 * (len(traffic_matrices) - 1)))
+	# Evaluate the candidates
+	best = None
+	evaluated = set()
+	for cm in candidate_matrices:
+		if approach == 'mesh':
+			T = greedy_mesh_topology(n, cm, delta_in, delta_out)
+		else:
+			T = greedy_ring_topology(n, cm, delta_in, delta_out)
+		# Skip unfeasible and already evaluated topologies
+		key = frozenset(T.edges())
+		if key in evaluated or not ltd.check_global_delta_constraints(T, delta_in, delta_out):
+			continue
+		evaluated.add(key)
+		# Route every traffic matrix at once
+		routed = flows.route_many(T, traffic_matrices, routing)
+		if routed is None:
+			continue
+		max_flows = routed[1].max(axis = 1)
+		ranking = numpy.argsort(max_flows, kind = 'mergesort')
+		f = max_flows[ranking[position]]
+		if best is None or f < best['f']:
+			best = {
+				'f': f,
+				'topology': T,
+				'max_flows': max_flows.tolist(),
+				'traffic_matrix': traffic_matrices[ranking[position]]
+			}
+	if best is None:
+		print('ERR - %s robust solution not found!' % (approach.capitalize()))
+		return None
+	# Result
+	res = ltd.result(best['topology'], best['traffic_matrix'], delta_in, delta_out, initial_time, title, userView, withLabels, 'Robust %s' % (approach), routing = routing)
+	if res is not None:
+		res['max_flows'] = best['max_flows']
+	return res
+
+
+def hierarchical_LTD(n, traffic_matrix, delta_in, delta_out, cluster_size = 16, approach = 'ring', processes = None, routing = 'ecmp', title = 'Hierarchical LTD', userView = True, withLabels = True):
+	'''
+	This function solves large LTD problems in a hierarchical way:
+	- nodes are grouped in clusters exchanging high traffic (see "graph_traffic_matrix.traffic_clusters")
+	- every cluster is solved (in parallel) by a greedy LTD algorithm, keeping a transmitter and a receiver per node free
+	- clusters are connected by a cluster-level greedy LTD, whose delta constraints are given by the free transmitters
+	  and receivers of the clusters: every cluster-level edge becomes the edge with the highest traffic between
+	  two nodes of the clusters still having a free transmitter and a free receiver; the remaining free transmitters
+	  and receivers are then used by the highest traffic edges between clusters
+	Every cluster and the cluster-level topology are strongly connected, so the whole topology is.
+
+	Input parameters are:
+	- n: number of nodes
+	- traffic_matrix: traffic matrix (mean traffic value exchanged by node pairs)
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- cluster_size: maximum number of nodes per cluster
+	- approach: greedy algorithm to use, 'mesh' ("greedy_LTD_mesh") or 'ring' ("greedy_LTD_ring")
+	- processes: number of worker processes (default: number of CPUs; with 1, clusters are solved sequentially)
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- title: graph's title and output files names (.txt e .png)
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	The result has, in addition, the key "clusters" with the list of the clusters
+	'''
+	# INPUT CONTROL
+	if approach not in ('mesh', 'ring'):
+		raise ValueError('the parameter "approach" must be \'mesh\' or \'ring\'')
+	ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	inc.check_integer(cluster_size, 'cluster_size', minValue = 2)
+	if processes is not None:
+		inc.check_integer(processes, 'processes', minValue = 1)
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	print('\nPlease wait...')
+	clusters = tm.traffic_clusters(traffic_matrix, cluster_size)
+	k = len(clusters)
+	if k == 1 or delta_in == 1 or delta_out == 1:
+		# No need of clusters (or a ring is the only possible topology)
+		clusters = [list(range(n))]
+		deltas = (delta_in, delta_out)
+	else:
+		# Every node keeps a transmitter and a receiver for the edges between clusters
+		deltas = (delta_in - 1, delta_out - 1)
+
+	# INTRA-CLUSTER TOPOLOGIES
+	# The traffic matrix is shared with the workers (see "shared_arrays"), which extract their clusters' traffic
+	with sa.SharedArrays({'traffic_matrix': numpy.array(traffic_matrix, dtype = float)}) as shared:
+		jobs = [(approach, shared.name, c, deltas[0], deltas[1]) for c in clusters]
+		if processes == 1 or len(jobs) == 1:
+			results = [cluster_run(j) for j in jobs]
+		else:
+			pool = multiprocessing.Pool(processes)
+			try:
+				results = pool.map(cluster_run, jobs)
+			finally:
+				pool.close()
+				pool.join()
+	# Translate the clusters' nodes into the topology's ones
+	T = nx.DiGraph()
+	T.add_nodes_from(range(n))
+	for c, edges in zip(clusters, results):
+		for (u, v) in edges:
+			T.add_edge(c[u], c[v], flow = 0.0)
+
+	# CLUSTER-LEVEL TOPOLOGY
+	if k > 1 and len(clusters) > 1:
+		# Free transmitters and receivers of every node
+		free_out = dict((x, delta_out - T.out_degree(x)) for x in T.nodes())
+		free_in = dict((x, delta_in - T.in_degree(x)) for x in T.nodes())
+		# Cluster-level delta constraints and traffic matrix
+		cluster_delta = max(1, min(k - 1, min(min(sum(free_out[x] for x in c), sum(free_in[x] for x in c)) for c in clusters)))
+		membership = numpy.zeros((n, k))
+		for i, c in enumerate(clusters):
+			membership[c, i] = 1.0
+		cluster_tm = membership.T.dot(numpy.array(traffic_matrix, dtype = float)).dot(membership)
+		numpy.fill_diagonal(cluster_tm, 0.0)
+		cluster_tm = cluster_tm.tolist()
+		if approach == 'mesh':
+			C = greedy_mesh_topology(k, cluster_tm, cluster_delta, cluster_delta, batch_size = k)
+		else:
+			C = greedy_ring_topology(k, cluster_tm, cluster_delta, cluster_delta)
+		# The clusters' free transmitters and receivers are enough only for a valid cluster-level topology
+		if not ltd.check_global_delta_constraints(C, cluster_delta, cluster_delta):
+			print('ERR - Hierarchical solution not found!')
+			return None
+		# Every cluster-level edge becomes the highest traffic edge between free nodes of the clusters
+		for (a, b) in sorted(C.edges(), key = lambda e: cluster_tm[e[0]][e[1]], reverse = True):
+			us = [u for u in clusters[a] if free_out[u] > 0]
+			vs = [v for v in clusters[b] if free_in[v] > 0]
+			u, v = max(((u, v) for u in us for v in vs), key = lambda e: traffic_matrix[e[0]][e[1]])
+			T.add_edge(u, v, flow = 0.0)
+			free_out[u] -= 1
+			free_in[v] -= 1
+		# The remaining free transmitters and receivers are used by the highest traffic edges between clusters
+		label = numpy.zeros(n, dtype = int)
+		for i, c in enumerate(clusters):
+			label[c] = i
+		W = numpy.array(traffic_matrix, dtype = float)
+		W[label[:, None] == label[None, :]] = -1.0
+		order = numpy.argsort(-W, axis = None, kind = 'mergesort')
+		left = min(sum(free_out.values()), sum(free_in.values()))
+		for x in order:
+			u, v = divmod(int(x), n)
+			if left == 0 or W[u, v] <= 0:
+				break
+			if free_out[u] > 0 and free_in[v] > 0 and not T.edge[u].has_key(v):
+				T.add_edge(u, v, flow = 0.0)
+				free_out[u] -= 1
+				free_in[v] -= 1
+				left -= 1
 	# Result
-	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Ring')
+	res = ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Hierarchical', routing = routing)
+	if res is not None:
+		res['clusters'] = clusters
+	return res
 
 
-def LTD_manhattan_smart(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', userView = True, withLabels = True):
+def cluster_run(job):
+	'''
+	Single cluster of "hierarchical_LTD", solved by a worker process: it returns the edges of the obtained topology
+	'''
+	approach, name, c, delta_in, delta_out = job
+	n = len(c)
+	# Traffic exchanged by the nodes of the cluster (the traffic matrix is shared by "hierarchical_LTD")
+	traffic_matrix = sa.attach(name)['traffic_matrix']
+	if n < len(traffic_matrix):
+		traffic_matrix = traffic_matrix[numpy.ix_(c, c)]
+	if approach == 'mesh':
+		T = greedy_mesh_topology(n, traffic_matrix, delta_in, delta_out, batch_size = n)
+	else:
+		T = greedy_ring_topology(n, traffic_matrix, delta_in, delta_out)
+	return T.edges()
+
+
+def LTD_manhattan_smart(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', userView = True, withLabels = True, routing = 'water_fill', refine_iterations = 0):
 	'''
 	This function creates a Manattan topology and, according to the input traffic matrix, solves an LTD problem.
 	
@@ -222,40 +622,30 @@ def LTD_manhattan_smart(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', user
 	- title: graph's title and output files names (.txt e .png)
 	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
 	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- refine_iterations: maximum number of node swaps evaluated by the placement refinement, run after the greedy placement (0 to disable it);
+	  the refined placement is kept only if it lowers the max flow of the greedy one
 	'''
-	# UTILITY FUNCTIONS
-	def max_pair(T):
-		'''
-		Retrieve indexes of the highest traffic value into the traffic matrix
-		'''
-		# Init variables
-		maxV = -1
-		s_res = None
-		d_res = None
-		# T is a matrix n x n
-		n = len(T)
-		# loop over the matrix, to find the maximum value
-		for s in range(n):
-			for d in range(n):
-				if T[s][d] > maxV:
-					# Update max values
-					maxV = T[s][d]
-					s_res = s
-					d_res = d
-		# Result
-		return (s_res, d_res)
+	# Start computation time, in seconds
+	initial_time = time.time()
+	# Print the content of the traffic matrix
+	tm.print_TM(traffic_matrix)
+	# Place the nodes according to the traffic they exchange
+	T = manhattan_smart_topology(nr, nc, traffic_matrix, refine_iterations, routing)
+	# Decide how deep is the existing path research between a pair of nodes
+	depth = nr-1 if nr == nc else nr/2 + nc/2
+	# Route traffic according to the "water filling" principle
+	return ltd.result(T, traffic_matrix, 4, 4, initial_time, title, userView, withLabels, 'Manhattan', depth, routing)
 
-	def copy_TM(T):
-		'''
-		Retrieve a copy for the given traffic matrix (avoid pointer references)
-		'''
-		res = []
-		for row in T:
-			res.append([])
-			for c in row:
-				res[-1].append(c)
-		return res
 
+def manhattan_smart_topology(nr, nc, traffic_matrix, refine_iterations = 0, routing = 'water_fill'):
+	'''
+	This function computes the topology of "LTD_manhattan_smart" (same parameters), without routing the traffic:
+	nodes exchanging the most traffic are placed in adjacent positions of the Manhattan topology.
+	The refinement minimizes the hop-weighted traffic: both placements are routed ("routing" mode) and the refined
+	one is returned only if its max flow is lower
+	'''
+	# UTILITY FUNCTIONS
 	def empty_place(G, n):
 		'''
 		Verify that the position "n" of the "G" is empty
@@ -310,12 +700,50 @@ def LTD_manhattan_smart(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', user
 		# I haven't found an available place for "x"
 		return False
 
-	# Start computation time, in seconds
-	initial_time = time.time()
-	# Print the content of the traffic matrix
-	tm.print_TM(traffic_matrix)
-	# Create a copy of the traffic matrix (to avoid reference pointers)
-	tm_temp = copy_TM(traffic_matrix)
+	def refine_placement(G, T, max_iterations):
+		'''
+		Swap pairs of placed nodes of "G" as long as the hop-weighted traffic decreases, evaluating at most "max_iterations" swaps.
+		The cost variation of a swap is computed incrementally: only the rows and columns of the two swapped nodes change
+		'''
+		positions = G.nodes()
+		index = dict((p, i) for i, p in enumerate(positions))
+		# Hop distances between positions (the Manhattan topology is symmetric)
+		D = numpy.zeros((len(positions), len(positions)))
+		for p, lengths in nx.all_pairs_shortest_path_length(G).items():
+			for q, l in lengths.items():
+				D[index[p], index[q]] = l
+		# Traffic exchanged by node pairs, in both directions
+		W = numpy.array(T, dtype = float)
+		W = W + W.T
+		numpy.fill_diagonal(W, 0.0)
+		# Position index of each node
+		P = numpy.zeros(len(W), dtype = int)
+		for p in positions:
+			P[G.node[p]['name']] = index[p]
+		iterations = 0
+		improved = True
+		while improved and iterations < max_iterations:
+			improved = False
+			for a in range(len(W)):
+				for b in range(a+1, len(W)):
+					if iterations >= max_iterations:
+						break
+					iterations += 1
+					pa = P[a]
+					pb = P[b]
+					# Cost variation, ignoring the (unchanged) contribution of the pair "a"-"b" itself
+					delta = numpy.dot(W[a] - W[b], D[pb][P] - D[pa][P]) + 2 * W[a][b] * D[pa][pb]
+					if delta < -1e-9:
+						# Improving swap: apply it
+						P[a] = pb
+						P[b] = pa
+						place_node(G, pos = positions[pb], name = a)
+						place_node(G, pos = positions[pa], name = b)
+						improved = True
+		return iterations
+
+	# Create a copy of the traffic matrix (to avoid reference pointers), as an array (see "kernels.max_pair")
+	tm_temp = numpy.array(traffic_matrix, dtype = float)
 	# First of all, retrieve the starting topology
 	T_temp = gt.manhattan_topology(nr, nc)
 	# Then, name nodes using an "empty" name
@@ -333,7 +761,7 @@ def LTD_manhattan_smart(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', user
 	while not end:
 		# STEP 1
 		# Retrieve the pair of nodes who exchange most traffic 
-		s, d = max_pair(tm_temp)
+		s, d = kernels.max_pair(tm_temp)
 		tm_temp[s][d] = -1
 		# STEP 2
 		s_placed = s in S
@@ -369,13 +797,22 @@ def LTD_manhattan_smart(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', user
 		end = len(L) == 0
 	# Now, create a second Manhattan topology in which nodes are swapped
 	T = gt.manhattan_topology(nr, nc, derived = T_temp)
-	# Decide how deep is the existing path research between a pair of nodes
-	depth = nr-1 if nr == nc else nr/2 + nc/2
-	# Route traffic according to the "water filling" principle
-	return ltd.result(T, traffic_matrix, 4, 4, initial_time, title, userView, withLabels, 'Manhattan', depth)
+	# Improve the greedy placement through pairwise node swaps
+	if refine_iterations > 0:
+		refine_placement(T_temp, traffic_matrix, refine_iterations)
+		R = gt.manhattan_topology(nr, nc, derived = T_temp)
+		# A lower hop-weighted traffic does not always lower the max flow: the refined placement is kept only if
+		# its routed max flow is lower than the greedy one
+		depth = nr-1 if nr == nc else nr/2 + nc/2
+		G = flows.route(gt.unloaded_copy(T), traffic_matrix, routing, depth)
+		H = flows.route(gt.unloaded_copy(R), traffic_matrix, routing, depth)
+		if H is not None and (G is None or flows.max_flow(H)[0] < flows.max_flow(G)[0]):
+			T = R
+	# Result
+	return T
 
 
-def LTD_manhattan(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', userView = True, withLabels = True):
+def LTD_manhattan(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', userView = True, withLabels = True, routing = 'water_fill'):
 	'''
 	This function creates a Manattan topology and, according to the input traffic matrix, solves an LTD problem.
 	
@@ -387,6 +824,7 @@ def LTD_manhattan(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', userView =
 	- title: graph's title and output files names (.txt e .png)
 	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
 	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
 	'''
 	# Computation starting time, in seconds
 	initial_time = time.time()
@@ -397,7 +835,527 @@ def LTD_manhattan(n, nr, nc, traffic_matrix, title = 'Manhattan LTD', userView =
 	# Evaluate the maximum search depth for the paths between pairs of nodes
 	depth = nr-1 if nr == nc else nr/2 + nc/2
 	# Now, route the traffic according to the "water filling" principle
-	return ltd.result(T, traffic_matrix, 4, 4, initial_time, title, userView, withLabels, 'Manhattan', depth)
+	return ltd.result(T, traffic_matrix, 4, 4, initial_time, title, userView, withLabels, 'Manhattan', depth, routing)
+
+
+def LTD_local_search(T, traffic_matrix, delta_in, delta_out, max_iterations = 1000, max_time = 10.0, target_gap = 0.0, title = 'Local search LTD', userView = True, withLabels = True, depth = 6):
+	'''
+	This function improves a topology found by another LTD algorithm (for example, "greedy_LTD_mesh", "greedy_LTD_ring"
+	or "LTD_random"), using a local search based on 2-edge swaps: edges "a-b" and "c-d" are replaced by "a-d" and "c-b",
+	so that the delta constraints are still satisfied. Every swap is evaluated re-routing only the demands
+	it affects; it is kept only if it lowers the max flow.
+
+	Input parameters are:
+	- T: starting topology
+	- traffic_matrix: traffic matrix (mean traffic value exchanged by node pairs)
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- max_iterations: maximum number of swaps to try
+	- max_time: maximum computation time for the search (in seconds)
+	- target_gap: the search stops as soon as the relative gap between the max flow and its lower bound
+	  (see "flow_utilities.max_flow_lower_bound") is not greater than this value
+	- title: graph's title and output files names (.txt e .png)
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- depth: maximum depth for the path research, between pairs of nodes
+	'''
+	# INPUT CONTROL
+	inc.check_DiGraph(T, 'T')
+	ltd.input_control(len(T.nodes()), traffic_matrix, delta_in, delta_out)
+	inc.check_integer(max_iterations, 'max_iterations', minValue = 0)
+	inc.check_number(max_time, 'max_time', minValue = 0)
+	inc.check_number(target_gap, 'target_gap', minValue = 0)
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	# Print on screen the content of the traffic matrix
+	tm.print_TM(traffic_matrix)
+	# Max flow value for which the search can stop
+	target_f_max = flows.max_flow_lower_bound(traffic_matrix, delta_in, delta_out) * (1 + target_gap)
+	# Route the traffic on the starting topology, saving the routing state
+	S = gt.unloaded_copy(T)
+	state = flows.new_routing_state()
+	S = flows.complete_water_fill(S, traffic_matrix, depth, state)
+	if S is None or len(S.edges()) < 2:
+		# Nothing to improve
+		return ltd.result(gt.unloaded_copy(T), traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Local search', depth)
+	start_f_max = flows.max_flow(S)[0]
+
+	# OPTIMIZE THE TOPOLOGY
+	print('\nPlease wait...')
+	swaps = swap_search(S, state, traffic_matrix, max_iterations, initial_time + max_time, target_f_max, depth)
+	# The incremental routing approximates the complete one: verify that the result is really better
+	if swaps > 0:
+		R = flows.complete_water_fill(gt.unloaded_copy(S), traffic_matrix, depth)
+		if R is None or flows.max_flow(R)[0] >= start_f_max:
+			S = T
+	# Result
+	return ltd.result(gt.unloaded_copy(S), traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Local search', depth)
+
+
+def swap_search(S, state, traffic_matrix, max_iterations, deadline, target_f_max = 0.0, depth = 6, max_swaps = None):
+	'''
+	Edge-swap local search (see "LTD_local_search") on the routed topology "S", updated together with its
+	routing state "state". The search stops after "max_iterations" attempts, at the time "deadline" (as returned
+	by time.time()), as soon as the max flow is not greater than "target_f_max" or after "max_swaps" accepted swaps.
+	It returns the number of accepted swaps
+	'''
+	best_f_max = flows.max_flow(S)[0]
+	swaps = 0
+	iteration = 0
+	while iteration < max_iterations and best_f_max > target_f_max and (max_swaps is None or swaps < max_swaps) and time.time() < deadline:
+		iteration += 1
+		if len(S.edges()) < 2:
+			break
+		# Random pair of edges "a-b" and "c-d"
+		(a, b), (c, d) = random.sample(S.edges(), 2)
+		# The swap must not create self-loops or already existing edges
+		if len(set([a, b, c, d])) < 4 or S.edge[a].has_key(d) or S.edge[c].has_key(b):
+			continue
+		# Swap the edges, re-routing only the affected demands
+		update = flows.update_routing(S, state, traffic_matrix, removed = [(a, b), (c, d)], added = [(a, d), (c, b)], depth = depth, bound = best_f_max, deadline = deadline)
+		if update is None:
+			# The swap disconnects the topology, it cannot lower the max flow or the time is over
+			continue
+		f_max = flows.max_flow(S)[0]
+		if f_max < best_f_max:
+			# Keep the swap
+			best_f_max = f_max
+			swaps += 1
+		else:
+			# Undo the swap
+			flows.restore_routing(S, state, update)
+	# Result
+	return swaps
+
+
+def LTD_warm_start(previous, traffic_matrix, delta_in, delta_out, max_iterations = 20, max_time = None, max_swaps = 2, target_gap = 0.0, title = 'Warm start LTD', userView = True, withLabels = True, depth = 6):
+	'''
+	This function re-optimizes a previous LTD solution for a new traffic matrix (usually, slightly different from the
+	previous one), instead of solving the problem from scratch. The previous routing state is updated step by step:
+	- the demands whose traffic value has changed are scaled on their previous paths (see "flow_utilities.scale_demand");
+	  only the new demands are routed, and the ones which are not in the new traffic matrix anymore are removed
+	- if the topology does not satisfy the delta constraints, the lowest flow edges of the violating nodes are removed
+	- the topology is then improved with a short edge-swap local search (see "LTD_local_search"). If some swap is
+	  accepted, a single complete routing verifies it: the swapped topology is kept (with this routing) only if its
+	  max flow is lower than the one before the search
+	The result keeps the routing state built by these steps, so its max flow can differ from the one of a complete
+	routing of the same topology (see "flow_utilities.complete_water_fill")
+
+	Input parameters are:
+	- previous: previous solution, as returned by the LTD algorithms (it must be routed with 'water_fill')
+	- traffic_matrix: new traffic matrix
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- max_iterations: maximum number of swaps to try
+	- max_time: maximum computation time for the search (in seconds); by default, a quarter of the computation time of
+	  the last solution found from scratch (the previous one, or the one from which it was warm-started)
+	- max_swaps: maximum number of swaps to apply (each one changes 4 edges); None means no limit
+	- target_gap: the search stops as soon as the relative gap between the max flow and its lower bound
+	  (see "flow_utilities.max_flow_lower_bound") is not greater than this value
+	- title: graph's title and output files names (.txt e .png)
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- depth: maximum depth for the path research, between pairs of nodes
+	The result has, in addition, the key "edge_changes" with the number of edges added or removed, and the key
+	"cold_time" with the computation time of the last solution found from scratch
+	'''
+	# INPUT CONTROL
+	if previous.get('routing_state') is None:
+		raise ValueError('the parameter "previous" is invalid: it must have a \'water_fill\' routing state')
+	T = previous['topology']
+	inc.check_DiGraph(T, 'previous topology')
+	ltd.input_control(len(T.nodes()), traffic_matrix, delta_in, delta_out)
+	inc.check_integer(max_iterations, 'max_iterations', minValue = 0)
+	cold_time = previous.get('cold_time', previous['time'])
+	if max_time is None:
+		max_time = 0.25 * cold_time
+	inc.check_number(max_time, 'max_time', minValue = 0)
+	if max_swaps is not None:
+		inc.check_integer(max_swaps, 'max_swaps', minValue = 0)
+	inc.check_number(target_gap, 'target_gap', minValue = 0)
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	# Print on screen the content of the traffic matrix
+	tm.print_TM(traffic_matrix)
+	# Work on copies of the previous topology (not frozen, see "ltd.solution") and routing state
+	S = nx.DiGraph(T)
+	state = flows.copy_routing_state(previous['routing_state'])
+	nodes = S.nodes()
+
+	# UPDATE THE CHANGED DEMANDS
+	for u in nodes:
+		for v in nodes:
+			f = traffic_matrix[u][v] if traffic_matrix[u][v] > 0 else 0
+			f_previous = state['traffic'].get((u, v), 0)
+			if u == v or f == f_previous:
+				continue
+			if f > 0 and f_previous > 0:
+				flows.scale_demand(S, state, (u, v), f)
+			elif f > 0:
+				if flows.route_demand(S, u, v, f, depth, state) is None:
+					print('ERR - Warm start solution not found: nodes %s and %s are not connected!' % (u, v))
+					return None
+			else:
+				flows.unroute_demand(S, state, (u, v))
+
+	# REPAIR THE TOPOLOGY
+	# Remove the lowest flow edges of the nodes which violate the delta constraints
+	repaired = True
+	while repaired and not ltd.check_global_delta_constraints(S, delta_in, delta_out):
+		repaired = False
+		out_deg = S.out_degree()
+		in_deg = S.in_degree()
+		candidates = [(S.edge[u][v]['flow'], (u, v)) for (u, v) in S.edges() if out_deg[u] > delta_out or in_deg[v] > delta_in]
+		for (f, e) in sorted(candidates):
+			if flows.update_routing(S, state, traffic_matrix, removed = [e], depth = depth) is not None:
+				repaired = True
+				break
+
+	# IMPROVE THE TOPOLOGY
+	if ltd.check_global_delta_constraints(S, delta_in, delta_out) and max_iterations > 0 and max_time > 0:
+		print('\nPlease wait...')
+		target_f_max = flows.max_flow_lower_bound(traffic_matrix, delta_in, delta_out) * (1 + target_gap)
+		repaired_f_max = flows.max_flow(S)[0]
+		repaired_S = nx.DiGraph(S)
+		repaired_state = flows.copy_routing_state(state)
+		swaps = swap_search(S, state, traffic_matrix, max_iterations, initial_time + max_time, target_f_max, depth, max_swaps)
+		if swaps > 0:
+			# The incremental routing depends on the order of the previous updates: the swaps are kept only if a
+			# complete routing confirms that they lower the max flow
+			R_state = flows.new_routing_state()
+			R = flows.complete_water_fill(gt.unloaded_copy(S), traffic_matrix, depth, R_state)
+			if R is not None and flows.max_flow(R)[0] < repaired_f_max:
+				S, state = R, R_state
+			else:
+				S, state = repaired_S, repaired_state
+	# Result
+	res = ltd.result(S, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Warm start', depth, state = state)
+	if res is not None:
+		res['edge_changes'] = len(set(S.edges()) ^ set(T.edges()))
+		res['cold_time'] = cold_time
+	return res
+
+
+def LTD_stream(traffic_matrices, delta_in, delta_out, approach = 'mesh', max_iterations = 20, max_time = None, max_swaps = 2, title = 'Stream LTD', userView = False, withLabels = False):
+	'''
+	Generator: for every traffic matrix of a sequence (for example, a time series), it yields the corresponding
+	LTD solution. The first matrix is solved from scratch with a greedy LTD algorithm; the following ones are
+	warm-started from the previous solution ("LTD_warm_start"), reusing its topology and routing state.
+	Matrices are read only when the next solution is requested, and only the last solution is kept in memory:
+	a slow consumer slows down the reading, and long sequences do not increase the memory usage.
+
+	Input parameters are:
+	- traffic_matrices: iterable of traffic matrices, or text file opened in read mode (see "graph_traffic_matrix.read_TMs")
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- approach: greedy algorithm for the cold solutions, 'mesh' ("greedy_LTD_mesh") or 'ring' ("greedy_LTD_ring")
+	- max_iterations, max_time, max_swaps: local search budget of every warm start (see "LTD_warm_start")
+	- title: graphs' title and output files names (.txt e .png), followed by the step number
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	Yielded solutions are the dictionaries returned by the LTD algorithms (None, if a solution is not found)
+	'''
+	# INPUT CONTROL
+	if approach not in ('mesh', 'ring'):
+		raise ValueError('the parameter "approach" must be \'mesh\' or \'ring\'')
+	# A file is read one matrix at a time
+	if hasattr(traffic_matrices, 'read'):
+		traffic_matrices = tm.read_TMs(traffic_matrices)
+
+	# ALGORITHM
+	previous = None
+	for step, traffic_matrix in enumerate(traffic_matrices):
+		step_title = '%s - Step %s' % (title, str(step).zfill(4))
+		res = None
+		# Warm start, if the previous solution can be reused
+		if previous is not None and len(previous['topology'].nodes()) == len(traffic_matrix):
+			res = LTD_warm_start(previous, traffic_matrix, delta_in, delta_out, max_iterations, max_time, max_swaps, title = step_title, userView = userView, withLabels = withLabels)
+		# Otherwise, solve the problem from scratch
+		if res is None:
+			if approach == 'mesh':
+				res = greedy_LTD_mesh(len(traffic_matrix), traffic_matrix, delta_in, delta_out, step_title, userView, withLabels)
+			else:
+				res = greedy_LTD_ring(len(traffic_matrix), traffic_matrix, delta_in, delta_out, step_title, userView, withLabels)
+		previous = res
+		yield res
+
+
+def LTD_simulated_annealing(n, traffic_matrix, delta_in, delta_out, start = None, temperature = None, cooling = None, min_temperature = 1e-3, max_iterations = 10000, max_time = 30.0, target_gap = 0.0, moves = ('add', 'remove', 'swap'), title = 'Simulated annealing LTD', userView = True, withLabels = True, depth = 6):
+	'''
+	This function solves the LTD problem using the simulated annealing metaheuristic: starting from a feasible topology,
+	it explores the topologies satisfying the delta constraints by adding, removing or swapping edges ("a-b" and "c-d" are
+	replaced by "a-d" and "c-b"). A move is always accepted if it does not increase the max flow, otherwise with
+	probability exp(-increase / temperature). After every move only the affected demands are re-routed; a topology
+	better than the best one found so far is routed from scratch, so the result is never worse than the starting one.
+
+	Input parameters are:
+	- n: number of nodes
+	- traffic_matrix: traffic matrix (mean traffic value exchanged by node pairs)
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- start: starting topology (default: the "greedy_LTD_ring" one)
+	- temperature: initial temperature (default: 5% of the max flow of the starting topology)
+	- cooling: cooling schedule; a number is the factor of a geometric schedule, a function "cooling(temperature,
+	  iteration)" returns the next temperature. By default, the temperature decreases geometrically down to
+	  "min_temperature" at the end of the budget ("max_iterations" or "max_time", whichever comes first)
+	- min_temperature: the search stops when the temperature goes below this value
+	- max_iterations: maximum number of moves to try
+	- max_time: maximum computation time (in seconds)
+	- target_gap: the search stops as soon as the relative gap between the max flow and its lower bound
+	  (see "flow_utilities.max_flow_lower_bound") is not greater than this value
+	- moves: kinds of moves to use ('add', 'remove', 'swap')
+	- title: graph's title and output files names (.txt e .png)
+	- userView: boolean, used to require the visualization of the topology and the log of the results on screen
+	- withLabels: boolean, used to require the visualization of the flow labels in the obtained topology photo
+	- depth: maximum depth for the path research, between pairs of nodes
+	'''
+	# INPUT CONTROL
+	ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	if start is not None:
+		inc.check_DiGraph(start, 'start')
+	if temperature is not None:
+		inc.check_number(temperature, 'temperature', minValue = 0)
+	if cooling is not None and not callable(cooling):
+		inc.check_number(cooling, 'cooling', minValue = 0, maxValue = 1)
+	inc.check_number(min_temperature, 'min_temperature', minValue = 0)
+	if cooling is None and min_temperature == 0:
+		raise ValueError('the parameter "min_temperature" must be positive with the default cooling schedule')
+	inc.check_integer(max_iterations, 'max_iterations', minValue = 0)
+	inc.check_number(max_time, 'max_time', minValue = 0)
+	inc.check_number(target_gap, 'target_gap', minValue = 0)
+	for m in moves:
+		if m not in ('add', 'remove', 'swap'):
+			raise ValueError('the move "%s" is invalid: it must be \'add\', \'remove\' or \'swap\'' % (m))
+
+	# UTILITY FUNCTIONS
+	def random_move(G):
+		'''
+		This function returns a random move as a pair (edges to remove, edges to add), or None if the selected
+		kind of move cannot be applied to "G"
+		'''
+		move = random.choice(moves)
+		edges = G.edges()
+		if move == 'add':
+			# Nodes with a free transmitter and nodes with a free receiver
+			us = [x for x in G.nodes() if G.out_degree(x) < delta_out]
+			vs = [x for x in G.nodes() if G.in_degree(x) < delta_in]
+			if len(us) == 0 or len(vs) == 0:
+				return None
+			u = random.choice(us)
+			v = random.choice(vs)
+			if u == v or G.edge[u].has_key(v):
+				return None
+			return ([], [(u, v)])
+		if move == 'remove':
+			if len(edges) <= len(G.nodes()):
+				# The topology could not be connected anymore
+				return None
+			return ([random.choice(edges)], [])
+		# Swap
+		if len(edges) < 2:
+			return None
+		(a, b), (c, d) = random.sample(edges, 2)
+		if len(set([a, b, c, d])) < 4 or G.edge[a].has_key(d) or G.edge[c].has_key(b):
+			return None
+		return ([(a, b), (c, d)], [(a, d), (c, b)])
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	# Print on screen the content of the traffic matrix
+	tm.print_TM(traffic_matrix)
+	# Starting topology
+	if start is None:
+		start = greedy_ring_topology(n, traffic_matrix, delta_in, delta_out)
+	if not ltd.check_global_delta_constraints(start, delta_in, delta_out):
+		print('ERR - the starting topology does not satisfy the delta constraints!')
+		return None
+	# Route the traffic on the starting topology, saving the routing state
+	S = gt.unloaded_copy(start)
+	state = flows.new_routing_state()
+	S = flows.complete_water_fill(S, traffic_matrix, depth, state)
+	if S is None:
+		print('ERR - the starting topology is not connected!')
+		return None
+	start_f_max = flows.max_flow(S)[0]
+	current_f_max = start_f_max
+	best_f_max = start_f_max
+	best_edges = S.edges()
+	if temperature is None:
+		temperature = 0.05 * start_f_max
+	initial_temperature = temperature
+	# Max flow value for which the search can stop
+	target_f_max = flows.max_flow_lower_bound(traffic_matrix, delta_in, delta_out) * (1 + target_gap)
+
+	# OPTIMIZE THE TOPOLOGY
+	print('\nPlease wait...')
+	iteration = 0
+	while iteration < max_iterations and temperature > min_temperature and best_f_max > target_f_max and time.time() - initial_time < max_time:
+		iteration += 1
+		move = random_move(S)
+		if move is not None:
+			# Apply the move, re-routing only the affected demands
+			update = flows.update_routing(S, state, traffic_matrix, removed = move[0], added = move[1], depth = depth)
+			if update is not None:
+				f_max = flows.max_flow(S)[0]
+				increase = f_max - current_f_max
+				if increase <= 0 or random.random() < math.exp(-increase / temperature):
+					# Accept the move
+					current_f_max = f_max
+					if f_max < best_f_max:
+						# The incremental routing drifts from the complete one as the moves accumulate: a new best
+						# topology is routed from scratch, and the search goes on from this routing
+						S = gt.unloaded_copy(S)
+						state = flows.new_routing_state()
+						S = flows.complete_water_fill(S, traffic_matrix, depth, state)
+						current_f_max = flows.max_flow(S)[0]
+						if current_f_max < best_f_max:
+							best_f_max = current_f_max
+							best_edges = S.edges()
+				else:
+					# Reject the move
+					flows.restore_routing(S, state, update)
+		# Cooling
+		if cooling is None:
+			# Geometric schedule from the initial temperature to "min_temperature", at the end of the budget
+			progress = max(float(iteration) / max_iterations, (time.time() - initial_time) / max_time)
+			temperature = initial_temperature * (float(min_temperature) / initial_temperature) ** progress
+		elif callable(cooling):
+			temperature = cooling(temperature, iteration)
+		else:
+			temperature *= cooling
+	# Result
+	T = gt.topology_from_edges(S.nodes(), best_edges)
+	return ltd.result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, 'Simulated annealing', depth)
+
+
+def solve(approach, n, traffic_matrix, delta_in, delta_out, routing = 'water_fill', **parameters):
+	'''
+	This function solves an LTD problem without any side effect: nothing is printed or drawn and no file is written,
+	so that several problems can be solved concurrently (e.g. by a pool of threads). The result is the one of
+	"ltd.solution": a read-only dictionary with a frozen topology (None, if a solution is not found).
+	Results can be shown to the user with "ltd.end"; the other functions of this module print and draw them directly.
+
+	Input parameters are:
+	- approach: 'mesh' (see "greedy_LTD_mesh"), 'ring' ("greedy_LTD_ring"), 'manhattan' ("LTD_manhattan")
+	  or 'manhattan_smart' ("LTD_manhattan_smart")
+	- n: number of nodes
+	- traffic_matrix: traffic matrix (mean traffic value exchanged by node pairs)
+	- delta_in: constraint on the maximum number of receivers per node
+	- delta_out: constraint on the maximum number of trnasmitters per node
+	- routing: routing mode used to load the edges' flows, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- parameters: parameters of the approach, named as in the corresponding function: "batch_size", "seed" and
+	  "perturbation" for 'mesh'; "seed" and "perturbation" for 'ring'; "nr" and "nc" (required) for the Manhattan
+	  approaches, and "refine_iterations" for 'manhattan_smart'
+	'''
+	# INPUT CONTROL
+	if approach not in ('mesh', 'ring', 'manhattan', 'manhattan_smart'):
+		raise ValueError('the parameter "approach" must be \'mesh\', \'ring\', \'manhattan\' or \'manhattan_smart\'')
+	ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+	if 'batch_size' in parameters:
+		inc.check_integer(parameters['batch_size'], 'batch_size', minValue = 1)
+	if 'perturbation' in parameters:
+		inc.check_number(parameters['perturbation'], 'perturbation', minValue = 0)
+
+	# ALGORITHM
+	# Computation starting time
+	initial_time = time.time()
+	depth = 6
+	if approach == 'mesh':
+		T = greedy_mesh_topology(n, traffic_matrix, delta_in, delta_out, **parameters)
+	elif approach == 'ring':
+		T = greedy_ring_topology(n, traffic_matrix, delta_in, delta_out, **parameters)
+	else:
+		nr = parameters.pop('nr', None)
+		nc = parameters.pop('nc', None)
+		inc.check_integer(nr, 'nr', minValue = 1)
+		inc.check_integer(nc, 'nc', minValue = 1)
+		if approach == 'manhattan':
+			if len(parameters) > 0:
+				raise TypeError('unexpected parameters for the \'manhattan\' approach: %s' % (', '.join(parameters.keys())))
+			T = gt.manhattan_topology(nr, nc)
+		else:
+			T = manhattan_smart_topology(nr, nc, traffic_matrix, routing = routing, **parameters)
+		# Maximum search depth for the paths between pairs of nodes
+		depth = nr-1 if nr == nc else nr/2 + nc/2
+	# Result
+	return ltd.solution(T, traffic_matrix, delta_in, delta_out, initial_time, depth, routing)
+
+
+def link_failure_analysis(res, traffic_matrix, depth = 6, processes = 1):
+	'''
+	This function evaluates the single-link failures of a topology designed by an LTD algorithm: for every edge,
+	the max flow obtained without it and the demands which cannot be routed anymore. The baseline routing state
+	of the result is reused, so only the demands crossing the failed edge are re-routed (see "flow_utilities.link_failures").
+	Nothing is printed or drawn, as in "solve".
+
+	Input parameters are:
+	- res: result of an LTD algorithm (see "ltd.result" or "ltd.solution"); if it has no routing state (e.g.
+	  'ecmp' routing), the traffic is routed again by water filling
+	- traffic_matrix: traffic matrix used to route the traffic on the topology
+	- depth: maximum depth for the path research, between pairs of nodes
+	- processes: number of worker processes (default 1, the edges are evaluated sequentially; None for the number of CPUs)
+	It returns a dictionary edge -> {'max_flow': max flow without the edge (None if no edge is left),
+	'disconnected': list of the demands (u, v) which cannot be routed without the edge}.
+	It returns None if the traffic cannot be routed on the topology
+	'''
+	# INPUT CONTROL
+	inc.check_DiGraph(res['topology'], 'topology')
+	if processes is not None:
+		inc.check_integer(processes, 'processes', minValue = 1)
+
+	# ALGORITHM
+	# Baseline routing (copied: the result may be frozen)
+	S = nx.DiGraph(res['topology'])
+	state = res['routing_state']
+	if state is None:
+		S = gt.unloaded_copy(S)
+		state = flows.new_routing_state()
+		S = flows.complete_water_fill(S, traffic_matrix, depth, state)
+		if S is None:
+			return None
+	else:
+		state = flows.copy_routing_state(state)
+	edges = S.edges()
+	if processes == 1 or len(edges) < 2:
+		failures = flows.link_failures(S, state, traffic_matrix, edges, depth)
+	else:
+		# The routed topology, its routing state and the traffic matrix are shared with the workers (see "shared_arrays");
+		# every worker evaluates a chunk of edges, rebuilding the baseline only once
+		if processes is None:
+			processes = multiprocessing.cpu_count()
+		arrays = gt.topologies_to_arrays([S])
+		arrays.update(flows.routing_state_to_arrays(state))
+		arrays['traffic_matrix'] = numpy.array(traffic_matrix, dtype = float)
+		chunks = [edges[i::processes] for i in range(processes) if i < len(edges)]
+		with sa.SharedArrays(arrays) as shared:
+			jobs = [(shared.name, c, depth) for c in chunks]
+			pool = multiprocessing.Pool(len(jobs))
+			try:
+				failures = {}
+				for r in pool.map(failure_run, jobs):
+					failures.update(r)
+			finally:
+				pool.close()
+				pool.join()
+	# Result
+	return dict((e, {'max_flow': None if f is None else float(f), 'disconnected': d}) for (e, (f, d)) in failures.items())
+
+
+def failure_run(job):
+	'''
+	Chunk of edges of "link_failure_analysis", evaluated by a worker process (see "flow_utilities.link_failures")
+	'''
+	name, edges, depth = job
+	# Baseline routing and traffic matrix, shared by "link_failure_analysis"
+	data = sa.attach(name)
+	S = gt.topologies_from_arrays(data)[0]
+	state = flows.routing_state_from_arrays(data)
+	return flows.link_failures(S, state, data['traffic_matrix'], edges, depth)
 
 
 def greedy_LTD_start():
@@ -0,0 +1,93 @@
+import sys
+import time
+import json
+from collections import Counter
+import graph_topologies as gt
+import ltd_utilities as ltd
+
+
+class DecisionTrace(object):
+	'''
+	Log of the decisions of a greedy LTD algorithm (see "LAB2_OpRes.greedy_mesh_topology"), written as JSON lines:
+	one object per decision, with its event, its edge and its timestamp "t" (seconds since the start of the trace).
+	Events are:
+	- "start": parameters of the run ("algorithm", "n", "delta_in", "delta_out", ...); "ring" is True if the result
+	  is directly a ring topology (one of the deltas is 1)
+	- "skip": edge not removed, because its nodes already satisfy the delta constraints
+	- "reject": edge not removed, because its removal would disconnect the topology
+	- "remove": edge removed
+	- "end": number of edges of the resulting topology
+	'''
+	def __init__(self, path):
+		'''
+		- path: path of the log file (overwritten)
+		'''
+		self.fp = open(path, 'w')
+		self.start = time.time()
+
+	def record(self, event, edge = None, **fields):
+		'''
+		Append a decision to the log
+		'''
+		fields['t'] = time.time() - self.start
+		fields['event'] = event
+		if edge is not None:
+			fields['edge'] = edge
+		self.fp.write(json.dumps(fields) + '\n')
+
+	def close(self):
+		self.fp.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+def read_trace(path):
+	'''
+	This function returns the list of the decisions logged by a "DecisionTrace"
+	'''
+	with open(path) as fp:
+		return [json.loads(line) for line in fp if line.strip() != '']
+
+def replay(events):
+	'''
+	This function rebuilds the topology of a greedy run from its decisions (see "read_trace"), applying the logged
+	removals in the same order, without any connectivity check: the cost of the greedy algorithm is then only the one
+	of the topology updates, so runs can be compared on fixed decision sequences
+	'''
+	start = events[0]
+	if start['event'] != 'start':
+		raise ValueError('the trace must begin with a "start" event')
+	if start.get('ring'):
+		return gt.ring_topology(start['n'])
+	T = gt.mesh_topology(start['n'])
+	for e in events:
+		if e['event'] == 'remove':
+			T.remove_edge(e['edge'][0], e['edge'][1])
+	return T
+
+def summary(events):
+	'''
+	This function returns the number of decisions per event, and the duration of the logged run (in seconds)
+	'''
+	return (dict(Counter(e['event'] for e in events)), events[-1]['t'] - events[0]['t'])
+
+
+# Executable code (main)
+if __name__ == '__main__':
+	# Usage: python decision_trace.py <trace file>
+	if len(sys.argv) < 2:
+		print('Usage: python decision_trace.py <trace file>')
+		sys.exit(1)
+	events = read_trace(sys.argv[1])
+	counts, duration = summary(events)
+	print('Decisions: %s' % (', '.join('%s = %d' % (k, counts[k]) for k in sorted(counts))))
+	print('Logged run: %s s' % (round(duration, 4)))
+	initial_time = time.time()
+	T = replay(events)
+	print('Replay: %s s, %d edges' % (round(time.time() - initial_time, 4), len(T.edges())))
+	start = events[0]
+	print('Delta constraints satisfied: %s' % (ltd.check_global_delta_constraints(T, start['delta_in'], start['delta_out'])))
@@ -1,6 +1,9 @@
+import sys
 import LAB2_OpRes as L2
-import graph_traffic_matrix as tm
 import flow_utilities as flows
+import solution_cache as sc
+import sweep_utilities as sw
+import sweep_cluster as scl
 
 high_traffic = (5, 15)
 low_traffic = (0.5, 1.5)
@@ -12,8 +15,84 @@ print(intro)
 # Test use different values for N and delta
 ns = [3, 4, 6, 8, 10, 16, 20, 30, 40]
 deltas = [1, 2, 3, 5, 7, 9, 15, 19, 25, 29, 35, 39]
-# For every pair N - delta, I do a certain number of simulations (experiments)
-n_simulations = 4
+# For every pair N - delta, I repeat the simulation (experiment) until the 95% confidence intervals of the max flows
+# are within "tolerance" (relative to their mean), doing at least "min_simulations" and at most "max_simulations" of them
+min_simulations = 3
+max_simulations = 20
+tolerance = 0.05
+
+# Distributed mode (see "sweep_cluster"): "python ex03.py coordinator <port | shared directory>" hands out the simulations
+# to the workers, started on other hosts by "python sweep_cluster.py <coordinator host>:<port | shared directory>"
+coordinator = scl.coordinator_from_args(sys.argv[1:])
+
+# Solutions already computed (identical instances are not solved again)
+cache = sc.SolutionCache('cache')
+
+
+def simulation(n, delta, t, s):
+	'''
+	Simulation #s of the test #t: it solves the LTD problem for a new traffic matrix, and returns the max flows
+	and the computational times of the compared algorithms (None, if one of them fails)
+	'''
+	# Max flows and computational times
+	res = {}
+	# Creating traffic matrix: it is seeded by the test and simulation numbers (as in the distributed mode, see "sweep_cluster.traffic_matrix"),
+	# so that the instances of a rerun are found in the cache
+	seed = (t - 1) * scl.CELL_SEEDS + s
+	traffic_matrix = scl.traffic_matrix(n, [low_traffic[0], low_traffic[1], high_traffic[0], high_traffic[1], p], seed)
+	# Experiment number
+	exp = 'Exp #%s, Sim #%s - ' % (str(t).zfill(2), str(s).zfill(2))
+	# Information strings
+	exp_info = '%sN = %d, delta = %d' % (exp, n, delta)
+	mesh_title = '%sMesh LTD' % (exp)
+	ring_title = '%sRing LTD' % (exp)
+	random_mesh_title = '%sRandom vs Mesh' % (exp)
+	random_ring_title = '%sRandom vs Ring' % (exp)
+	print('\n\n%s' % (exp_info))
+	# SOL 1 - Mesh vs Random
+	T1 = cache.cached('mesh', traffic_matrix, {'delta_in': delta, 'delta_out': delta},
+		lambda: L2.greedy_LTD_mesh(n, traffic_matrix, delta, delta, mesh_title, userView = False, withLabels = False))
+	# A simulation whose traffic matrix makes an algorithm fail (very rare!) is replaced by the next one, as in the
+	# distributed mode (see "sweep_utilities.adaptive_simulations")
+	if T1 is None:
+		return None
+	res['mesh'] = T1['max_flow']
+	res['mesh_time'] = T1['time']
+	n_edges = len(T1['topology'].edges())
+	T1_bis = cache.cached('random', traffic_matrix, {'n_edges': n_edges, 'delta_in': delta, 'delta_out': delta},
+		lambda: L2.LTD_random(n, n_edges, delta, delta, traffic_matrix, random_mesh_title, userView = False, withLabels = False, seed = seed), seed = seed)
+	if T1_bis is None:
+		return None
+	res['rnd_mesh'] = T1_bis['max_flow']
+	res['rnd_mesh_time'] = T1_bis['time']
+	# SOL 2 - Ring vs Random
+	T2 = cache.cached('ring', traffic_matrix, {'delta_in': delta, 'delta_out': delta},
+		lambda: L2.greedy_LTD_ring(n, traffic_matrix, delta, delta, ring_title, userView = False, withLabels = False))
+	if T2 is None:
+		return None
+	res['ring'] = T2['max_flow']
+	res['ring_time'] = T2['time']
+	n_edges = len(T2['topology'].edges())
+	T2_bis = cache.cached('random', traffic_matrix, {'n_edges': n_edges, 'delta_in': delta, 'delta_out': delta},
+		lambda: L2.LTD_random(n, n_edges, delta, delta, traffic_matrix, random_ring_title, userView = False, withLabels = False, seed = seed), seed = seed)
+	if T2_bis is None:
+		return None
+	res['rnd_ring'] = T2_bis['max_flow']
+	res['rnd_ring_time'] = T2_bis['time']
+	# Result
+	return res
+
+
+# DISTRIBUTED SIMULATIONS
+keys = ['mesh', 'rnd_mesh', 'ring', 'rnd_ring']
+distributed = None
+if coordinator is not None:
+	algorithms = [{'name': 'mesh', 'algorithm': 'mesh'}, {'name': 'rnd_mesh', 'algorithm': 'random_mesh'},
+		{'name': 'ring', 'algorithm': 'ring'}, {'name': 'rnd_ring', 'algorithm': 'random_ring'}]
+	cells = [[dict(a, n = n, delta = delta, traffic = [low_traffic[0], low_traffic[1], high_traffic[0], high_traffic[1], p]) for a in algorithms] for n in ns for delta in deltas if delta < n]
+	distributed = scl.distributed_simulations(coordinator, cells, keys, tolerance, min_simulations, max_simulations)
+	coordinator.close()
+
 
 # TEST
 # Open the output file (write mode), in which I'll print obtained results
@@ -28,59 +107,18 @@ try:
 				# Anyway, if delta >= n the result is still a full mesh topology (I can jump the simulation)
 				if delta >= n:
 					continue
-				# Estimated max flows, for every pair N-delta
-				est_f_max = {
-					'mesh': 0.0,
-					'rnd_mesh': 0.0,
-					'ring': 0.0,
-					'rnd_ring': 0.0
-				}
-				# Estimated computational times, for every pair N-delta
-				est_time = {
-					'mesh': 0.0,
-					'rnd_mesh': 0.0,
-					'ring': 0.0,
-					'rnd_ring': 0.0
-				}
-				# For each pair, I repeat more times the simulation
-				for s in range(n_simulations):
-					# Creating traffic matrix
-					traffic_matrix = tm.random_TM_2(n, low_traffic[0], low_traffic[1], high_traffic[0], high_traffic[1], p)
-					# Experiment number
-					exp = 'Exp #%s, Sim #%s - ' % (str(t).zfill(2), str(s).zfill(2))
-					# Information strings
-					exp_info = '%sN = %d, delta = %d' % (exp, n, delta)
-					mesh_title = '%sMesh LTD' % (exp)
-					ring_title = '%sRing LTD' % (exp)
-					random_mesh_title = '%sRandom vs Mesh' % (exp)
-					random_ring_title = '%sRandom vs Ring' % (exp)
-					print('\n\n%s' % (exp_info))
-					# SOL 1 - Mesh vs Random
-					T1 = None
-					# While loop trick, in order to avoid traffic matrixes for which the Mesh algorithm fails (very rare!)
-					while T1 is None:
-						T1 = L2.greedy_LTD_mesh(n, traffic_matrix, delta, delta, mesh_title, userView = False, withLabels = False)
-						if T1 is None:
-							traffic_matrix = tm.random_TM(n, 0.5, 1.5)
-					est_f_max['mesh'] += T1['max_flow']
-					est_time['mesh'] += T1['time']
-					T1_bis = L2.LTD_random(n, len(T1['topology'].edges()), delta, delta, traffic_matrix, random_mesh_title, userView = False, withLabels = False)
-					est_f_max['rnd_mesh'] += T1_bis['max_flow']
-					est_time['rnd_mesh'] += T1_bis['time']
-					# SOL 2 - Ring vs Random
-					T2 = L2.greedy_LTD_ring(n, traffic_matrix, delta, delta, ring_title, userView = False, withLabels = False)
-					est_f_max['ring'] += T2['max_flow']
-					est_time['ring'] += T2['time']
-					T2_bis = L2.LTD_random(n, len(T2['topology'].edges()), delta, delta, traffic_matrix, random_ring_title, userView = False, withLabels = False)
-					est_f_max['rnd_ring'] += T2_bis['max_flow']
-					est_time['rnd_ring'] += T2_bis['time']
-				# Compute estimates (mean value) and print results on the output file
-				fp.write('\n=> Test #%s: N = %d, delta = %d\n' % (str(t).zfill(2), n, delta))
+				# For each pair, I repeat more times the simulation (see "sweep_utilities.adaptive_simulations")
+				if distributed is not None:
+					stats = distributed.pop(0)
+				else:
+					stats = sw.adaptive_simulations(lambda s: simulation(n, delta, t, s), keys, tolerance, min_simulations, max_simulations)
+				# Print estimates (mean values, with the half width of their 95% confidence interval) on the output file
+				fp.write('\n=> Test #%s: N = %d, delta = %d (%d simulations)\n' % (str(t).zfill(2), n, delta, stats['mesh'].n))
 				fp.write('Max flow values, with computation times:\n')
-				for k in est_f_max.keys():
-					est_f_max[k] = round(est_f_max[k] / n_simulations, 2)
-					est_time[k] = round(est_time[k] / n_simulations, 2)
-					fp.write('%s = %g (%s s)\n' % (k.capitalize(), est_f_max[k], str(est_time[k]) if est_time[k] > 0.0 else '< 0.01'))
+				for k in ('mesh', 'rnd_mesh', 'ring', 'rnd_ring'):
+					est_f_max = round(stats[k].mean, 2)
+					est_time = round(stats[k + '_time'].mean, 2)
+					fp.write('%s = %g +- %g (%s s)\n' % (k.capitalize(), est_f_max, round(stats[k].half_width(), 2), str(est_time) if est_time > 0.0 else '< 0.01'))
 				# Next test
 				t += 1
 except IOError:
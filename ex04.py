@@ -1,6 +1,8 @@
+import sys
 import LAB2_OpRes as L2
-import graph_traffic_matrix as tm
 import flow_utilities as flows
+import sweep_utilities as sw
+import sweep_cluster as scl
 
 intro = 'LAB 02 - Ex. 04\nWe are going to test and compare the traffic routing over a Manhattan topology\nTraffic matrix values are in range [0.5; 1.5]'
 print(intro)
@@ -10,8 +12,47 @@ ns  = [9, 12, 16, 20, 25, 30, 36, 40]
 nrs = [3,  4,  4,  5,  5,  6,  6,  8]
 ncs = [3,  3,  4,  4,  5,  5,  6,  5]
 delta = 4
-# For every N, I o a certain number of simulations
-n_simulations = 4
+# For every N, I repeat the simulation until the 95% confidence interval of the max flow is within "tolerance"
+# (relative to its mean), doing at least "min_simulations" and at most "max_simulations" of them
+min_simulations = 3
+max_simulations = 20
+tolerance = 0.05
+
+# Distributed mode (see "sweep_cluster"): "python ex04.py coordinator <port | shared directory>" hands out the simulations
+# to the workers, started on other hosts by "python sweep_cluster.py <coordinator host>:<port | shared directory>"
+coordinator = scl.coordinator_from_args(sys.argv[1:])
+
+
+def simulation(n, nr, nc, t, s):
+	'''
+	Simulation #s of the test #t: it solves the LTD problem for a new traffic matrix, and returns the max flow
+	and the computational time (None, if a solution is not found)
+	'''
+	# Creating traffic matrix: it is seeded by the test and simulation numbers, as in the distributed mode
+	# (see "sweep_cluster.traffic_matrix")
+	traffic_matrix = scl.traffic_matrix(n, [0.5, 1.5], (t - 1) * scl.CELL_SEEDS + s)
+	# Experiment number
+	exp = 'Exp #%s, Sim #%s - ' % (str(t).zfill(2), str(s).zfill(2))
+	# Information strings
+	exp_info = '%sN = %d, Nr = %d, Nc = %d' % (exp, n, nr, nc)
+	title = '%sManhattan LTD' % (exp)
+	print('\n\n%s' % (exp_info))
+	# SOLUTION
+	T = L2.LTD_manhattan(n, nr, nc, traffic_matrix, title, False, False)
+	if T is None:
+		return None
+	return {'max_flow': T['max_flow'], 'time': T['time']}
+
+
+# DISTRIBUTED SIMULATIONS
+distributed = None
+if coordinator is not None:
+	cells = [[{'algorithm': 'manhattan', 'n': ns[i], 'delta': delta, 'parameters': {'nr': nrs[i], 'nc': ncs[i]}}] for i in range(len(ns))]
+	distributed = scl.distributed_simulations(coordinator, cells, ['manhattan'], tolerance, min_simulations, max_simulations)
+	# Same metrics of "simulation"
+	distributed = [{'max_flow': x['manhattan'], 'time': x['manhattan_time']} for x in distributed]
+	coordinator.close()
+
 
 # TEST
 # Open (write mode) the output file, in which I print the obtained results 
@@ -26,29 +67,16 @@ try:
 			# Obtain the number of nodes per row/column
 			nr = nrs[i]
 			nc = ncs[i]
-			# Estimated max flow, for every N
-			est_f_max = 0.0
-			# Estimated computational time, for every N
-			est_time = 0.0
-			# For every N-nodes topology, I repeat the simulation several times
-			for s in range(n_simulations):
-				# Creating traffic matrix
-				traffic_matrix = tm.random_TM(n, 0.5, 1.5)
-				# Experiment number
-				exp = 'Exp #%s, Sim #%s - ' % (str(t).zfill(2), str(s).zfill(2))
-				# Information strings
-				exp_info = '%sN = %d, Nr = %d, Nc = %d' % (exp, n, nr, nc)
-				title = '%sManhattan LTD' % (exp)
-				print('\n\n%s' % (exp_info))
-				# SOLUTION
-				T = L2.LTD_manhattan(n, nr, nc, traffic_matrix, title, False, False)
-				est_f_max += T['max_flow']
-				est_time += T['time']
-			# Compute estimates (mean value) and output on file
-			fp.write('\n=> Test #%s: N = %d, Nr = %d, Nc = %d\n' % (str(t).zfill(2), n, nr, nc))
-			est_f_max = round(est_f_max / n_simulations, 2)
-			est_time = round(est_time / n_simulations, 2)
-			fp.write('Max flow value: %f\nComputation time: %f\n' % (est_f_max, est_time))
+			# For every N-nodes topology, I repeat the simulation several times (see "sweep_utilities.adaptive_simulations")
+			if distributed is not None:
+				stats = distributed[i]
+			else:
+				stats = sw.adaptive_simulations(lambda s: simulation(n, nr, nc, t, s), ['max_flow'], tolerance, min_simulations, max_simulations)
+			# Output estimates (mean values, with the half width of the 95% confidence interval of the max flow) on file
+			fp.write('\n=> Test #%s: N = %d, Nr = %d, Nc = %d (%d simulations)\n' % (str(t).zfill(2), n, nr, nc, stats['max_flow'].n))
+			est_f_max = round(stats['max_flow'].mean, 2)
+			est_time = round(stats['time'].mean, 2)
+			fp.write('Max flow value: %f +- %f\nComputation time: %f\n' % (est_f_max, round(stats['max_flow'].half_width(), 2), est_time))
 			# Next test 
 			t += 1
 except IOError:
@@ -1,6 +1,8 @@
+import sys
 import LAB2_OpRes as L2
-import graph_traffic_matrix as tm
 import flow_utilities as flows
+import sweep_utilities as sw
+import sweep_cluster as scl
 
 intro = 'LAB 02 - Ex. 05\nWe are going to test and compare the traffic routing over a Manhattan topology\nTraffic matrix values are in range [0.5; 1.5]'
 print(intro)
@@ -10,12 +12,57 @@ ns  = [9, 12, 16, 20, 25, 30, 36, 40]
 nrs = [3,  4,  4,  5,  5,  6,  6,  8]
 ncs = [3,  3,  4,  4,  5,  5,  6,  5]
 delta = 4
-# For every N value I do several simulations
-n_simulations = 4
+# For every N value I repeat the simulation until the 95% confidence intervals of the max flows are within
+# "tolerance" (relative to their mean), doing at least "min_simulations" and at most "max_simulations" of them
+min_simulations = 3
+max_simulations = 20
+tolerance = 0.05
+
+# Distributed mode (see "sweep_cluster"): "python ex05.py coordinator <port | shared directory>" hands out the simulations
+# to the workers, started on other hosts by "python sweep_cluster.py <coordinator host>:<port | shared directory>"
+coordinator = scl.coordinator_from_args(sys.argv[1:])
 
 # PLEASE NOTE
 # We will call "A" the first non-optimized solution (same as ex04), "B" the optimized one
 
+
+def simulation(n, nr, nc, t, s):
+	'''
+	Simulation #s of the test #t: it solves the LTD problem for a new traffic matrix, and returns the max flows
+	and the computational times of the solutions "A" and "B" (None, if one of them is not found)
+	'''
+	# Compute traffic matrix (same for A and B): it is seeded by the test and simulation numbers, as in the
+	# distributed mode (see "sweep_cluster.traffic_matrix")
+	traffic_matrix = scl.traffic_matrix(n, [0.5, 1.5], (t - 1) * scl.CELL_SEEDS + s)
+	# Experiment number
+	exp = 'Exp #%s, Sim #%s - ' % (str(t).zfill(2), str(s).zfill(2))
+	# Information strings
+	exp_info = '%sN = %d, Nr = %d, Nc = %d' % (exp, n, nr, nc)
+	title = '%sManhattan LTD' % (exp)
+	print('\n\n%s' % (exp_info))
+	# SOLUTION
+	# Non-optimized
+	T_A = L2.LTD_manhattan(n, nr, nc, traffic_matrix, title, False, False)
+	# Optimized
+	title = '%sManhattan LTD Smart' % (exp)
+	T_B = L2.LTD_manhattan_smart(n, nr, nc, traffic_matrix, title, False, False)
+	if T_A is None or T_B is None:
+		return None
+	return {'A': T_A['max_flow'], 'A_time': T_A['time'], 'B': T_B['max_flow'], 'B_time': T_B['time']}
+
+
+# DISTRIBUTED SIMULATIONS
+distributed = None
+if coordinator is not None:
+	cells = []
+	for i in range(len(ns)):
+		parameters = {'nr': nrs[i], 'nc': ncs[i]}
+		cells.append([{'name': 'A', 'algorithm': 'manhattan', 'n': ns[i], 'delta': delta, 'parameters': parameters},
+			{'name': 'B', 'algorithm': 'manhattan_smart', 'n': ns[i], 'delta': delta, 'parameters': parameters}])
+	distributed = scl.distributed_simulations(coordinator, cells, ['A', 'B'], tolerance, min_simulations, max_simulations)
+	coordinator.close()
+
+
 # TEST
 # Open output file in read mode
 res_file = 'res/results.txt'
@@ -29,40 +76,17 @@ try:
 			# Retrieve number of nodes per row/column
 			nr = nrs[i]
 			nc = ncs[i]
-			# Estimated max flow, for every N
-			est_f_max_A = 0.0
-			est_f_max_B = 0.0
-			# Estimated computational time, for each N
-			est_time_A = 0.0
-			est_time_B = 0.0
-			# FOr every N-nodes topology, repeat th simulation several times
-			for s in range(n_simulations):
-				# Compute traffic matrix (same for A and B)
-				traffic_matrix = tm.random_TM(n, 0.5, 1.5)
-				# Experiment number
-				exp = 'Exp #%s, Sim #%s - ' % (str(t).zfill(2), str(s).zfill(2))
-				# Information strings
-				exp_info = '%sN = %d, Nr = %d, Nc = %d' % (exp, n, nr, nc)
-				title = '%sManhattan LTD' % (exp)
-				print('\n\n%s' % (exp_info))
-				# SOLUTION
-				# Non-optimized
-				T_A = L2.LTD_manhattan(n, nr, nc, traffic_matrix, title, False, False)
-				est_f_max_A += T_A['max_flow']
-				est_time_A += T_A['time']
-				# Optimized
-				title = '%sManhattan LTD Smart' % (exp)
-				T_B = L2.LTD_manhattan_smart(n, nr, nc, traffic_matrix, title, False, False)
-				est_f_max_B += T_B['max_flow']
-				est_time_B += T_B['time']
-			# Compute estimates (mean values) and output on file
-			fp.write('\n=> Test #%s: N = %d, Nr = %d, Nc = %d\n' % (str(t).zfill(2), n, nr, nc))
-			est_f_max_A = round(est_f_max_A / n_simulations, 2)
-			est_time_A = round(est_time_A / n_simulations, 2)
-			est_f_max_B = round(est_f_max_B / n_simulations, 2)
-			est_time_B = round(est_time_B / n_simulations, 2)
-			fp.write('A) Max flow value: %f\nComputation time: %f\n' % (est_f_max_A, est_time_A))
-			fp.write('B) Max flow value: %f\nComputation time: %f\n' % (est_f_max_B, est_time_B))
+			# For every N-nodes topology, repeat the simulation several times (see "sweep_utilities.adaptive_simulations")
+			if distributed is not None:
+				stats = distributed[i]
+			else:
+				stats = sw.adaptive_simulations(lambda s: simulation(n, nr, nc, t, s), ['A', 'B'], tolerance, min_simulations, max_simulations)
+			# Output estimates (mean values, with the half width of the 95% confidence interval of the max flows) on file
+			fp.write('\n=> Test #%s: N = %d, Nr = %d, Nc = %d (%d simulations)\n' % (str(t).zfill(2), n, nr, nc, stats['A'].n))
+			for k in ('A', 'B'):
+				est_f_max = round(stats[k].mean, 2)
+				est_time = round(stats[k + '_time'].mean, 2)
+				fp.write('%s) Max flow value: %f +- %f\nComputation time: %f\n' % (k, est_f_max, round(stats[k].half_width(), 2), est_time))
 			# Next test 
 			t += 1
 except IOError:
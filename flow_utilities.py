@@ -1,4 +1,8 @@
+import time
+from collections import deque
+import numpy
 import networkx as nx
+import kernels
 
 
 def max_flow(G):
@@ -47,10 +51,86 @@ def min_flow(G):
 	# Result
 	return (f_min, e_max)
 
-def complete_water_fill(G, traffic_matrix, depth = 6):
+def flow_stats(G, bins = 10):
+	'''
+	This function returns, with a single pass over the G's edges, the statistics of their flow values:
+	- 'max', 'min', 'mean': maximum, minimum and mean flow
+	- 'p50', 'p95', 'p99': 50th, 95th and 99th percentile of the flows
+	- 'max_edge', 'min_edge': edge with the maximum (minimum) flow, the same returned by "max_flow" ("min_flow")
+	- 'max_edges': list of all the edges with the maximum flow
+	- 'histogram': pair (counts, bin edges) of the flow values distribution, over "bins" bins
+	If G has no edges, all the values are None
+	'''
+	edges = G.edges()
+	if len(edges) == 0:
+		return dict((k, None) for k in ('max', 'min', 'mean', 'p50', 'p95', 'p99', 'max_edge', 'min_edge', 'max_edges', 'histogram'))
+	loads = numpy.fromiter((G.edge[u][v]['flow'] for (u, v) in edges), dtype = float, count = len(edges))
+	# First occurrences, as in "max_flow" and "min_flow"
+	i_max = int(numpy.argmax(loads))
+	i_min = int(numpy.argmin(loads))
+	p50, p95, p99 = numpy.percentile(loads, [50, 95, 99])
+	counts, bin_edges = numpy.histogram(loads, bins)
+	return {
+		'max': float(loads[i_max]),
+		'min': float(loads[i_min]),
+		'mean': float(loads.mean()),
+		'p50': float(p50),
+		'p95': float(p95),
+		'p99': float(p99),
+		'max_edge': edges[i_max],
+		'min_edge': edges[i_min],
+		'max_edges': [edges[i] for i in numpy.flatnonzero(loads == loads[i_max])],
+		'histogram': (counts.tolist(), bin_edges.tolist())
+	}
+
+def max_flow_lower_bound(traffic_matrix, delta_in, delta_out):
+	'''
+	This function returns a lower bound on the max flow of any topology satisfying the delta constraints,
+	for the given traffic matrix. It is the highest value between:
+	- the traffic sent (received) by a node, divided by the number of its transmitters (receivers)
+	- the minimum total "flow x hops" load (Moore bound: a node reaches at most delta^h nodes at h hops,
+	  so its largest demands are at best 1 hop away, the next ones 2 hops away...), divided by the
+	  maximum number of edges
+	'''
+	# Utility functions
+	def moore_load(values, delta):
+		'''
+		Minimum "flow x hops" load for the traffic values of a node, having "delta" edges
+		'''
+		load = 0.0
+		hops = 1
+		layer = delta
+		left = layer
+		for x in sorted(values, reverse = True):
+			if left == 0:
+				# Next hop: the layer of reachable nodes is "delta" times bigger
+				hops += 1
+				layer *= delta
+				left = layer
+			load += x * hops
+			left -= 1
+		return load
+
+	n = len(traffic_matrix)
+	if n < 2:
+		return 0.0
+	# Traffic sent and received by every node (self-loops excluded)
+	sent = [[traffic_matrix[u][v] for v in range(n) if v != u] for u in range(n)]
+	received = [[traffic_matrix[u][v] for u in range(n) if u != v] for v in range(n)]
+	# Bound on the edges of a single node
+	node_bound = max(max(sum(x) for x in sent) / float(min(delta_out, n - 1)), max(sum(x) for x in received) / float(min(delta_in, n - 1)))
+	# Bound on the total load of the topology
+	total_load = max(sum(moore_load(x, delta_out) for x in sent), sum(moore_load(x, delta_in) for x in received))
+	max_edges = n * min(delta_in, delta_out, n - 1)
+	# Result
+	return max(node_bound, total_load / max_edges)
+
+def complete_water_fill(G, traffic_matrix, depth = 6, state = None):
 	'''
 	Load flow values for the G's edges, according to the water filling principle and values indicated
-	into the traffic matrix
+	into the traffic matrix.
+	If a routing "state" (see "new_routing_state") is specified, the flow contributions of every demand
+	are saved into it, so that the routing can be incrementally updated later
 	'''
 	nodes = G.nodes()
 	# Attach flows to edges
@@ -59,39 +139,331 @@ def complete_water_fill(G, traffic_matrix, depth = 6):
 			# Flow to assign is traffic u->v: it must be a positive number
 			f = traffic_matrix[u][v]
 			if f > 0:
-				# If nodes u and v are already connected by an edge, I can directly assign to it the flow
-				if G.edge[u].has_key(v):
-					G.edge[u][v]['flow'] += f
-				else:
-					# Paths between u and v
-					# To avoid memory problems, the search depth is limited
-					max_depth = len(G.nodes()) - 1
-					found = False
-					while not found:
-						paths = list(nx.all_simple_paths(G, u, v, cutoff = depth))
-						found = len(paths) > 0
-						# If no path is found, I try to go deeper
-						if not found:
-							if depth < max_depth:
-								depth = min(depth + 3, max_depth)
-							else:
-								# There are not paths between the nodes u and v: exit from the loop
-								break
-					if not found:
-						# Error: "u" and "v" are not connected each other
-						G = None
-					else:
-						# Distribute f over edges of every found path
-						G = water_fill(G, paths, f)
+				# The search depth reached for this demand is kept for the next ones
+				depth = route_demand(G, u, v, f, depth, state)
+				if depth is None:
+					# Error: "u" and "v" are not connected each other
+					return None
+	return G
+
+def ecmp_routing(G, traffic_matrix):
+	'''
+	Load flow values for the G's edges, splitting every demand of the traffic matrix evenly over all the
+	shortest paths (in number of hops) between its nodes (ECMP).
+	For every source a single BFS computes distances and numbers of shortest paths; then demands are
+	back-propagated over the shortest paths DAG (as in Brandes' betweenness algorithm), accumulating edges'
+	flows without listing any path: O(N*E) in total. It returns None if a demand cannot be routed
+	'''
+	nodes = G.nodes()
+	for s in nodes:
+		order, sigma, preds = shortest_paths_dag(G, s)
+		# Every demand must be routed
+		for t in nodes:
+			if t not in sigma and traffic_matrix[s][t] > 0:
+				# Error: "s" and "t" are not connected each other
+				return None
+		# Back-propagation, starting from the farthest nodes:
+		# "through[w]" is the flow entering "w" and directed to farther nodes
+		through = dict.fromkeys(order, 0.0)
+		for w in reversed(order):
+			f = through[w]
+			if w != s and traffic_matrix[s][w] > 0:
+				f += traffic_matrix[s][w]
+			# Every shortest path to "w" carries the same flow
+			for v in preds[w]:
+				x = f * sigma[v] / float(sigma[w])
+				G.edge[v][w]['flow'] += x
+				through[v] += x
 	return G
 
+def shortest_paths_dag(G, s):
+	'''
+	Single BFS from the node "s": it returns the reached nodes (in BFS order), the number of shortest paths
+	from "s" to every reached node and, for every reached node, its predecessors on these shortest paths
+	'''
+	dist = {s: 0}
+	sigma = {s: 1}
+	preds = {s: []}
+	order = []
+	queue = deque([s])
+	while len(queue) > 0:
+		v = queue.popleft()
+		order.append(v)
+		for w in G.edge[v]:
+			if w not in dist:
+				dist[w] = dist[v] + 1
+				sigma[w] = 0
+				preds[w] = []
+				queue.append(w)
+			if dist[w] == dist[v] + 1:
+				sigma[w] += sigma[v]
+				preds[w].append(v)
+	# Result
+	return (order, sigma, preds)
+
+def route(G, traffic_matrix, routing = 'water_fill', depth = 6, state = None):
+	'''
+	Load flow values for the G's edges, according to the specified routing mode:
+	- 'water_fill': water filling over the simple paths, up to "depth" hops (see "complete_water_fill");
+	  if specified, the routing "state" is saved
+	- 'ecmp': even split over the shortest paths (see "ecmp_routing")
+	'''
+	if routing == 'water_fill':
+		return complete_water_fill(G, traffic_matrix, depth, state)
+	if routing == 'ecmp':
+		return ecmp_routing(G, traffic_matrix)
+	raise ValueError('the routing mode "%s" is invalid: it must be \'water_fill\' or \'ecmp\'' % (routing))
+
+def find_paths(G, u, v, depth = 6):
+	'''
+	Paths between u and v, returned together with the search depth used to find them.
+	To avoid memory problems the search depth is limited: it is increased only if no path is found
+	(an empty list of paths means that "u" and "v" are not connected each other)
+	'''
+	max_depth = len(G.nodes()) - 1
+	while True:
+		paths = list(nx.all_simple_paths(G, u, v, cutoff = depth))
+		# If no path is found, I try to go deeper
+		if len(paths) > 0 or depth >= max_depth:
+			break
+		depth = min(depth + 3, max_depth)
+	# Result
+	return (paths, depth)
+
+def route_demand(G, u, v, f, depth = 6, state = None):
+	'''
+	This function routes the traffic "f" from u to v: if the nodes are connected by an edge, the flow is
+	directly assigned to it, otherwise it is distributed over the paths between them (water filling).
+	It returns the search depth used to find the paths, or None if "u" and "v" are not connected.
+	If specified, the edges' flow contributions of the demand are saved into the routing "state"
+	'''
+	if G.edge[u].has_key(v):
+		# Direct edge
+		G.edge[u][v]['flow'] += f
+		loads = {(u, v): f}
+	else:
+		paths, depth = find_paths(G, u, v, depth)
+		if len(paths) == 0:
+			return None
+		# Edges crossed by the paths, and their flows before the routing of the demand
+		edges = set()
+		for p in paths:
+			for j in range(len(p) - 1):
+				edges.add((p[j], p[j+1]))
+		before = dict((e, G.edge[e[0]][e[1]]['flow']) for e in edges)
+		# Distribute f over edges of every found path
+		water_fill(G, paths, f)
+		loads = dict((e, G.edge[e[0]][e[1]]['flow'] - before[e]) for e in edges)
+	# Save the contributions of the demand
+	if state is not None:
+		state['demands'][(u, v)] = loads
+		state['traffic'][(u, v)] = f
+		for e in loads:
+			state['edges'].setdefault(e, set()).add((u, v))
+	return depth
+
+def new_routing_state():
+	'''
+	Returns an empty routing state: for every routed demand (u, v) it stores its traffic value ("traffic")
+	and the flow loaded on each edge ("demands"), and for every edge the demands crossing it ("edges")
+	'''
+	return {
+		'demands': {},
+		'edges': {},
+		'traffic': {}
+	}
+
+def copy_routing_state(state):
+	'''
+	Returns a copy of the routing state, which can be updated without modifying the original one
+	'''
+	return {
+		'demands': dict((d, dict(loads)) for d, loads in state['demands'].items()),
+		'edges': dict((e, set(x)) for e, x in state['edges'].items()),
+		'traffic': dict(state['traffic'])
+	}
+
+def unroute_demand(G, state, d):
+	'''
+	This function removes from the G's edges the flow contributions of the demand "d" (pair of nodes),
+	according to the routing state. It returns these contributions (None if "d" is not routed)
+	'''
+	state['traffic'].pop(d, None)
+	loads = state['demands'].pop(d, None)
+	if loads is not None:
+		for e, x in loads.items():
+			G.edge[e[0]][e[1]]['flow'] -= x
+			state['edges'][e].discard(d)
+	return loads
+
+def scale_demand(G, state, d, f):
+	'''
+	This function changes to "f" the traffic value of the routed demand "d" (pair of nodes), scaling its flow
+	contributions on the same edges of its previous routing (see "route_demand")
+	'''
+	factor = float(f) / state['traffic'][d]
+	loads = state['demands'][d]
+	for e, x in loads.items():
+		loads[e] = x * factor
+		G.edge[e[0]][e[1]]['flow'] += loads[e] - x
+	state['traffic'][d] = f
+
+def update_routing(G, state, traffic_matrix, removed = (), added = (), depth = 6, skip_disconnected = False, bound = None, deadline = None):
+	'''
+	Incremental routing: this function removes from G the edges in "removed" and adds the ones in "added",
+	re-routing only the demands which were crossing a removed edge or which can be directly assigned to
+	an added edge. It returns the information needed by "restore_routing" to undo the update (including the
+	edges' flows before it, restored exactly), or None if a demand cannot be routed anymore (in that case, G and
+	its routing state are unchanged).
+	If "skip_disconnected" is True, the demands which cannot be routed anymore are left unrouted instead,
+	and listed in the key "disconnected" of the returned information.
+	If "bound" is specified, the update is undone (and None is returned) as soon as an edge's flow reaches it: flows
+	only grow while the demands are re-routed, so the max flow of the updated topology could not be lower than "bound".
+	In the same way, it is undone if the time "deadline" (as returned by time.time()) is reached
+	'''
+	# Demands to re-route
+	affected = set()
+	for e in removed:
+		affected |= state['edges'].get(e, set())
+	for (u, v) in added:
+		if traffic_matrix[u][v] > 0:
+			affected.add((u, v))
+	# Remove their flows from the topology (in a fixed order, the result does not depend on the set's order)
+	update = {
+		'removed': list(removed),
+		'added': list(added),
+		'flows': dict(((u, v), x['flow']) for (u, v, x) in G.edges_iter(data = True)),
+		'demands': {},
+		'traffic': {},
+		'disconnected': []
+	}
+	for d in sorted(affected):
+		update['traffic'][d] = state['traffic'].get(d)
+		update['demands'][d] = unroute_demand(G, state, d)
+	# Change the topology
+	for (u, v) in removed:
+		G.remove_edge(u, v)
+		state['edges'].pop((u, v), None)
+	for (u, v) in added:
+		G.add_edge(u, v, flow = 0.0)
+	if bound is not None and len(G.edges()) > 0 and max_flow(G)[0] >= bound:
+		restore_routing(G, state, update)
+		return None
+	# Route again the affected demands (same order of "complete_water_fill")
+	for (u, v) in sorted(affected):
+		if route_demand(G, u, v, traffic_matrix[u][v], depth, state) is None:
+			# Some nodes are not connected anymore
+			if skip_disconnected:
+				update['disconnected'].append((u, v))
+				continue
+			restore_routing(G, state, update)
+			return None
+		if bound is not None and max(G.edge[e[0]][e[1]]['flow'] for e in state['demands'][(u, v)]) >= bound:
+			restore_routing(G, state, update)
+			return None
+		if deadline is not None and time.time() >= deadline:
+			restore_routing(G, state, update)
+			return None
+	# Result
+	return update
+
+def restore_routing(G, state, update):
+	'''
+	This function undoes a routing update (see "update_routing"), restoring the previous topology and flows:
+	the flows saved by the update are assigned back, so that no rounding error is accumulated by a sequence of
+	updates and restorations (e.g. in "link_failures")
+	'''
+	# Remove the new flows of the re-routed demands
+	for d in update['demands']:
+		unroute_demand(G, state, d)
+	# Restore the previous topology
+	for (u, v) in update['added']:
+		G.remove_edge(u, v)
+		state['edges'].pop((u, v), None)
+	for (u, v) in update['removed']:
+		G.add_edge(u, v, flow = 0.0)
+	# Restore the previous flows
+	for (u, v), x in update['flows'].items():
+		G.edge[u][v]['flow'] = x
+	for d, loads in update['demands'].items():
+		if loads is not None:
+			for e in loads:
+				state['edges'].setdefault(e, set()).add(d)
+			state['demands'][d] = loads
+			state['traffic'][d] = update['traffic'][d]
+
+def link_failures(G, state, traffic_matrix, edges = None, depth = 6):
+	'''
+	Single-link failure analysis of the routed topology G (with its routing "state", see "complete_water_fill"):
+	every edge in "edges" (default: all the G's edges) is removed in turn, re-routing only the demands
+	crossing it (see "update_routing"), and then restored. It returns a dictionary edge -> (max flow,
+	list of the demands which cannot be routed without the edge); the max flow is None if no edge is left
+	'''
+	if edges is None:
+		edges = G.edges()
+	res = {}
+	for e in edges:
+		update = update_routing(G, state, traffic_matrix, removed = [e], depth = depth, skip_disconnected = True)
+		res[e] = (max_flow(G)[0], update['disconnected'])
+		restore_routing(G, state, update)
+	# Result
+	return res
+
+def routing_state_to_arrays(state):
+	'''
+	This function converts a routing state (see "new_routing_state") into numpy arrays, which can be saved or
+	shared between processes (see "shared_arrays"):
+	- "demands": routed demands (int32, shape (k, 2)), and their traffic values ("traffic", float64)
+	- "loads": flow contributions of the demands (float64), on the edges "load_edges" (int32, shape (m, 2));
+	  the ones of demand i are in positions load_offsets[i]:load_offsets[i+1] ("load_offsets", int64)
+	'''
+	demands = sorted(state['demands'])
+	load_edges = []
+	loads = []
+	load_offsets = [0]
+	for d in demands:
+		for (e, x) in state['demands'][d].items():
+			load_edges.append(e)
+			loads.append(x)
+		load_offsets.append(len(loads))
+	return {
+		'demands': numpy.array(demands, dtype = numpy.int32).reshape(-1, 2),
+		'traffic': numpy.array([state['traffic'][d] for d in demands], dtype = numpy.float64),
+		'load_edges': numpy.array(load_edges, dtype = numpy.int32).reshape(-1, 2),
+		'loads': numpy.array(loads, dtype = numpy.float64),
+		'load_offsets': numpy.array(load_offsets, dtype = numpy.int64)
+	}
+
+def routing_state_from_arrays(data):
+	'''
+	This function rebuilds a routing state from its array form (see "routing_state_to_arrays")
+	'''
+	state = new_routing_state()
+	demands = [tuple(d) for d in data['demands'].tolist()]
+	load_edges = [tuple(e) for e in data['load_edges'].tolist()]
+	loads = data['loads'].tolist()
+	load_offsets = data['load_offsets'].tolist()
+	for (i, (d, f)) in enumerate(zip(demands, data['traffic'].tolist())):
+		a = load_offsets[i]
+		b = load_offsets[i+1]
+		state['demands'][d] = dict(zip(load_edges[a:b], loads[a:b]))
+		state['traffic'][d] = f
+		for e in load_edges[a:b]:
+			state['edges'].setdefault(e, set()).add(d)
+	return state
+
 def water_fill(T, paths, f):
 	'''
 	This function loads edges of the specified "paths" belonging to the graph "T", according to the
 	flow value "f"; the first path to be loaded is the one whose max flow value (between its edges' flow
 	values) is the lowest one.
 	=>  Water filling: emulates the increasing water level, while it covers (for example) steps of a 
-	ladder. Steps' height differences are progressively hidden
+	ladder. Steps' height differences are progressively hidden.
+	The final water level is computed in a single pass over the sorted paths (sum of the covered steps' heights),
+	then the edges of every loaded path receive their flow quota at once.
+	With the 'numba' backend (see "kernels.BACKEND"), the paths are converted to the array layout of
+	"kernels.water_fill_arrays" and loaded by the compiled kernel; otherwise the walk over the graph's
+	attributes is faster than the conversion. Both give bit-identical flows
 	'''
 	# Utility functions
 	def path_max_flow(G, path):
@@ -134,67 +506,154 @@ def water_fill(T, paths, f):
 		# Result
 		return f_paths
 
+	def arrays_water_fill(G, paths, f):
+		'''
+		Water filling of the paths by "kernels.water_fill_arrays", on the indexes of the crossed edges
+		'''
+		index = {}
+		path_edges = []
+		offsets = [0]
+		for p in paths:
+			for j in range(len(p) - 1):
+				e = (p[j], p[j+1])
+				if e not in index:
+					index[e] = len(index)
+				path_edges.append(index[e])
+			offsets.append(len(path_edges))
+		edges = sorted(index, key = index.get)
+		load = numpy.array([G.edge[u][v]['flow'] for (u, v) in edges], dtype = float)
+		kernels.water_fill_arrays(load, numpy.array(path_edges, dtype = numpy.int64), numpy.array(offsets, dtype = numpy.int64), f)
+		for i, (u, v) in enumerate(edges):
+			G.edge[u][v]['flow'] = float(load[i])
+
 	# The flow to assign must be positive: otherwise, exit
-	if f > 0:
+	if f > 0 and kernels.BACKEND == 'numba':
+		arrays_water_fill(T, paths, f)
+	elif f > 0:
 		# First of all, evaluate the maximum flow values between path's edges (ordering by ascending flow value)
 		paths_with_flow = paths_max_flow(T, paths)
-		# "remaining_quota" is the flow portion we still have to assign
-		remaining_quota = f
-		# "paths_batch" is the number of paths we are loading, in the same moment
-		paths_batch = 1
-		# Now, redistribute the entire flow
-		while remaining_quota > 0:
-			# paths' flows are disposed as a ladder: every time I redistribute "f",
-			# first "paths_batch" steps of the ladder have the same height.
-			if paths_batch < len(paths):
-				# "step" is the height gap between the first non-leveled step of the ladder and the previous ones 
-				step = paths_with_flow[paths_batch]['max_flow'] - paths_with_flow[paths_batch-1]['max_flow']
-				# In order to fill this gap, these two steps must have different height
-				if step > 0:
-					# Now, I have to verify if the remaining quota cover entirely this gap
-					if step * paths_batch <= remaining_quota:
-						# Load flows, without any problems: the gap will be entirely covered
-						quota = step
-						remaining_quota -= step * paths_batch
-						# Loop over the batch of paths, on which I load their edges' flows
-						for i in range(paths_batch):
-							# Current path
-							p = paths_with_flow[i]['path']
-							# Loop over path's edges, attaching the flow
-							for j in range(len(p) - 1):
-								u = p[j]
-								v = p[j+1]
-								T.edge[u][v]['flow'] += quota							
-					else:
-						# Load flows, for the last time
-						# In fact, I know that I will not be able to fill the height gap
-						quota = float(remaining_quota) / paths_batch
-						# Loop over the batch of paths, on which I load their edges' flows
-						for i in range(paths_batch):
-							# Current path
-							p = paths_with_flow[i]['path']
-							# Loop over path'sedges, attaching them a flow
-							for j in range(len(p) - 1):
-								u = p[j]
-								v = p[j+1]
-								T.edge[u][v]['flow'] += quota
-				# New path in my batch
-				paths_batch += 1
-			else:
-				# If I have not covered every gap, but I still have flow to redistribute, 
-				# this will be assigned proportionally to every path 
-				quota = remaining_quota / paths_batch
-				# Loop over paths, on which I increment flow values
-				for x in paths_with_flow:
-					# Current path
-					p = x['path']
-					# Loop over path's edges, attaching them flow values
-					for j in range(len(p) - 1):
-						u = p[j]
-						v = p[j+1]
-						T.edge[u][v]['flow'] += quota
+		# Final water level, reached by the first "paths_batch" paths
+		paths_batch, level = water_level([x['max_flow'] for x in paths_with_flow], f)
+		# Load every path of the batch, exactly once
+		for i in range(paths_batch):
+			# Current path and the flow quota it receives
+			p = paths_with_flow[i]['path']
+			quota = level - paths_with_flow[i]['max_flow']
+			if quota > 0:
+				# Loop over path's edges, attaching the flow
+				for j in range(len(p) - 1):
+					u = p[j]
+					v = p[j+1]
+					T.edge[u][v]['flow'] += quota
 	return T
 
+def water_level(heights, f):
+	'''
+	Given the max flow values of the paths ("heights", in ascending order) and the flow "f" to distribute,
+	this function returns the number of paths reached by the water and the final water level.
+	paths' flows are disposed as a ladder: the water covers the first "paths_batch" steps of the ladder,
+	whose heights sum is "covered". Raising them up to the height "h" requires "h * paths_batch - covered" flow
+	'''
+	paths_batch = 1
+	covered = heights[0]
+	while paths_batch < len(heights):
+		# Flow needed to cover also the next step of the ladder
+		needed = heights[paths_batch] * paths_batch - covered
+		if needed > f:
+			break
+		covered += heights[paths_batch]
+		paths_batch += 1
+	# Result
+	return (paths_batch, float(f + covered) / paths_batch)
+
+def route_many(G, traffic_matrices, routing = 'water_fill', depth = 6):
+	'''
+	This function routes several traffic matrices over the same topology G (without modifying it).
+	It returns the list of G's edges and a numpy array (one row per traffic matrix, one column per edge)
+	with the edges' flow values, or None if a demand cannot be routed.
+	- 'water_fill' routing: paths between pairs of nodes are searched only once, then every traffic matrix
+	  is routed (as in "complete_water_fill") on its own row of the array
+	- 'ecmp' routing: it is linear in the demands, so the fraction of every demand crossing every edge is
+	  computed once (a demands x edges array) and the flows of all the traffic matrices are obtained by a single
+	  matrix product
+	'''
+	nodes = G.nodes()
+	edges = G.edges()
+	index = dict((e, i) for i, e in enumerate(edges))
+	k = len(traffic_matrices)
+	loads = numpy.zeros((k, len(edges)))
+	if routing == 'water_fill':
+		# Paths of every demand, as concatenated edges' indexes and offsets (see "kernels.water_fill_arrays")
+		demands = []
+		for u in nodes:
+			for v in nodes:
+				if max(tm[u][v] for tm in traffic_matrices) > 0:
+					if G.edge[u].has_key(v):
+						paths = [[u, v]]
+					else:
+						paths, depth = find_paths(G, u, v, depth)
+						if len(paths) == 0:
+							# Error: "u" and "v" are not connected each other
+							return None
+					path_edges = numpy.array([index[(p[j], p[j+1])] for p in paths for j in range(len(p) - 1)], dtype = numpy.int64)
+					offsets = numpy.cumsum([0] + [len(p) - 1 for p in paths]).astype(numpy.int64)
+					demands.append((u, v, path_edges, offsets))
+		# Route every traffic matrix
+		for i, tm in enumerate(traffic_matrices):
+			row = loads[i]
+			for (u, v, path_edges, offsets) in demands:
+				f = tm[u][v]
+				if f > 0:
+					if len(offsets) == 2:
+						row[path_edges] += f
+					else:
+						# Water filling, on the edges' indexes
+						kernels.water_fill_arrays(row, path_edges, offsets, f)
+	elif routing == 'ecmp':
+		# Traffic matrices as a single array: one row per traffic matrix, one column per demand (s * n + t)
+		n = len(nodes)
+		demand = numpy.array(traffic_matrices, dtype = float).reshape(k, n * n)
+		demand[demand < 0] = 0.0
+		demand[:, ::n + 1] = 0.0
+		# Fraction of every demand (row s * n + t) crossing every edge
+		fractions = numpy.zeros((n * n, len(edges)))
+		for s in nodes:
+			f = ecmp_fractions(G, s, index)
+			if f is None:
+				if demand[:, s * n:(s + 1) * n].max() > 0:
+					# Error: some nodes cannot be reached from "s"
+					return None
+				continue
+			fractions[s * n:(s + 1) * n] = f
+		# Flows of all the traffic matrices, with a single matrix product
+		loads = demand.dot(fractions)
+	else:
+		raise ValueError('the routing mode "%s" is invalid: it must be \'water_fill\' or \'ecmp\'' % (routing))
+	# Result
+	return (edges, loads)
+
+def ecmp_fractions(G, s, index):
+	'''
+	This function returns a numpy array (one row per destination, one column per edge of G, indexed as in "index")
+	with the fraction of the traffic from "s" to every destination crossing every edge, according to the
+	ECMP routing (see "ecmp_routing"). It returns None if some node cannot be reached from "s"
+	'''
+	n = len(G.nodes())
+	order, sigma, preds = shortest_paths_dag(G, s)
+	if len(order) < n:
+		return None
+	# Back-propagation of a unit demand for every destination at once:
+	# "through[w]" is the fraction of every demand entering "w"
+	res = numpy.zeros((n, len(index)))
+	through = numpy.zeros((n, n))
+	for w in reversed(order):
+		through[w, w] += 1.0
+		for v in preds[w]:
+			x = through[w] * (sigma[v] / float(sigma[w]))
+			res[:, index[(v, w)]] = x
+			through[v] += x
+	return res
+
 def get_flow_labels(G):
 	'''
 	Returns as a dictionary pairs "edge - flow", rounding its value at 2 decimal digits.
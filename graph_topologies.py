@@ -1,4 +1,5 @@
 import random
+import numpy
 import networkx as nx
 import input_controls as inc
 
@@ -61,13 +62,97 @@ def loaded_mesh_topology(n_nodes, traffic_matrix):
 	# Result
 	return G
 
-def random_topology(n_nodes, n_edges, delta_in, delta_out):
+def unloaded_copy(G):
+	'''
+	This function returns a copy of the topology G (same nodes and edges), whose edges' flow values are null
+	'''
+	return topology_from_edges(G.nodes(), G.edges())
+
+def topology_from_edges(nodes, edges):
+	'''
+	This function creates an oriented topology with the specified nodes and edges, whose flow values are null
+	'''
+	G = nx.DiGraph()
+	G.add_nodes_from(nodes)
+	for (u, v) in edges:
+		G.add_edge(u, v, flow = 0.0)
+	return G
+
+def topologies_to_arrays(topologies):
+	'''
+	This function converts a list of topologies (with integer nodes) into a compact binary form: a dictionary of
+	numpy arrays, with the nodes ("nodes", int32) and edges ("edges", int32 pairs) of all the topologies,
+	concatenated, their edges' flow values ("flows", float64, null if missing) and the position of the nodes
+	and edges of each topology ("node_offsets" and "edge_offsets": topology i has the nodes
+	nodes[node_offsets[i]:node_offsets[i+1]], and so on)
+	'''
+	nodes = []
+	edges = []
+	flows = []
+	node_offsets = [0]
+	edge_offsets = [0]
+	for G in topologies:
+		nodes.extend(G.nodes())
+		for (u, v) in G.edges():
+			edges.append((u, v))
+			flows.append(G.edge[u][v].get('flow', 0.0))
+		node_offsets.append(len(nodes))
+		edge_offsets.append(len(edges))
+	return {
+		'nodes': numpy.array(nodes, dtype = numpy.int32),
+		'edges': numpy.array(edges, dtype = numpy.int32).reshape((len(edges), 2)),
+		'flows': numpy.array(flows, dtype = numpy.float64),
+		'node_offsets': numpy.array(node_offsets, dtype = numpy.int64),
+		'edge_offsets': numpy.array(edge_offsets, dtype = numpy.int64)
+	}
+
+def topologies_from_arrays(data, indexes = None):
+	'''
+	This function rebuilds the topologies (with their flow values) from their binary form (see "topologies_to_arrays").
+	If "indexes" is specified, only the topologies in those positions are rebuilt
+	'''
+	nodes = data['nodes']
+	edges = data['edges']
+	flows = data['flows']
+	node_offsets = data['node_offsets']
+	edge_offsets = data['edge_offsets']
+	if indexes is None:
+		indexes = range(len(node_offsets) - 1)
+	res = []
+	for i in indexes:
+		G = nx.DiGraph()
+		G.add_nodes_from(nodes[node_offsets[i]:node_offsets[i+1]].tolist())
+		a = edge_offsets[i]
+		b = edge_offsets[i+1]
+		for ((u, v), f) in zip(edges[a:b].tolist(), flows[a:b].tolist()):
+			G.add_edge(u, v, flow = f)
+		res.append(G)
+	return res
+
+def write_topologies(fp, topologies):
+	'''
+	This function writes a list of topologies (with their flow values) into the binary file "fp", as a .npz
+	archive (see "topologies_to_arrays")
+	'''
+	numpy.savez(fp, **topologies_to_arrays(topologies))
+
+def read_topologies(fp, indexes = None):
+	'''
+	This function reads the topologies written by "write_topologies" into the binary file "fp"
+	(only the ones in the positions "indexes", if specified)
+	'''
+	with numpy.load(fp) as data:
+		return topologies_from_arrays(data, indexes)
+
+def random_topology(n_nodes, n_edges, delta_in, delta_out, seed = None):
 	'''
 	This function creates and returns an oriented graph, whose topology id randomly defined.
 	- "n_nodes" is the required number of nodes to create
 	- "n_edges" is the required number of edges to create
 	- "delta_in" is the constraint on the maximum number of receivers per node
 	- "delta_out" is the constraint on the maximum number of transmitters per node
+	- "seed": if specified, the topology is drawn from a private random generator initialized with it
+	  (the same seed always gives the same topology)
 	'''
 	# INPUT CONTROL
 	# I cannot obtain a feasible topology if:
@@ -81,13 +166,15 @@ def random_topology(n_nodes, n_edges, delta_in, delta_out):
 		print 'Less edges than a ring...'
 		return None
 
+	# Random generator
+	rnd = random if seed is None else random.Random(seed)
 	# Create oriented empty graph
 	G = nx.DiGraph()
 	# Nodes of the topology
 	nodes = range(n_nodes)
 	G.add_nodes_from(nodes)
 	# Starting ring topology (the order of the nodes disposal is random)
-	random.shuffle(nodes)
+	rnd.shuffle(nodes)
 	G.add_cycle(nodes, flow = 0.0)
 	# Creating possible edges
 	possible_edges = []
@@ -97,7 +184,7 @@ def random_topology(n_nodes, n_edges, delta_in, delta_out):
 			if u != v:
 				e = (u, v)
 				possible_edges.append(e)
-	random.shuffle(possible_edges)
+	rnd.shuffle(possible_edges)
 	# Add edges to the graph, until the "n_edges" constraint is satisfied
 	for e in possible_edges:
 		# If I have reached the required number of edges in the topology, I stop
@@ -125,7 +212,7 @@ def random_topology(n_nodes, n_edges, delta_in, delta_out):
 		candidate_both = filter(lambda x: x in candidate_vs, candidate_us)
 		# CASE 1: if a common candidate "z" exists, then I remove an edge "s-d" in order to create a path "s-z-d"
 		if len(candidate_both) > 0:
-			random.shuffle(candidate_both)
+			rnd.shuffle(candidate_both)
 			# Looking for a candidate "z" for which exists, in the topology, an edge "s-d" (with "s" and "d" different from "z")
 			for z in candidate_both:
 				for e in G.edges():
@@ -152,10 +239,10 @@ def random_topology(n_nodes, n_edges, delta_in, delta_out):
 						return True
 				return False
 			us_connected_to_v = filter(u_ok, candidate_us)
-			random.shuffle(us_connected_to_v)
+			rnd.shuffle(us_connected_to_v)
 			for u in us_connected_to_v:
 				vs_connected_to_u = filter(lambda x: G.edge[u].has_key(x), candidate_vs)
-				random.shuffle(vs_connected_to_u)
+				rnd.shuffle(vs_connected_to_u)
 				for v in vs_connected_to_u:
 					# Once defined "u" and "v", we look for an edge "s-d"
 					for e in G.edges():
@@ -182,8 +269,8 @@ def random_topology(n_nodes, n_edges, delta_in, delta_out):
 		if not found:
 			# CASE 3: third and last possible case (extremely rare). Previous alterations in the topology have created
 			# candidate "u"s and "v"s which can be directly connected by an edge u->v
-			random.shuffle(candidate_us)
-			random.shuffle(candidate_vs)
+			rnd.shuffle(candidate_us)
+			rnd.shuffle(candidate_vs)
 			# Look for a pair of nodes I can connect
 			for u in candidate_us:
 				for v in candidate_vs:
@@ -209,6 +296,7 @@ def manhattan_topology(r, c = None, derived = None):
 	- "c": number of nodes per row (default: "r")
 	- "derived": Manhattan topology from which compute the result (swap nodes)
 	=> In total, nodes in the topology are "n_nodes" = r*c
+	The grid position (column, -row) of every node is saved in the graph attribute "positions", used to draw it
 	'''
 	# INPUT CONTROL
 	if c is None:
@@ -267,6 +355,11 @@ def manhattan_topology(r, c = None, derived = None):
 				x_name = derived.node[x]['name']
 				# Create correct edge in the new topology (swapped node)
 				G.add_edge(n_name, x_name, flow = 0.0)
+	# Grid positions of the nodes
+	if derived is None:
+		G.graph['positions'] = dict((u, (u % c, -(u / c))) for u in nodes)
+	else:
+		G.graph['positions'] = dict((derived.node[p]['name'], (p % c, -(p / c))) for p in nodes)
 	# Result
 	return G
 
@@ -296,4 +389,31 @@ def has_alternative_paths(G, e):
 	# Reinsert the removed edge
 	G.add_edge(u, v, flow = f)
 	# Result
-	return res
\ No newline at end of file
+	return res
+
+def remove_edges_batch(G, edges):
+	'''
+	This function removes from the strongly connected graph G the specified batch of edges, verifying
+	with a single strong connectivity check that the resulting graph is still connected.
+	If the check fails, the batch is reinserted and split in two halves, recursively tried one after the other.
+	It returns the list of the edges actually removed
+	'''
+	# Nothing to remove
+	if len(edges) == 0:
+		return []
+	# Save the edges' attributes, in order to reinsert them if needed
+	attributes = [dict(G.edge[u][v]) for (u, v) in edges]
+	# Remove the whole batch
+	G.remove_edges_from(edges)
+	# Single SCC pass: every removed edge has an alternative path between its nodes
+	if nx.is_strongly_connected(G):
+		return list(edges)
+	# Reinsert the removed edges
+	for (u, v), a in zip(edges, attributes):
+		G.add_edge(u, v, **a)
+	# A single edge that disconnects the graph cannot be removed
+	if len(edges) == 1:
+		return []
+	# Bisect the batch
+	half = len(edges) // 2
+	return remove_edges_batch(G, edges[:half]) + remove_edges_batch(G, edges[half:])
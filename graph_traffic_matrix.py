@@ -1,12 +1,15 @@
 import random
+import numpy
 import input_controls as inc
 
 
-def random_TM(n, valueMin, valueMax):
+def random_TM(n, valueMin, valueMax, seed = None):
 	'''
 	This function creates and returns a traffic matrix nxn, whose diagonal is zero (no self-loops).
 	Traffic values are computed as instance of random variables, whose pdf is uniform between values
-	"valueMin" and "valueMax" (both included)
+	"valueMin" and "valueMax" (both included).
+	If "seed" is specified, the values are drawn from a private random generator initialized with it
+	(the same seed always gives the same matrix, and the global random generator is not used)
 	'''
 	# INPUT CONTROL
 	# valueMin
@@ -16,6 +19,8 @@ def random_TM(n, valueMin, valueMax):
 	# N
 	inc.check_integer(n, 'n', minValue = 2)
 
+	# Random generator
+	rnd = random if seed is None else random.Random(seed)
 	# Creating the matrix
 	tmp = range(n)
 	res = []
@@ -27,12 +32,12 @@ def random_TM(n, valueMin, valueMax):
 			if i == j:
 				v = 0.0
 			else:
-				v = round(random.random()*(valueMax - valueMin) + valueMin, 2)
+				v = round(rnd.random()*(valueMax - valueMin) + valueMin, 2)
 			res[i].append(v)
 	# Result
 	return res
 
-def random_TM_2(n, low_min, low_max, high_min, high_max, p):
+def random_TM_2(n, low_min, low_max, high_min, high_max, p, seed = None):
 	'''
 	This function creates and returns a traffic matrix nxn, whose diagonal is zero (no self-loops).
 	Traffic values are computed as instance of random variables, whose pdf is uniform: its extrame values
@@ -41,6 +46,7 @@ def random_TM_2(n, low_min, low_max, high_min, high_max, p):
 	- "n": number of nodes
 	- "low_min" and "low_max": pdf extreme values, when "high_traffic" = False
 	- "high_min" and "high_max": pdf extreme values, when "high_traffic" = True
+	- "seed": if specified, the values are drawn from a private random generator initialized with it
 	'''
 	# INPUT CONTROL
 	# low_min
@@ -57,6 +63,8 @@ def random_TM_2(n, low_min, low_max, high_min, high_max, p):
 	inc.check_number(p, 'p', minValue = 0, maxValue = 1)
 
 	# ALGORITHM
+	# Random generator
+	rnd = random if seed is None else random.Random(seed)
 	T = []
 	for s in range(n):
 		T.append([])
@@ -66,7 +74,7 @@ def random_TM_2(n, low_min, low_max, high_min, high_max, p):
 				x = 0.0
 			else:
 				# Check to be in the "high traffic" condition
-				high_traffic = random.random() <= p
+				high_traffic = rnd.random() <= p
 				# Compute pdf extreme values "a" and "b"
 				if high_traffic:
 					a = high_min
@@ -75,12 +83,49 @@ def random_TM_2(n, low_min, low_max, high_min, high_max, p):
 					a = low_min
 					b = low_max
 				# Compute the random variable instance  n = U(a, b)
-				x = round(random.random() * (b - a) + a, 2)
+				x = round(rnd.random() * (b - a) + a, 2)
 			# Value for Tsd
 			T[s].append(x)
 	# Result
 	return T
 
+def traffic_clusters(tm, cluster_size):
+	'''
+	This function groups the nodes in clusters of (at most) "cluster_size" nodes, according to the traffic they exchange:
+	every cluster starts from the not clustered node with the highest total traffic, then the node exchanging the highest
+	traffic with the cluster's nodes is added, until the cluster is full. A single node is never left alone in a cluster.
+	It returns the list of the clusters (lists of nodes)
+	'''
+	# INPUT CONTROL
+	inc.check_integer(cluster_size, 'cluster_size', minValue = 2)
+
+	# Traffic exchanged by pairs of nodes (both directions)
+	W = numpy.array(tm, dtype = float)
+	W = W + W.T
+	numpy.fill_diagonal(W, 0.0)
+	total = W.sum(axis = 1)
+	# Not clustered nodes
+	free = numpy.ones(len(W), dtype = bool)
+	clusters = []
+	while free.any():
+		# First node of the cluster
+		x = numpy.where(free, total, -numpy.inf).argmax()
+		free[x] = False
+		cluster = [int(x)]
+		# Traffic exchanged by every node with the cluster's nodes
+		affinity = W[x].copy()
+		while len(cluster) < cluster_size and free.any():
+			x = numpy.where(free, affinity, -numpy.inf).argmax()
+			free[x] = False
+			cluster.append(int(x))
+			affinity += W[x]
+		clusters.append(cluster)
+	# A single node is merged to the previous cluster
+	if len(clusters) > 1 and len(clusters[-1]) == 1:
+		clusters[-2] += clusters.pop()
+	# Result
+	return clusters
+
 def print_TM(tm):
 	'''
 	This function pronts on screen the content of the specified traffic matrix
@@ -90,4 +135,35 @@ def print_TM(tm):
 		s = ''
 		for c in r:
 			s += '%s\t' % (c)
-		print(s)
\ No newline at end of file
+		print(s)
+
+def write_TM(fp, tm):
+	'''
+	This function writes the content of the specified traffic matrix into the text file "fp" (one row per line,
+	values separated by tabs), followed by an empty line: several matrices can be written in the same file
+	'''
+	for r in tm:
+		fp.write('\t'.join(map(str, r)) + '\n')
+	fp.write('\n')
+
+def read_TMs(fp):
+	'''
+	Generator: it reads the traffic matrices contained in the text file "fp" (as written by "write_TM": one row
+	per line, values separated by spaces or tabs, matrices separated by empty lines), yielding them one at a time.
+	Lines that do not contain numbers (for example, titles) are treated as separators
+	'''
+	rows = []
+	for line in fp:
+		try:
+			values = [float(x) for x in line.split()]
+		except ValueError:
+			values = []
+		if len(values) > 0:
+			rows.append(values)
+		elif len(rows) > 0:
+			# End of the current matrix
+			yield rows
+			rows = []
+	# Last matrix of the file
+	if len(rows) > 0:
+		yield rows
@@ -0,0 +1,113 @@
+import os
+import numpy
+try:
+	import numba
+except ImportError:
+	numba = None
+
+
+# Backend of the kernels: 'numba' (JIT compiled loops) if the library is available, 'numpy' otherwise.
+# The environment variable LTD_BACKEND=numpy forces the NumPy backend. Both backends give bit-identical results
+BACKEND = 'numba' if numba is not None and os.environ.get('LTD_BACKEND', 'numba') != 'numpy' else 'numpy'
+
+
+def water_fill_loops(load, path_edges, offsets, f):
+	'''
+	Loop version of "water_fill_arrays", compiled by the 'numba' backend
+	'''
+	k = len(offsets) - 1
+	heights = numpy.empty(k)
+	for i in range(k):
+		h = load[path_edges[offsets[i]]]
+		for j in range(offsets[i] + 1, offsets[i+1]):
+			if load[path_edges[j]] > h:
+				h = load[path_edges[j]]
+		heights[i] = h
+	order = numpy.argsort(heights, kind = 'mergesort')
+	# Water level (see "flow_utilities.water_level")
+	paths_batch = 1
+	covered = heights[order[0]]
+	while paths_batch < k:
+		if heights[order[paths_batch]] * paths_batch - covered > f:
+			break
+		covered += heights[order[paths_batch]]
+		paths_batch += 1
+	level = (f + covered) / paths_batch
+	for b in range(paths_batch):
+		i = order[b]
+		quota = level - heights[i]
+		if quota > 0:
+			for j in range(offsets[i], offsets[i+1]):
+				load[path_edges[j]] += quota
+
+def water_fill_numpy(load, path_edges, offsets, f):
+	'''
+	NumPy version of "water_fill_arrays"
+	'''
+	heights = numpy.maximum.reduceat(load[path_edges], offsets[:-1])
+	order = numpy.argsort(heights, kind = 'mergesort')
+	paths_batch = 1
+	covered = heights[order[0]]
+	while paths_batch < len(order):
+		if heights[order[paths_batch]] * paths_batch - covered > f:
+			break
+		covered += heights[order[paths_batch]]
+		paths_batch += 1
+	level = (f + covered) / paths_batch
+	for i in order[:paths_batch]:
+		quota = level - heights[i]
+		if quota > 0:
+			# Simple paths: every edge appears once
+			load[path_edges[offsets[i]:offsets[i+1]]] += quota
+
+def max_pair_loops(M):
+	'''
+	Loop version of "max_pair", compiled by the 'numba' backend
+	'''
+	max_value = -1.0
+	s_res = -1
+	d_res = -1
+	for s in range(M.shape[0]):
+		for d in range(M.shape[1]):
+			if M[s, d] > max_value:
+				max_value = M[s, d]
+				s_res = s
+				d_res = d
+	return (s_res, d_res)
+
+def max_pair_numpy(M):
+	'''
+	NumPy version of "max_pair"
+	'''
+	i = int(numpy.argmax(M))
+	if not M.flat[i] > -1:
+		return (-1, -1)
+	return (i // M.shape[1], i % M.shape[1])
+
+
+if BACKEND == 'numba':
+	water_fill_kernel = numba.njit(cache = True)(water_fill_loops)
+	max_pair_kernel = numba.njit(cache = True)(max_pair_loops)
+else:
+	water_fill_kernel = water_fill_numpy
+	max_pair_kernel = max_pair_numpy
+
+
+def water_fill_arrays(load, path_edges, offsets, f):
+	'''
+	Water filling (see "flow_utilities.water_fill") on an array-based layout: the flow "f" is distributed over
+	the paths, loading the float64 array of edges' flows "load" (modified in place). The paths are given as the
+	concatenation of their edges' indexes ("path_edges", int64) and the position of every path in it ("offsets",
+	int64: path i has the edges path_edges[offsets[i]:offsets[i+1]])
+	'''
+	water_fill_kernel(load, path_edges, offsets, float(f))
+
+def max_pair(M):
+	'''
+	This function returns the indexes (s, d) of the first highest value of the float64 matrix "M", scanning it
+	by rows; (None, None) if no value is greater than -1
+	'''
+	s, d = max_pair_kernel(M)
+	if s < 0:
+		return (None, None)
+	return (int(s), int(d))
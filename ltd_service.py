@@ -0,0 +1,312 @@
+import sys
+import os
+import time
+import json
+import hashlib
+import threading
+import multiprocessing
+import Queue
+import SocketServer
+import BaseHTTPServer
+from collections import deque, OrderedDict
+import numpy
+import LAB2_OpRes as L2
+import graph_topologies as gt
+import ltd_utilities as ltd
+
+
+class Job(object):
+	'''
+	Solve request queued by the service: identical requests share the same job
+	'''
+	def __init__(self, key, request):
+		self.key = key
+		self.request = request
+		self.submitted = time.time()
+		self.done = threading.Event()
+		self.result = None
+		self.error = None
+		self.completed = None
+		# Number of requests waiting for this job
+		self.waiters = 1
+
+
+class SolveService(object):
+	'''
+	Long-running LTD solve service: requests are queued, identical (algorithm, traffic matrix, delta, parameters)
+	requests still in progress are deduplicated, and the queued jobs are dispatched in batches to a pool of worker
+	processes. Completed jobs are kept for a while, so that repeated requests reuse their answer.
+	A request is a dictionary (see "service_run"); its answer is a dictionary with the key "result" or "error"
+	'''
+	def __init__(self, processes = None, history = 1000, batch_size = 64, keep = 60.0):
+		'''
+		- processes: number of worker processes (default: number of CPUs)
+		- history: number of completed jobs used to compute the latency metrics
+		- batch_size: maximum number of queued jobs sent to the worker processes at once
+		- keep: time (in seconds) for which the answer of a completed job is reused by identical requests
+		'''
+		if processes is None:
+			processes = multiprocessing.cpu_count()
+		self.pool = multiprocessing.Pool(processes)
+		self.queue = Queue.Queue()
+		self.lock = threading.Lock()
+		self.pending = {}
+		# Completed jobs, in completion order
+		self.finished = OrderedDict()
+		self.batch_size = batch_size
+		self.keep = keep
+		self.latencies = deque(maxlen = history)
+		self.counters = {'requests': 0, 'deduplicated': 0, 'reused': 0, 'completed': 0, 'failed': 0, 'running': 0, 'batches': 0}
+		self.start_time = time.time()
+		# Dispatcher thread: the queue holds the jobs waiting to be sent to the worker processes
+		self.dispatcher = threading.Thread(target = self.dispatch)
+		self.dispatcher.daemon = True
+		self.dispatcher.start()
+
+	def submit(self, request):
+		'''
+		Queue a request (or join the identical one still in progress) and return its job
+		'''
+		key = request_key(request)
+		with self.lock:
+			self.counters['requests'] += 1
+			# Forget the expired answers (the oldest ones come first)
+			now = time.time()
+			while len(self.finished) > 0:
+				k, old = next(self.finished.iteritems())
+				if now - old.completed < self.keep:
+					break
+				del self.finished[k]
+			job = self.finished.get(key)
+			if job is not None:
+				self.counters['reused'] += 1
+				return job
+			job = self.pending.get(key)
+			if job is not None:
+				self.counters['deduplicated'] += 1
+				job.waiters += 1
+				return job
+			job = Job(key, request)
+			self.pending[key] = job
+		self.queue.put(job)
+		return job
+
+	def solve(self, request, timeout = None):
+		'''
+		Submit a request and wait for its answer
+		'''
+		job = self.submit(request)
+		if not job.done.wait(timeout):
+			return {'error': 'timeout'}
+		if job.error is not None:
+			return {'error': job.error}
+		return {'result': job.result}
+
+	def dispatch(self):
+		'''
+		Dispatcher thread: it waits for a job, collects the other queued ones (up to "batch_size") and sends the
+		batch to the pool of worker processes, without waiting for its answers
+		'''
+		end = False
+		while not end:
+			batch = [self.queue.get()]
+			while len(batch) < self.batch_size:
+				try:
+					batch.append(self.queue.get_nowait())
+				except Queue.Empty:
+					break
+			if None in batch:
+				# Stop request: the jobs queued before it are still dispatched
+				end = True
+				batch = batch[:batch.index(None)]
+			if len(batch) == 0:
+				continue
+			with self.lock:
+				self.counters['running'] += len(batch)
+				self.counters['batches'] += 1
+			self.pool.map_async(service_try, [job.request for job in batch], callback = lambda answers, batch = batch: self.complete(batch, answers))
+
+	def complete(self, batch, answers):
+		'''
+		Store the answers of a batch of jobs (see "service_try") and wake up the requests waiting for them
+		'''
+		now = time.time()
+		with self.lock:
+			for (job, (result, error)) in zip(batch, answers):
+				job.result = result
+				job.error = error
+				job.completed = now
+				self.counters['running'] -= 1
+				self.counters['failed' if job.error is not None else 'completed'] += 1
+				self.latencies.append(now - job.submitted)
+				del self.pending[job.key]
+				self.finished.pop(job.key, None)
+				self.finished[job.key] = job
+		for job in batch:
+			job.done.set()
+
+	def metrics(self):
+		'''
+		Latency (in seconds, from the submission to the answer of the last completed jobs) and throughput
+		(completed jobs per second, since the start of the service) metrics
+		'''
+		with self.lock:
+			res = dict(self.counters)
+			res['queued'] = self.queue.qsize()
+			latencies = numpy.array(self.latencies)
+		uptime = time.time() - self.start_time
+		res['uptime'] = uptime
+		res['throughput'] = res['completed'] / uptime if uptime > 0 else 0.0
+		if len(latencies) > 0:
+			p50, p95, p99 = numpy.percentile(latencies, [50, 95, 99])
+			res['latency'] = {'mean': float(latencies.mean()), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99), 'max': float(latencies.max())}
+		else:
+			res['latency'] = None
+		return res
+
+	def close(self):
+		'''
+		Stop the dispatcher thread and the worker processes (the jobs already queued are completed)
+		'''
+		self.queue.put(None)
+		self.dispatcher.join()
+		self.pool.close()
+		self.pool.join()
+
+
+def request_key(request):
+	'''
+	This function returns the digest identifying a request: requests with the same key have the same answer
+	'''
+	return hashlib.sha1(json.dumps(request, sort_keys = True)).hexdigest()
+
+def service_try(request):
+	'''
+	Solve a request (see "service_run") and return the pair (result, error): the error message is None if the
+	request is solved, so that a failed request does not fail the other ones of its batch
+	'''
+	try:
+		return (service_run(request), None)
+	except Exception as e:
+		return (None, '%s: %s' % (type(e).__name__, e))
+
+def service_run(request):
+	'''
+	Solve a request, executed by a worker process (see "LAB2_OpRes.solve"). The request is a dictionary with keys:
+	- "approach": 'mesh', 'ring', 'manhattan', 'manhattan_smart' or 'route' (route the traffic on the given edges)
+	- "traffic_matrix", "delta_in", "delta_out": LTD problem
+	- "routing": routing mode, 'water_fill' (default) or 'ecmp'
+	- "parameters": parameters of the approach (see "LAB2_OpRes.solve")
+	- "edges": list of edges [u, v] of the topology, for the approach 'route'
+	- "depth": maximum depth for the path research, for the approach 'route' (default 6)
+	It returns the edges (with their flow), the max flow, its lower bound and gap, the flow statistics and the time
+	'''
+	approach = request.get('approach')
+	traffic_matrix = request.get('traffic_matrix')
+	delta_in = request.get('delta_in')
+	delta_out = request.get('delta_out')
+	routing = request.get('routing', 'water_fill')
+	if routing not in ('water_fill', 'ecmp'):
+		raise ValueError('the parameter "routing" must be \'water_fill\' or \'ecmp\'')
+	if not isinstance(traffic_matrix, list):
+		raise TypeError('the parameter "traffic_matrix" is invalid: it must be a list')
+	n = len(traffic_matrix)
+	if approach == 'route':
+		ltd.input_control(n, traffic_matrix, delta_in, delta_out)
+		T = gt.topology_from_edges(range(n), [tuple(e) for e in request.get('edges', [])])
+		res = ltd.solution(T, traffic_matrix, delta_in, delta_out, time.time(), request.get('depth', 6), routing)
+	else:
+		parameters = dict((str(k), v) for (k, v) in request.get('parameters', {}).items())
+		res = L2.solve(approach, n, traffic_matrix, delta_in, delta_out, routing, **parameters)
+	if res is None:
+		raise ValueError('solution not found')
+	G = res['topology']
+	stats = dict(res['flow_stats'])
+	return {
+		'edges': [[u, v, G.edge[u][v]['flow']] for (u, v) in G.edges()],
+		'max_flow': res['max_flow'],
+		'lower_bound': res['lower_bound'],
+		'gap': res['gap'],
+		'time': res['time'],
+		'flow_stats': stats
+	}
+
+
+class ServiceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	'''
+	JSON over HTTP interface of the service: "POST /solve" (the body is the request) and "GET /metrics"
+	'''
+	def send_json(self, code, data):
+		body = json.dumps(data)
+		self.send_response(code)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_GET(self):
+		if self.path == '/metrics':
+			self.send_json(200, self.server.service.metrics())
+		else:
+			self.send_json(404, {'error': 'unknown path "%s"' % (self.path)})
+
+	def do_POST(self):
+		if self.path != '/solve':
+			self.send_json(404, {'error': 'unknown path "%s"' % (self.path)})
+			return
+		try:
+			request = json.loads(self.rfile.read(int(self.headers.getheader('Content-Length', 0))))
+			assert isinstance(request, dict)
+		except Exception:
+			self.send_json(400, {'error': 'the request must be a JSON object'})
+			return
+		answer = self.server.service.solve(request)
+		self.send_json(200 if 'result' in answer else 400, answer)
+
+	def address_string(self):
+		# Unix sockets have no client address
+		return str(self.client_address[0]) if isinstance(self.client_address, tuple) else 'local'
+
+	def log_message(self, format, *args):
+		pass
+
+
+class TCPServiceServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+
+
+class UnixServiceServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+	daemon_threads = True
+
+
+def service_server(address = ('127.0.0.1', 8080), processes = None):
+	'''
+	This function creates the HTTP server of a new solve service (see "SolveService"), listening on "address":
+	a (host, port) pair or the path of a Unix socket. Use "serve_forever" to start it, and "service.close"
+	(after "shutdown") to stop the worker processes
+	'''
+	if isinstance(address, tuple):
+		server = TCPServiceServer(address, ServiceHandler)
+	else:
+		if os.path.exists(address):
+			os.remove(address)
+		server = UnixServiceServer(address, ServiceHandler)
+	server.service = SolveService(processes)
+	return server
+
+
+# Executable code (main)
+if __name__ == '__main__':
+	# Usage: python ltd_service.py [port | unix socket path]
+	address = ('127.0.0.1', 8080)
+	if len(sys.argv) > 1:
+		address = ('127.0.0.1', int(sys.argv[1])) if sys.argv[1].isdigit() else sys.argv[1]
+	server = service_server(address)
+	print('LTD solve service listening on %s' % (address,))
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.server_close()
+		server.service.close()
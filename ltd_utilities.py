@@ -1,11 +1,50 @@
 import time
+import math
+import atexit
+import hashlib
 import warnings
+import threading
+import multiprocessing
+from collections import OrderedDict
+import numpy
 import networkx as nx
 import matplotlib.pyplot as plt
 import input_controls as inc
+import graph_topologies as gt
 import flow_utilities as flows
 
 
+# The pyplot state machine is global: topologies are rendered one at a time
+pyplot_lock = threading.Lock()
+
+# Maximum number of layouts kept by "topology_layout"
+LAYOUT_CACHE_SIZE = 128
+# Layouts of the last drawn topologies, by "layout_key"
+layouts = OrderedDict()
+layouts_lock = threading.Lock()
+
+# Number of worker processes rendering the images of the topologies in background (see "end"); with 0, images
+# are rendered by the calling process
+RENDER_PROCESSES = 2
+render_pool = None
+# Images still being rendered
+renders = []
+
+
+class Solution(dict):
+	'''
+	Read-only dictionary, used for the results of "solution": any attempt to modify it raises a TypeError
+	'''
+	def read_only(self, *args, **kwargs):
+		raise TypeError('a solution is read-only')
+
+	__setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = read_only
+
+	def __reduce__(self):
+		return (Solution, (dict(self),))
+
+
+
 def input_control(n, traffic_matrix, delta_in, delta_out):
 	'''
 	this function verify that the input parameters for greedy algorithms are valid.
@@ -59,42 +98,71 @@ def str_edges(G):
 	# Return the list as a single string
 	return 'Edges (%d):\n%s' % (len(list_edges), '\n'.join(list_edges))
 
-def str_max_flow(G):
+def str_max_flow(G, stats = None):
 	'''
 	This function returns, as a well formatted string, the information associated to the maximum
-	flow between graph "G" edges
+	flow between graph "G" edges ("stats" are the flow statistics of G, see "flow_utilities.flow_stats")
 	'''
-	(f_max, e_max) = flows.max_flow(G)
-	return 'Max flow: %s units, on the edge %s' % (round(f_max, 2), e_max)
+	if stats is None:
+		stats = flows.flow_stats(G)
+	return 'Max flow: %s units, on the edge %s' % (round(stats['max'], 2), stats['max_edge'])
 
-def str_min_flow(G):
+def str_min_flow(G, stats = None):
 	'''
 	This function returns, as a well formatted string, the information associated to the minimum
-	flow between graph "G" edges
+	flow between graph "G" edges ("stats" are the flow statistics of G, see "flow_utilities.flow_stats")
 	'''
-	(f_min, e_max) = flows.min_flow(G)
-	return 'Min flow: %s units, on the edge %s' % (round(f_min, 2), e_max)
+	if stats is None:
+		stats = flows.flow_stats(G)
+	return 'Min flow: %s units, on the edge %s' % (round(stats['min'], 2), stats['min_edge'])
 
-def str_info_flow(G):
+def str_info_flow(G, stats = None):
 	'''
 	This function returns, as a well formatted string, the extra information about flow values distribution
-	of the "G" graph edges we are considering
+	of the "G" graph edges we are considering ("stats" are the flow statistics of G, see "flow_utilities.flow_stats")
 	'''
-	maxF = flows.max_flow(G)[0]
-	minF = flows.min_flow(G)[0]
+	if stats is None:
+		stats = flows.flow_stats(G)
+	maxF = stats['max']
+	minF = stats['min']
 	flow_range = round(maxF - minF, 2)
 	flow_perc = round(flow_range*100.0/maxF, 2)
-	return 'Flow traffic values are in a range of %s units (%s%% wrt the maximum value)' % (flow_range, flow_perc)
+	info = 'Flow traffic values are in a range of %s units (%s%% wrt the maximum value)' % (flow_range, flow_perc)
+	percentiles = 'Mean flow: %s units (50th, 95th, 99th percentiles: %s, %s, %s units)' % (round(stats['mean'], 2), round(stats['p50'], 2), round(stats['p95'], 2), round(stats['p99'], 2))
+	return info + '\n' + percentiles
+
+def str_lower_bound(G, lower_bound, stats = None):
+	'''
+	This function returns, as a well formatted string, the lower bound on the max flow and the gap
+	between the max flow of graph "G" and the bound ("stats" are the flow statistics of G, see "flow_utilities.flow_stats")
+	'''
+	if stats is None:
+		stats = flows.flow_stats(G)
+	f_max = stats['max']
+	return 'Max flow lower bound: %s units (gap = %s%%)' % (round(lower_bound, 2), round(gap(f_max, lower_bound) * 100, 2))
 
-def str_res(G, delta_in, delta_out):
+def gap(f_max, lower_bound):
+	'''
+	This function returns the relative gap between a max flow value and its lower bound
+	'''
+	if lower_bound <= 0:
+		return 0.0 if f_max <= 0 else float('inf')
+	return (f_max - lower_bound) / float(lower_bound)
+
+def str_res(G, delta_in, delta_out, lower_bound = None, stats = None):
 	'''
 	The function returns, as a well formatted string, obtained results in a "compact" way
+	("stats" are the flow statistics of G, see "flow_utilities.flow_stats")
 	'''
+	if stats is None:
+		stats = flows.flow_stats(G)
 	if delta_in == delta_out:
 		data = 'N = %d, delta = %d' % (len(G.nodes()), delta_in)
 	else:
 		data = 'N = %d, delta_in = %d, delta_out = %d' % (len(G.nodes()), delta_in, delta_out)
-	max_f = 'Estimated max flow = %g' % round(flows.max_flow(G)[0], 2)
+	max_f = 'Estimated max flow = %g' % round(stats['max'], 2)
+	if lower_bound is not None:
+		max_f += ' (lower bound = %g)' % round(lower_bound, 2)
 	return data + '\n' + max_f + '\n'
 
 def str_time(t):
@@ -104,7 +172,51 @@ def str_time(t):
 	'''
 	return 'Computation time: %g seconds' % (t)
 
-def result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, approach, depth = 6):
+def solution(T, traffic_matrix, delta_in, delta_out, initial_time, depth = 6, routing = 'water_fill', state = None, frozen = True):
+	'''
+	This function returns the final data structure of an LTD algorithm (see "result"), without any side effect:
+	nothing is printed or drawn, and the traffic is routed on a copy of "T" (and of "state"), so that several
+	solutions can be computed concurrently. Parameters are the same of "result".
+	If "frozen" is True, the result is a "Solution" (read-only dictionary) and its topology is frozen (see
+	"networkx.freeze"); the routing state has to be copied (see "flow_utilities.copy_routing_state") before
+	being updated.
+	It returns None if T does not satisfy the delta constraints, or if some traffic cannot be routed
+	'''
+	# Check the validity of the solution
+	if not check_global_delta_constraints(T, delta_in, delta_out):
+		return None
+	T = nx.DiGraph(T)
+	if state is None:
+		# Load flows on the topology's edges
+		if routing == 'water_fill':
+			state = flows.new_routing_state()
+		T = flows.route(T, traffic_matrix, routing, depth, state)
+		if T is None:
+			return None
+	else:
+		state = flows.copy_routing_state(state)
+	# Computation end time and final result
+	end_time = time.time()
+	stats = flows.flow_stats(T)
+	res = {
+		'topology': T,
+		'time': round(end_time - initial_time, 2),
+		'max_flow': stats['max'],
+		'flow_stats': stats,
+		'lower_bound': flows.max_flow_lower_bound(traffic_matrix, delta_in, delta_out),
+		'routing_state': state
+	}
+	res['gap'] = gap(res['max_flow'], res['lower_bound'])
+	if frozen:
+		nx.freeze(T)
+		if stats['max_edges'] is not None:
+			stats['max_edges'] = tuple(stats['max_edges'])
+			stats['histogram'] = tuple(tuple(x) for x in stats['histogram'])
+		res['flow_stats'] = Solution(stats)
+		res = Solution(res)
+	return res
+
+def result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView, withLabels, approach, depth = 6, routing = 'water_fill', state = None):
 	'''
 	This function returns the final data structure (composed by the topology, computational required time and max flow
 	values between the edges in the topologies), giving to the user as output the obtained results information
@@ -118,30 +230,152 @@ def result(T, traffic_matrix, delta_in, delta_out, initial_time, title, userView
 	- "withLabels": boolean, if True the topology photo has the flow printed on aedges (as labels)
 	- "approach": approach of the adopted LTD algorithm
 	- "depth": maximum depth for the path research, between pairs of nodes
+	- "routing": routing mode, 'water_fill' or 'ecmp' (see "flow_utilities.route")
+	- "state": routing state of T (see "flow_utilities.new_routing_state"); if specified, T's edges are already
+	  loaded according to it, and the traffic is not routed again
+	The result contains also the routing state of the topology ("routing_state"), if the routing is 'water_fill',
+	and the flow statistics of its edges ("flow_stats", see "flow_utilities.flow_stats").
+	The result is computed by "solution" (not frozen): this function adds the messages for the user and the output of "end"
 	'''
 	# Check the validity of the solution
 	if check_global_delta_constraints(T, delta_in, delta_out):
-		print('%s approach topology is ready. Routing...' % (approach))
-		# Load flows on the topology's edges
-		T = flows.complete_water_fill(T, traffic_matrix, depth)
+		if state is None:
+			print('%s approach topology is ready. Routing...' % (approach))
+		res = solution(T, traffic_matrix, delta_in, delta_out, initial_time, depth, routing, state, frozen = False)
+	else:
+		res = None
+	if res is not None:
 		# information for the user
 		print('=> %s solution found!' % (approach))
-		# Computation end time and final result
-		end_time = time.time()
-		computation_time = round(end_time - initial_time, 2)
-		res = {
-			'topology': T,
-			'time': computation_time,
-			'max_flow': flows.max_flow(T)[0]
-		}
-		end(T, delta_in, delta_out, computation_time, title, userView, withLabels)
+		end(res['topology'], delta_in, delta_out, res['time'], title, userView, withLabels, res['lower_bound'], res['flow_stats'])
 	else:
 		print('ERR - %s solution not found!' % (approach))
-		res = None
 	# Result
 	return res
 
-def end(G, delta_in, delta_out, computation_time, title = '', userView = True, withLabels = True):
+def layout_key(G):
+	'''
+	Digest of the structure (nodes and edges) of G: topologies with the same key share their layout
+	'''
+	nodes = numpy.array(sorted(G.nodes()), dtype = numpy.int64)
+	edges = numpy.array(sorted(G.edges()), dtype = numpy.int64)
+	return hashlib.sha1(nodes.tostring() + '|' + edges.tostring()).hexdigest()
+
+def structure_layout(G):
+	'''
+	Deterministic layout of a topology with a known structure: the grid positions of a Manhattan topology (see
+	"graph_topologies.manhattan_topology"), or a circle for the topologies built on the ring 0 -> 1 -> ... -> n-1 -> 0
+	(rings, and the results of the ring approach). It returns None for the other topologies
+	'''
+	positions = G.graph.get('positions')
+	if positions is not None and all(u in positions for u in G.nodes()):
+		return positions
+	n = len(G.nodes())
+	if n > 2 and sorted(G.nodes()) == range(n) and all(G.edge[i].has_key((i + 1) % n) for i in range(n)):
+		return dict((i, (math.cos(2 * math.pi * i / n), math.sin(2 * math.pi * i / n))) for i in range(n))
+	return None
+
+def cache_layout(key, layout):
+	'''
+	Save the layout of the topology "key" (see "layout_key"), forgetting the least recently used ones
+	'''
+	with layouts_lock:
+		layouts.pop(key, None)
+		layouts[key] = layout
+		while len(layouts) > LAYOUT_CACHE_SIZE:
+			layouts.popitem(last = False)
+
+def topology_layout(G, compute = True):
+	'''
+	This function returns the positions of the G's nodes used to draw it: the structural layout, if G has a known
+	structure (see "structure_layout"), otherwise its spring layout ("networkx.spring_layout", O(N^2) per iteration),
+	computed once per topology and cached (see "cache_layout"). If "compute" is False, it returns None instead of
+	computing a missing spring layout
+	'''
+	layout = structure_layout(G)
+	if layout is not None:
+		return layout
+	key = layout_key(G)
+	with layouts_lock:
+		layout = layouts.get(key)
+	if layout is None and compute:
+		layout = nx.spring_layout(G)
+		cache_layout(key, layout)
+	elif layout is not None:
+		# Recently used
+		cache_layout(key, layout)
+	return layout
+
+def draw_topology(G, layout, title, withLabels):
+	'''
+	Draw the topology G (with the node positions "layout") on the current pyplot figure
+	'''
+	# Draw nodes and edges
+	nx.draw_networkx(G, pos = layout, node_size = 200)
+	# Decide if labels have to be drawn
+	if withLabels:
+		edge_labels = flows.get_flow_labels(G)
+		nx.draw_networkx_edge_labels(G, pos = layout, edge_labels = edge_labels, label_pos = 0.65)
+	# Disable cartesian axis
+	plt.axis('off')
+	# Graph's title
+	plt.title(title)
+
+def render_topology(G, layout, title, withLabels, file_img):
+	'''
+	Save the image of the topology G in the PNG file "file_img", executed by a rendering process (see "end").
+	If "layout" is None, the spring layout is computed here; the function returns it
+	'''
+	with pyplot_lock, warnings.catch_warnings():
+		# Disable version warning (for the library "matplotlib")
+		warnings.simplefilter("ignore")
+		if layout is None:
+			layout = nx.spring_layout(G)
+		draw_topology(G, layout, title, withLabels)
+		try:
+			plt.savefig(file_img, format="PNG", bbox_inches='tight')
+		finally:
+			# Close the figure, to avoid the overlap of the next one (hold)
+			plt.close()
+	return layout
+
+def render_init():
+	# Rendering processes only save images
+	plt.switch_backend('Agg')
+
+def render_async(G, title, withLabels, file_img):
+	'''
+	Render the image of G in background (see "render_topology"), caching its layout once computed.
+	Use "wait_renders" to wait for the images still being rendered
+	'''
+	global render_pool
+	layout = topology_layout(G, compute = False)
+	if RENDER_PROCESSES == 0:
+		layout = render_topology(G, layout, title, withLabels, file_img)
+		cache_layout(layout_key(G), layout)
+		return
+	if render_pool is None:
+		render_pool = multiprocessing.Pool(RENDER_PROCESSES, render_init)
+		atexit.register(wait_renders)
+	callback = None
+	if layout is None:
+		key = layout_key(G)
+		callback = lambda layout: cache_layout(key, layout)
+	renders[:] = [r for r in renders if not r[1].ready()]
+	renders.append((file_img, render_pool.apply_async(render_topology, (nx.DiGraph(G), layout, title, withLabels, file_img), callback = callback)))
+
+def wait_renders():
+	'''
+	Wait for the images still being rendered in background (see "render_async")
+	'''
+	while len(renders) > 0:
+		file_img, r = renders.pop(0)
+		try:
+			r.get()
+		except Exception:
+			print('ERR - I/O problems with the file "%s"' % (file_img))
+
+def end(G, delta_in, delta_out, computation_time, title = '', userView = True, withLabels = True, lower_bound = None, stats = None):
 	'''
 	At the end of the heuristic, I check to have found a valid solution: in that case, obtained results
 	are printed at screen or in an output text file
@@ -150,47 +384,87 @@ def end(G, delta_in, delta_out, computation_time, title = '', userView = True, w
 	- "delta_out" is the constraint on the maximum number of transmitters per node
 	- "title" is the graph's title and the name of the output files
 	- "userView" is a flag, used to decide if final results have to be printed on screen (True) or on a text file (False)
+	- "lower_bound" is the lower bound on the max flow (if specified, it is reported with the results)
+	- "stats" are the flow statistics of G (see "flow_utilities.flow_stats"); if not specified, they are computed here
+	The topology is drawn with its structural or cached layout (see "topology_layout"); when the results are saved on
+	files, its image is rendered in background (see "render_async"), so the caller is not blocked
 	'''
+	if stats is None:
+		stats = flows.flow_stats(G)
 	# User useful information
 	nodes = str_nodes(G)
 	edges = str_edges(G)
 	time_info = str_time(computation_time)
-	max_flow = str_max_flow(G)
-	min_flow = str_min_flow(G)
-	info_flow = str_info_flow(G)
-	log = '\n'.join([nodes, edges, time_info, max_flow, min_flow, info_flow])
-	res = str_res(G, delta_in, delta_out)
-	# Create the graph and output results
-	with warnings.catch_warnings():
-		# Disable version warning (for the library "matplotlib")
-		warnings.simplefilter("ignore")
-		# Graph layout 
-		layout = nx.spring_layout(G)
-		# Draw nodes and edges
-		nx.draw_networkx(G, pos = layout, node_size = 200)
-		# Decide if labels have to be drawn
-		if withLabels:
-			edge_labels = flows.get_flow_labels(G)
-			nx.draw_networkx_edge_labels(G, pos = layout, edge_labels = edge_labels, label_pos = 0.65)
-		# Disable cartesian axis
-		plt.axis('off')
-		# Graph's title
-		plt.title(title)
-		# "userView" flag decides how to output the final results to the user
-		if userView:
-			# If True, print on screen the log and open the graphical window
+	max_flow = str_max_flow(G, stats)
+	min_flow = str_min_flow(G, stats)
+	info_flow = str_info_flow(G, stats)
+	log = [nodes, edges, time_info, max_flow, min_flow, info_flow]
+	if lower_bound is not None:
+		log.append(str_lower_bound(G, lower_bound, stats))
+	log = '\n'.join(log)
+	res = str_res(G, delta_in, delta_out, lower_bound, stats)
+	# "userView" flag decides how to output the final results to the user
+	if userView:
+		# If True, print on screen the log and open the graphical window (one topology at a time, see "pyplot_lock")
+		layout = topology_layout(G)
+		with pyplot_lock, warnings.catch_warnings():
+			# Disable version warning (for the library "matplotlib")
+			warnings.simplefilter("ignore")
+			draw_topology(G, layout, title, withLabels)
 			print(log)
 			plt.show()
-		else:
-			# If False, save the log on and the final results on text filesand the photo of the topology as an image
-			basename = title.replace('.', '')
-			file_log = 'log/%s.txt' % (basename)
-			file_img = 'img/%s.png' % (basename)
-			try:
-				with open(file_log, 'w') as fp:
-					fp.write(log)
-			except:
-				print('ERR - I/O problems with the file "%s"' % (file_log))
-			plt.savefig(file_img, format="PNG", bbox_inches='tight')
-			# Close the graphical window, to avoid the overlap of the next one (hold)
-			plt.close()
+	else:
+		# If False, save the log on and the final results on text filesand the photo of the topology as an image
+		basename = title.replace('.', '')
+		file_log = 'log/%s.txt' % (basename)
+		file_topology = 'log/%s.npz' % (basename)
+		file_img = 'img/%s.png' % (basename)
+		try:
+			with open(file_log, 'w') as fp:
+				fp.write(log)
+		except:
+			print('ERR - I/O problems with the file "%s"' % (file_log))
+		# Binary copy of the topology and its flows, that can be loaded again (see "graph_topologies.read_topologies")
+		try:
+			with open(file_topology, 'wb') as fp:
+				gt.write_topologies(fp, [G])
+		except:
+			print('ERR - I/O problems with the file "%s"' % (file_topology))
+		render_async(G, title, withLabels, file_img)
+
+def write_results(fp, results):
+	'''
+	This function writes a list of results (see "result") into the binary file "fp", as a .npz archive: the
+	topologies with their flow values (see "graph_topologies.topologies_to_arrays"), and the computation times,
+	max flows and lower bounds of the results (float64 arrays "time", "max_flow" and "lower_bound").
+	Routing states are not written
+	'''
+	arrays = gt.topologies_to_arrays([r['topology'] for r in results])
+	for k in ('time', 'max_flow', 'lower_bound'):
+		arrays[k] = numpy.array([r[k] for r in results], dtype = numpy.float64)
+	numpy.savez(fp, **arrays)
+
+def read_results(fp, indexes = None):
+	'''
+	This function reads the results written by "write_results" into the binary file "fp" (only the ones in the
+	positions "indexes", if specified). The flow statistics are computed again, and the routing states are None
+	'''
+	with numpy.load(fp) as data:
+		if indexes is None:
+			indexes = range(len(data['time']))
+		topologies = gt.topologies_from_arrays(data, indexes)
+		times = data['time']
+		lower_bounds = data['lower_bound']
+		res = []
+		for (i, T) in zip(indexes, topologies):
+			stats = flows.flow_stats(T)
+			res.append({
+				'topology': T,
+				'time': float(times[i]),
+				'max_flow': stats['max'],
+				'flow_stats': stats,
+				'lower_bound': float(lower_bounds[i]),
+				'gap': gap(stats['max'], float(lower_bounds[i])),
+				'routing_state': None
+			})
+	return res
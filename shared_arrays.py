@@ -0,0 +1,108 @@
+import os
+import uuid
+import atexit
+import tempfile
+from collections import OrderedDict
+import numpy
+
+
+# Directory of the shared segments: a memory backed file system, if available
+SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+# Maximum number of groups of arrays kept attached by a process (see "attach")
+MAX_ATTACHED = 8
+
+# Groups of arrays created by this process, still to be removed
+owned = set()
+# Groups of arrays attached by this process, by name
+attached = OrderedDict()
+
+
+def segment_path(name, key):
+	'''
+	This function returns the path of the shared segment of the array "key" of the group "name"
+	'''
+	return os.path.join(SHARED_DIR, '%s.%s.npy' % (name, key))
+
+
+class SharedArrays(object):
+	'''
+	Group of numpy arrays placed in shared memory, as memory mapped .npy files in "SHARED_DIR": other processes
+	(e.g. the workers of a multiprocessing pool) attach them by name (see "attach"), without copying or pickling them.
+	The creating process owns the segments: they are removed by "close", at the end of a "with" block or,
+	at the latest, at the exit of the process. Processes which already attached the arrays can keep using them
+	'''
+	def __init__(self, arrays):
+		'''
+		- arrays: dictionary name -> array (e.g. {'traffic_matrix': numpy.array(traffic_matrix)} or the output of
+		  "graph_topologies.topologies_to_arrays")
+		'''
+		self.pid = os.getpid()
+		self.name = 'ltd-%d-%s' % (self.pid, uuid.uuid4().hex)
+		self.paths = []
+		owned.add(self)
+		for (key, a) in arrays.items():
+			a = numpy.ascontiguousarray(a)
+			path = segment_path(self.name, key)
+			self.paths.append(path)
+			if a.size == 0:
+				# Empty files cannot be memory mapped
+				numpy.save(path, a)
+			else:
+				m = numpy.lib.format.open_memmap(path, mode = 'w+', dtype = a.dtype, shape = a.shape)
+				m[...] = a
+				m.flush()
+				del m
+
+	def close(self):
+		'''
+		Remove the shared segments
+		'''
+		for path in self.paths:
+			if os.path.exists(path):
+				os.remove(path)
+		self.paths = []
+		owned.discard(self)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+def attach(name):
+	'''
+	This function attaches the group of shared arrays "name" (see "SharedArrays"), returning a dictionary
+	name -> read-only array. Arrays are mapped in memory, not copied; the last "MAX_ATTACHED" groups are kept
+	attached, so that the jobs of a worker process working on the same arrays attach them only once
+	'''
+	if name in attached:
+		return attached[name]
+	prefix = name + '.'
+	res = {}
+	for f in os.listdir(SHARED_DIR):
+		if f.startswith(prefix) and f.endswith('.npy'):
+			key = f[len(prefix):-len('.npy')]
+			path = os.path.join(SHARED_DIR, f)
+			try:
+				res[key] = numpy.load(path, mmap_mode = 'r')
+			except ValueError:
+				# Empty array
+				res[key] = numpy.load(path)
+	if len(res) == 0:
+		raise ValueError('the shared arrays "%s" do not exist' % (name))
+	attached[name] = res
+	while len(attached) > MAX_ATTACHED:
+		attached.popitem(last = False)
+	return res
+
+
+def close_owned():
+	'''
+	Remove the shared segments still owned by the process, at its exit (forked processes do not own them)
+	'''
+	for s in list(owned):
+		if s.pid == os.getpid():
+			s.close()
+
+atexit.register(close_owned)
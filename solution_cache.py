@@ -0,0 +1,137 @@
+import os
+import json
+import hashlib
+import numpy
+import graph_topologies as gt
+import flow_utilities as flows
+import ltd_utilities as ltd
+
+
+# Version of every cacheable algorithm: it has to be increased whenever the algorithm changes its results,
+# so that the solutions computed by the previous versions are never returned again
+ALGORITHM_VERSIONS = {
+	'mesh': 1,
+	'ring': 1,
+	'random': 1,
+	'manhattan': 1,
+	'manhattan_smart': 1
+}
+
+
+def TM_digest(traffic_matrix):
+	'''
+	This function returns the digest of the content of a traffic matrix
+	'''
+	M = numpy.asarray(traffic_matrix, dtype = numpy.float64)
+	return hashlib.sha1(str(M.shape) + M.tostring()).hexdigest()
+
+
+class SolutionCache(object):
+	'''
+	On-disk content-addressed cache of LTD solutions: a solution is identified by the algorithm (and its version,
+	see "ALGORITHM_VERSIONS"), its parameters, the digest of the traffic matrix and the seed.
+	Every solution is stored as a compressed .npz file with its topology in binary form (see "graph_topologies.topologies_to_arrays");
+	when the cache exceeds its maximum size, the least recently used solutions are removed
+	'''
+	def __init__(self, directory = 'cache', max_bytes = 256 * 2**20):
+		'''
+		- directory: directory of the cache files (created if it does not exist)
+		- max_bytes: maximum size of the cache, in bytes
+		'''
+		if not os.path.isdir(directory):
+			os.makedirs(directory)
+		self.directory = directory
+		self.max_bytes = max_bytes
+
+	def key(self, algorithm, traffic_matrix, parameters, seed = None):
+		'''
+		Content address of a solution
+		'''
+		if algorithm not in ALGORITHM_VERSIONS:
+			raise ValueError('the algorithm "%s" is not cacheable (see "ALGORITHM_VERSIONS")' % (algorithm))
+		data = [algorithm, ALGORITHM_VERSIONS[algorithm], parameters, TM_digest(traffic_matrix), seed]
+		return hashlib.sha1(json.dumps(data, sort_keys = True)).hexdigest()
+
+	def path(self, key):
+		return os.path.join(self.directory, key + '.npz')
+
+	def get(self, algorithm, traffic_matrix, parameters, seed = None):
+		'''
+		This function returns the cached solution (same data structure of "ltd.result", without the routing state),
+		None if it is not in the cache
+		'''
+		path = self.path(self.key(algorithm, traffic_matrix, parameters, seed))
+		if not os.path.exists(path):
+			return None
+		try:
+			with numpy.load(path) as data:
+				version = int(data['version'])
+				T = gt.topologies_from_arrays(data)[0]
+				t = float(data['time'])
+				lower_bound = float(data['lower_bound'])
+		except Exception:
+			# Corrupted file
+			os.remove(path)
+			return None
+		if version != ALGORITHM_VERSIONS[algorithm]:
+			os.remove(path)
+			return None
+		# Mark the solution as recently used
+		os.utime(path, None)
+		stats = flows.flow_stats(T)
+		return {
+			'topology': T,
+			'time': t,
+			'max_flow': stats['max'],
+			'flow_stats': stats,
+			'lower_bound': lower_bound,
+			'gap': ltd.gap(stats['max'], lower_bound),
+			'routing_state': None
+		}
+
+	def put(self, algorithm, traffic_matrix, parameters, res, seed = None):
+		'''
+		This function stores a solution (see "ltd.result") in the cache
+		'''
+		path = self.path(self.key(algorithm, traffic_matrix, parameters, seed))
+		arrays = gt.topologies_to_arrays([res['topology']])
+		temp = '%s.%d.tmp' % (path, os.getpid())
+		# Write a temporary file and rename it: readers never see a partial solution
+		with open(temp, 'wb') as fp:
+			numpy.savez_compressed(fp, version = ALGORITHM_VERSIONS[algorithm], time = res['time'], lower_bound = res['lower_bound'], **arrays)
+		os.rename(temp, path)
+		self.evict()
+
+	def cached(self, algorithm, traffic_matrix, parameters, solver, seed = None):
+		'''
+		This function returns the cached solution; if it is not in the cache, the solution is computed by
+		"solver" (function without arguments) and stored in the cache (unless it is None)
+		'''
+		res = self.get(algorithm, traffic_matrix, parameters, seed)
+		if res is None:
+			res = solver()
+			if res is not None:
+				self.put(algorithm, traffic_matrix, parameters, res, seed)
+		return res
+
+	def size(self):
+		'''
+		Total size of the cache, in bytes
+		'''
+		return sum(os.path.getsize(os.path.join(self.directory, f)) for f in os.listdir(self.directory) if f.endswith('.npz'))
+
+	def evict(self):
+		'''
+		Remove the least recently used solutions, until the cache size is lower than its maximum
+		'''
+		files = []
+		for f in os.listdir(self.directory):
+			if f.endswith('.npz'):
+				p = os.path.join(self.directory, f)
+				files.append((os.path.getmtime(p), os.path.getsize(p), p))
+		total = sum(x[1] for x in files)
+		for (t, size, p) in sorted(files):
+			if total <= self.max_bytes:
+				break
+			os.remove(p)
+			total -= size
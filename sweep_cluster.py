@@ -0,0 +1,500 @@
+import sys
+import os
+import time
+import json
+import socket
+import threading
+import httplib
+import SocketServer
+import BaseHTTPServer
+from collections import deque
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import graph_topologies as gt
+import ltd_utilities as ltd
+import sweep_utilities as sw
+
+
+# Seeds of the simulations of a sweep: simulation s of the cell i uses the seed "i * CELL_SEEDS + s"
+CELL_SEEDS = 1000
+
+
+def traffic_matrix(n, traffic, seed):
+	'''
+	This function returns the traffic matrix of a task (see "run_task"): the same parameters always give the same matrix.
+	It is drawn from a private random generator, so concurrent tasks (e.g. threads) do not interfere
+	'''
+	if len(traffic) == 2:
+		return tm.random_TM(n, traffic[0], traffic[1], seed)
+	return tm.random_TM_2(n, *traffic, seed = seed)
+
+def run_task(task):
+	'''
+	Single task of a distributed sweep, executed by a worker: it solves an LTD problem without any side effect
+	(see "LAB2_OpRes.solve"). The task is a dictionary with keys:
+	- "algorithm": 'mesh', 'ring', 'manhattan' or 'manhattan_smart' (see "LAB2_OpRes.solve"); 'random_mesh' or
+	  'random_ring' for a random topology with the same number of edges of the 'mesh' or 'ring' one (see "LAB2_OpRes.LTD_random")
+	- "n": number of nodes
+	- "delta": constraint on the maximum number of receivers and transmitters per node
+	- "seed": seed of the traffic matrix (and of the random topology): tasks with the same "n", "traffic" and "seed"
+	  solve the same instance
+	- "traffic": parameters of the traffic matrix, [min, max] (see "graph_traffic_matrix.random_TM") or
+	  [low_min, low_max, high_min, high_max, p] (see "graph_traffic_matrix.random_TM_2"); default [0.5, 1.5]
+	- "parameters": other parameters of the algorithm (e.g. "nr" and "nc" for the Manhattan approaches)
+	It returns the compact result of the task: its max flow (None, if a solution is not found) and computation time
+	'''
+	n = task['n']
+	delta = task['delta']
+	seed = task['seed']
+	algorithm = task['algorithm']
+	parameters = dict((str(k), v) for (k, v) in task.get('parameters', {}).items())
+	T = traffic_matrix(n, task.get('traffic', [0.5, 1.5]), seed)
+	if algorithm in ('random_mesh', 'random_ring'):
+		# Number of edges of the compared greedy topology
+		if algorithm == 'random_mesh':
+			G = L2.greedy_mesh_topology(n, T, delta, delta)
+		else:
+			G = L2.greedy_ring_topology(n, T, delta, delta)
+		initial_time = time.time()
+		res = ltd.solution(gt.random_topology(n, len(G.edges()), delta, delta, seed), T, delta, delta, initial_time)
+	else:
+		res = L2.solve(algorithm, n, T, delta, delta, **parameters)
+	if res is None:
+		return {'max_flow': None, 'time': None}
+	return {'max_flow': res['max_flow'], 'time': res['time']}
+
+
+class Coordinator(object):
+	'''
+	Coordinator of a distributed sweep: it hands out the submitted tasks (see "run_task") to the workers, and collects
+	their results. A leased task whose result does not arrive within "lease_timeout" seconds (e.g. because its worker
+	died) is queued again; if several results of the same task arrive, only the first one is kept.
+	Workers reach the coordinator over HTTP (see "coordinator_server" and "http_worker"); "DirectoryCoordinator"
+	uses a shared directory instead
+	'''
+	def __init__(self, lease_timeout = 60.0):
+		'''
+		- lease_timeout: maximum time (in seconds) given to a worker to complete a task; it has to be longer than
+		  the longest task
+		'''
+		self.lease_timeout = lease_timeout
+		self.lock = threading.Lock()
+		self.queue = deque()
+		self.tasks = {}
+		self.leases = {}
+		self.results = {}
+		self.callbacks = {}
+		self.counters = {'submitted': 0, 'leased': 0, 'requeued': 0, 'completed': 0, 'duplicates': 0}
+		self.next_id = 0
+		self.closed = False
+
+	def submit(self, task, callback = None):
+		'''
+		Queue a task, and return its identifier: "callback" (if specified) is called with the result of the task
+		'''
+		with self.lock:
+			task = dict(task, id = self.next_id)
+			self.next_id += 1
+			self.tasks[task['id']] = task
+			self.callbacks[task['id']] = callback
+			self.counters['submitted'] += 1
+			self.enqueue(task)
+		return task['id']
+
+	def enqueue(self, task):
+		self.queue.append(task['id'])
+
+	def lease(self, worker):
+		'''
+		Hand out the next queued task to "worker" (None, if no task is queued)
+		'''
+		with self.lock:
+			self.requeue_expired()
+			while len(self.queue) > 0:
+				task_id = self.queue.popleft()
+				if task_id in self.results:
+					# Completed by a late worker after being queued again
+					continue
+				self.leases[task_id] = (worker, time.time() + self.lease_timeout)
+				self.counters['leased'] += 1
+				return self.tasks[task_id]
+		return None
+
+	def complete(self, task_id, result):
+		'''
+		Store the result of a task: it returns False if the task is unknown or already completed
+		'''
+		with self.lock:
+			if task_id not in self.tasks or task_id in self.results:
+				self.counters['duplicates'] += 1
+				return False
+			self.results[task_id] = result
+			self.leases.pop(task_id, None)
+			self.counters['completed'] += 1
+			callback = self.callbacks.pop(task_id)
+		if callback is not None:
+			callback(result)
+		return True
+
+	def requeue_expired(self):
+		'''
+		Queue again the tasks whose lease has expired (the lock must be held)
+		'''
+		now = time.time()
+		for (task_id, (worker, expiry)) in list(self.leases.items()):
+			if expiry < now:
+				del self.leases[task_id]
+				self.queue.append(task_id)
+				self.counters['requeued'] += 1
+
+	def poll(self):
+		'''
+		Periodic maintenance, called by "distributed_simulations"
+		'''
+		with self.lock:
+			self.requeue_expired()
+
+	def metrics(self):
+		with self.lock:
+			res = dict(self.counters)
+			res['queued'] = len(self.queue)
+			res['leases'] = len(self.leases)
+		return res
+
+	def close(self):
+		'''
+		End of the sweep: the workers asking for a task are told to stop
+		'''
+		self.closed = True
+
+
+class DirectoryCoordinator(Coordinator):
+	'''
+	Coordinator which communicates with the workers (see "directory_worker") through a shared directory:
+	- "tasks": queued tasks, one JSON file per task; a worker leases a task moving its file into "leased"
+	- "leased": leased tasks, renamed "<id>.<worker>.json"; expired leases are moved back into "tasks"
+	- "results": results of the tasks, "<id>.<worker>.json"
+	- "done": file created at the end of the sweep
+	Files are always written as temporary files and renamed, so that they are never read partially
+	'''
+	def __init__(self, directory, lease_timeout = 60.0):
+		'''
+		- directory: shared directory (created if it does not exist; it must not contain the files of another sweep)
+		- lease_timeout: see "Coordinator"
+		'''
+		Coordinator.__init__(self, lease_timeout)
+		self.directory = directory
+		for d in ('tasks', 'leased', 'results'):
+			if not os.path.isdir(os.path.join(directory, d)):
+				os.makedirs(os.path.join(directory, d))
+		if os.path.exists(os.path.join(directory, 'done')):
+			os.remove(os.path.join(directory, 'done'))
+
+	def enqueue(self, task):
+		write_json(os.path.join(self.directory, 'tasks', '%d.json' % (task['id'])), task)
+
+	def lease(self, worker):
+		raise TypeError('the tasks of a "DirectoryCoordinator" are leased through its directory')
+
+	def poll(self):
+		'''
+		Collect the results written by the workers, and queue again the tasks whose lease has expired
+		'''
+		for f in os.listdir(os.path.join(self.directory, 'results')):
+			if not f.endswith('.json'):
+				continue
+			path = os.path.join(self.directory, 'results', f)
+			with open(path) as fp:
+				data = json.load(fp)
+			os.remove(path)
+			self.complete(data['id'], data['result'])
+			# A copy of the task queued again (its lease expired before the result arrived) must not run anymore
+			try:
+				os.remove(os.path.join(self.directory, 'tasks', '%d.json' % (data['id'])))
+			except OSError:
+				pass
+		now = time.time()
+		for f in os.listdir(os.path.join(self.directory, 'leased')):
+			path = os.path.join(self.directory, 'leased', f)
+			task_id = int(f.split('.')[0])
+			try:
+				# The lease starts when the file is renamed (change time) and touched by the worker
+				st = os.stat(path)
+			except OSError:
+				# Completed in the meantime
+				continue
+			if task_id in self.results:
+				continue
+			if max(st.st_mtime, st.st_ctime) + self.lease_timeout < now:
+				try:
+					os.rename(path, os.path.join(self.directory, 'tasks', '%d.json' % (task_id)))
+				except OSError:
+					continue
+				with self.lock:
+					self.counters['requeued'] += 1
+
+	def close(self):
+		Coordinator.close(self)
+		write_json(os.path.join(self.directory, 'done'), {})
+
+
+def write_json(path, data):
+	'''
+	This function writes "data" into the JSON file "path", through a temporary file (see "DirectoryCoordinator")
+	'''
+	temp = '%s.%s.%d.tmp' % (path, socket.gethostname(), os.getpid())
+	with open(temp, 'w') as fp:
+		json.dump(data, fp)
+	os.rename(temp, path)
+
+
+def distributed_simulations(coordinator, cells, keys, tolerance = 0.05, min_simulations = 3, max_simulations = 20, poll = 0.5):
+	'''
+	Distributed version of "sweep_utilities.adaptive_simulations", for all the cells of a sweep at once: the simulations
+	are split into tasks, handed out to the workers by the coordinator. It returns, for every cell, the statistics of its
+	metrics (dictionary metric -> "sweep_utilities.RunningStats").
+	- coordinator: "Coordinator" (with its server running) or "DirectoryCoordinator"
+	- cells: list of cells; every cell is a list of tasks without seed (see "run_task"), one per compared algorithm:
+	  a simulation of a cell solves all its tasks with the same seed. The metrics of a task are called as its key "name"
+	  (default: the algorithm), for the max flow, and "<name>_time", for the computation time
+	- keys: metrics whose 95% confidence interval decides when a cell stops (see "sweep_utilities.adaptive_simulations")
+	- tolerance, min_simulations, max_simulations: see "sweep_utilities.adaptive_simulations"
+	- poll: time (in seconds) between two maintenance calls of the coordinator
+	Simulations are added to the statistics in seed order, so the number of simulations of every cell does not depend
+	on the order of the results; a simulation with a failed task (e.g. a traffic matrix for which the mesh algorithm fails)
+	is replaced by a new one, with the next seed
+	'''
+	lock = threading.Lock()
+	finished = threading.Event()
+	states = [{'stats': {}, 'issued': 0, 'consumed': 0, 'valid': 0, 'results': {}, 'done': False} for c in cells]
+	remaining = [len(cells)]
+
+	def issue(i):
+		'''
+		Submit the tasks of the next simulation of the cell i
+		'''
+		s = states[i]['issued']
+		states[i]['issued'] += 1
+		states[i]['results'][s] = {}
+		for task in cells[i]:
+			name = task.get('name', task['algorithm'])
+			coordinator.submit(dict(task, seed = i * CELL_SEEDS + s), lambda r, i = i, s = s, name = name: collect(i, s, name, r))
+
+	def collect(i, s, name, result):
+		'''
+		Result of a task of the simulation s of the cell i
+		'''
+		with lock:
+			state = states[i]
+			if state['done']:
+				return
+			state['results'][s][name] = result
+			# Consume the completed simulations, in seed order
+			while state['consumed'] in state['results'] and len(state['results'][state['consumed']]) == len(cells[i]):
+				values = state['results'].pop(state['consumed'])
+				state['consumed'] += 1
+				if any(r['max_flow'] is None for r in values.values()):
+					continue
+				state['valid'] += 1
+				for (k, r) in values.items():
+					state['stats'].setdefault(k, sw.RunningStats()).add(r['max_flow'])
+					state['stats'].setdefault(k + '_time', sw.RunningStats()).add(r['time'])
+				if state['valid'] >= max_simulations or (state['valid'] >= min_simulations and all(state['stats'][k].converged(tolerance) for k in keys)):
+					state['done'] = True
+					break
+			if not state['done']:
+				# Keep enough simulations in progress, up to "CELL_SEEDS" attempts
+				needed = max(min_simulations - state['valid'], 1)
+				while state['issued'] - state['consumed'] < needed and state['issued'] < CELL_SEEDS:
+					issue(i)
+				if state['issued'] == state['consumed']:
+					state['done'] = True
+			if state['done']:
+				remaining[0] -= 1
+				if remaining[0] == 0:
+					finished.set()
+
+	with lock:
+		if len(cells) == 0:
+			finished.set()
+		for i in range(len(cells)):
+			for s in range(min_simulations):
+				issue(i)
+	while not finished.wait(poll):
+		coordinator.poll()
+	return [state['stats'] for state in states]
+
+
+class CoordinatorHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+	'''
+	JSON over HTTP interface of a coordinator: "POST /lease" (body {"worker": name}; answer {"task": task or null,
+	"done": boolean}), "POST /complete" (body {"id": task identifier, "result": result}) and "GET /metrics"
+	'''
+	def send_json(self, code, data):
+		body = json.dumps(data)
+		self.send_response(code)
+		self.send_header('Content-Type', 'application/json')
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def do_GET(self):
+		if self.path == '/metrics':
+			self.send_json(200, self.server.coordinator.metrics())
+		else:
+			self.send_json(404, {'error': 'unknown path "%s"' % (self.path)})
+
+	def do_POST(self):
+		coordinator = self.server.coordinator
+		try:
+			request = json.loads(self.rfile.read(int(self.headers.getheader('Content-Length', 0))))
+			assert isinstance(request, dict)
+		except Exception:
+			self.send_json(400, {'error': 'the request must be a JSON object'})
+			return
+		if self.path == '/lease':
+			task = None if coordinator.closed else coordinator.lease(request.get('worker'))
+			self.send_json(200, {'task': task, 'done': coordinator.closed})
+		elif self.path == '/complete':
+			self.send_json(200, {'ok': coordinator.complete(request.get('id'), request.get('result'))})
+		else:
+			self.send_json(404, {'error': 'unknown path "%s"' % (self.path)})
+
+	def log_message(self, format, *args):
+		pass
+
+
+class CoordinatorServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+
+def coordinator_server(coordinator, address = ('0.0.0.0', 8090)):
+	'''
+	This function creates the HTTP server of "coordinator", listening on "address", and starts it in a background thread.
+	Use "shutdown" and "server_close" to stop it
+	'''
+	server = CoordinatorServer(address, CoordinatorHandler)
+	server.coordinator = coordinator
+	t = threading.Thread(target = server.serve_forever)
+	t.daemon = True
+	t.start()
+	return server
+
+
+def worker_name():
+	return '%s-%d' % (socket.gethostname(), os.getpid())
+
+def http_worker(address, name = None, poll = 1.0):
+	'''
+	Worker of a distributed sweep: it asks the tasks to the coordinator at "address" (host, port) over HTTP, runs them
+	(see "run_task") and sends back their results, one by one. It waits for the coordinator to start, and stops when
+	the sweep is over or when the coordinator cannot be reached anymore. It returns the number of completed tasks
+	'''
+	if name is None:
+		name = worker_name()
+	completed = 0
+	connected = False
+
+	def post(path, data):
+		connection = httplib.HTTPConnection(address[0], address[1])
+		try:
+			connection.request('POST', path, json.dumps(data), {'Content-Type': 'application/json'})
+			return json.loads(connection.getresponse().read())
+		finally:
+			connection.close()
+
+	while True:
+		try:
+			answer = post('/lease', {'worker': name})
+		except (socket.error, httplib.HTTPException):
+			if connected:
+				break
+			time.sleep(poll)
+			continue
+		connected = True
+		if answer['done']:
+			break
+		task = answer['task']
+		if task is None:
+			time.sleep(poll)
+			continue
+		result = run_task(task)
+		try:
+			post('/complete', {'id': task['id'], 'result': result})
+		except (socket.error, httplib.HTTPException):
+			break
+		completed += 1
+	return completed
+
+def directory_worker(directory, name = None, poll = 1.0):
+	'''
+	Worker of a distributed sweep which communicates with the coordinator through a shared directory (see
+	"DirectoryCoordinator"). It waits for the coordinator to create the directory, stops when the sweep is over,
+	and returns the number of completed tasks
+	'''
+	if name is None:
+		name = worker_name()
+	completed = 0
+	tasks_dir = os.path.join(directory, 'tasks')
+	while not os.path.exists(os.path.join(directory, 'done')):
+		leased = None
+		if not os.path.isdir(tasks_dir):
+			time.sleep(poll)
+			continue
+		for f in sorted(os.listdir(tasks_dir), key = lambda x: int(x.split('.')[0]) if x.endswith('.json') else -1):
+			if not f.endswith('.json'):
+				continue
+			path = os.path.join(directory, 'leased', '%s.%s.json' % (f[:-len('.json')], name))
+			try:
+				# Atomic lease: only one worker can move the file
+				os.rename(os.path.join(tasks_dir, f), path)
+			except OSError:
+				continue
+			os.utime(path, None)
+			leased = path
+			break
+		if leased is None:
+			time.sleep(poll)
+			continue
+		with open(leased) as fp:
+			task = json.load(fp)
+		result = run_task(task)
+		write_json(os.path.join(directory, 'results', '%d.%s.json' % (task['id'], name)), {'id': task['id'], 'result': result})
+		try:
+			os.remove(leased)
+		except OSError:
+			# The lease expired, and the task has been queued again
+			pass
+		completed += 1
+	return completed
+
+
+def coordinator_from_args(args, lease_timeout = 60.0):
+	'''
+	This function returns the coordinator requested by the command line arguments of a sweep script (e.g. "ex01.py"):
+	"coordinator <port>" (HTTP server, see "coordinator_server") or "coordinator <shared directory>"; None otherwise
+	(the sweep runs locally)
+	'''
+	if len(args) < 2 or args[0] != 'coordinator':
+		return None
+	if args[1].isdigit():
+		coordinator = Coordinator(lease_timeout)
+		coordinator_server(coordinator, ('0.0.0.0', int(args[1])))
+	else:
+		coordinator = DirectoryCoordinator(args[1], lease_timeout)
+	return coordinator
+
+
+# Executable code (main)
+if __name__ == '__main__':
+	# Usage: python sweep_cluster.py <host>:<port> | <shared directory>
+	if len(sys.argv) < 2:
+		print('Usage: python sweep_cluster.py <host>:<port> | <shared directory>')
+		sys.exit(1)
+	if ':' in sys.argv[1] and sys.argv[1].rsplit(':', 1)[1].isdigit():
+		host, port = sys.argv[1].rsplit(':', 1)
+		completed = http_worker((host, int(port)))
+	else:
+		completed = directory_worker(sys.argv[1])
+	print('%d tasks completed' % (completed))
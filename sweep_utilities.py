@@ -0,0 +1,73 @@
+import math
+
+
+# 97.5th percentiles of the Student's t distribution, for 1...30 degrees of freedom (two-sided 95% confidence)
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131,
+	2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+class RunningStats(object):
+	'''
+	Online mean and variance of a sequence of values (Welford's algorithm)
+	'''
+	def __init__(self):
+		self.n = 0
+		self.mean = 0.0
+		self.m2 = 0.0
+
+	def add(self, x):
+		'''
+		Add the value "x" to the sequence
+		'''
+		self.n += 1
+		delta = x - self.mean
+		self.mean += delta / self.n
+		self.m2 += delta * (x - self.mean)
+
+	def variance(self):
+		'''
+		Sample variance (0, with less than two values)
+		'''
+		return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+	def half_width(self):
+		'''
+		Half width of the 95% confidence interval of the mean (infinite, with less than two values)
+		'''
+		if self.n < 2:
+			return float('inf')
+		t = T_95[self.n - 2] if self.n - 1 <= len(T_95) else 1.96
+		return t * math.sqrt(self.variance() / self.n)
+
+	def converged(self, tolerance):
+		'''
+		True if the half width of the 95% confidence interval is within "tolerance", relative to the mean
+		'''
+		return self.half_width() <= tolerance * abs(self.mean)
+
+
+def adaptive_simulations(simulation, keys, tolerance = 0.05, min_simulations = 3, max_simulations = 20, max_attempts = 1000):
+	'''
+	This function repeats a simulation until the confidence intervals of the specified metrics are narrow enough,
+	and returns the statistics of all its metrics (dictionary metric -> "RunningStats").
+	- simulation: function of the simulation number (0, 1, 2...), returning a dictionary metric -> value, or None if the
+	  simulation fails (e.g. a traffic matrix for which the mesh algorithm fails): it is then replaced by the next one
+	- keys: metrics whose 95% confidence interval decides when to stop (e.g. the max flows)
+	- tolerance: maximum half width of the confidence intervals, relative to the mean
+	- min_simulations: minimum number of simulations
+	- max_simulations: maximum number of simulations, used if the confidence intervals are still too wide
+	- max_attempts: maximum number of simulations run, failed ones included
+	Cells with little variability stop after "min_simulations", so the computation is spent on the noisy ones
+	'''
+	stats = {}
+	valid = 0
+	for s in range(max_attempts):
+		values = simulation(s)
+		if values is None:
+			continue
+		for (k, x) in values.items():
+			stats.setdefault(k, RunningStats()).add(x)
+		valid += 1
+		if valid >= max_simulations or (valid >= min_simulations and all(stats[k].converged(tolerance) for k in keys)):
+			break
+	return stats
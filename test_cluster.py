@@ -0,0 +1,98 @@
+import os
+import time
+import json
+import shutil
+import tempfile
+import threading
+import multiprocessing
+import httplib
+import sweep_cluster as scl
+
+# Coordinator over HTTP on localhost: a worker dies holding a task, which is queued again when its lease expires
+# and is completed exactly once by another worker
+print('controllo coordinatore HTTP (Coordinator, http_worker):')
+errors = 0
+
+def dead_worker(address):
+	'''
+	Worker which leases a task and then hangs, until it is killed
+	'''
+	connection = httplib.HTTPConnection(address[0], address[1])
+	connection.request('POST', '/lease', json.dumps({'worker': 'dead'}), {'Content-Type': 'application/json'})
+	connection.getresponse().read()
+	time.sleep(600)
+
+tasks = [{'algorithm': 'ring', 'n': 8, 'delta': 2, 'seed': s} for s in range(4)]
+results = {}
+lock = threading.Lock()
+def collect(i, r):
+	with lock:
+		results.setdefault(i, []).append(r)
+
+coordinator = scl.Coordinator(lease_timeout = 1.0)
+server = scl.coordinator_server(coordinator, ('127.0.0.1', 0))
+address = server.server_address
+for (i, task) in enumerate(tasks):
+	coordinator.submit(task, lambda r, i = i: collect(i, r))
+dead = multiprocessing.Process(target = dead_worker, args = (address,))
+dead.start()
+while coordinator.metrics()['leases'] == 0:
+	time.sleep(0.05)
+dead.terminate()
+dead.join()
+worker = multiprocessing.Process(target = scl.http_worker, args = (address, 'alive', 0.1))
+worker.start()
+deadline = time.time() + 60
+while len(results) < len(tasks) and time.time() < deadline:
+	coordinator.poll()
+	time.sleep(0.1)
+coordinator.close()
+worker.join()
+server.shutdown()
+server.server_close()
+m = coordinator.metrics()
+for (i, task) in enumerate(tasks):
+	if len(results.get(i, [])) != 1:
+		errors += 1
+		print('ERR - task #%d completed %d times' % (i, len(results.get(i, []))))
+	elif results[i][0]['max_flow'] != scl.run_task(dict(task, id = i))['max_flow']:
+		errors += 1
+		print('ERR - task #%d: wrong result %s' % (i, results[i][0]))
+if m['requeued'] != 1 or m['completed'] != len(tasks) or m['leases'] != 0:
+	errors += 1
+	print('ERR - metrics %s' % (m))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Coordinator through a shared directory: when the late result of a task queued again arrives, the queued copy
+# is deleted, so that the task is not run twice
+print('controllo coordinatore su directory (DirectoryCoordinator):')
+errors = 0
+directory = tempfile.mkdtemp()
+try:
+	results = {}
+	coordinator = scl.DirectoryCoordinator(directory, lease_timeout = 0.5)
+	coordinator.submit(tasks[0], lambda r: collect(0, r))
+	# Worker leasing the task and answering too late
+	leased = os.path.join(directory, 'leased', '0.late.json')
+	os.rename(os.path.join(directory, 'tasks', '0.json'), leased)
+	time.sleep(1.0)
+	coordinator.poll()
+	if not os.path.exists(os.path.join(directory, 'tasks', '0.json')):
+		errors += 1
+		print('ERR - the expired task has not been queued again')
+	scl.write_json(os.path.join(directory, 'results', '0.late.json'), {'id': 0, 'result': scl.run_task(tasks[0])})
+	coordinator.poll()
+	if len(os.listdir(os.path.join(directory, 'tasks'))) > 0:
+		errors += 1
+		print('ERR - the completed task is still queued: %s' % (os.listdir(os.path.join(directory, 'tasks'))))
+	if len(results.get(0, [])) != 1 or coordinator.metrics()['completed'] != 1:
+		errors += 1
+		print('ERR - task completed %d times' % (len(results.get(0, []))))
+	coordinator.close()
+finally:
+	shutil.rmtree(directory)
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
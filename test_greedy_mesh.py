@@ -0,0 +1,51 @@
+import os
+import random
+import tempfile
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import ltd_utilities as ltd
+import decision_trace as dt
+
+# Batched and edge-by-edge removals must give the same topology (feasible, whenever the edge-by-edge one is)
+print('controllo rimozione a blocchi (greedy_mesh_topology):')
+random.seed(0)
+errors = 0
+for i in range(300):
+	n = random.randint(6, 12)
+	delta = random.randint(2, 3)
+	T = tm.random_TM(n, 0.5, 1.5)
+	S = L2.greedy_mesh_topology(n, T, delta, delta)
+	B = L2.greedy_mesh_topology(n, T, delta, delta, batch_size = n)
+	if ltd.check_global_delta_constraints(S, delta, delta) and not ltd.check_global_delta_constraints(B, delta, delta):
+		errors += 1
+		print('ERR - instance #%d (n = %d, delta = %d): the batched topology violates the delta constraints' % (i, n, delta))
+	elif sorted(S.edges()) != sorted(B.edges()):
+		errors += 1
+		print('ERR - instance #%d (n = %d, delta = %d): batched and edge-by-edge topologies are different' % (i, n, delta))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Decision trace: its replay gives the topology of the traced run (edge by edge, batched, and ring results)
+print('controllo decision trace (decision_trace.replay):')
+random.seed(1)
+errors = 0
+path = tempfile.mktemp(suffix = '.jsonl')
+try:
+	for i in range(30):
+		n = random.randint(6, 12)
+		delta = random.randint(1, 3)
+		batch_size = random.choice([1, n])
+		T = tm.random_TM(n, 0.5, 1.5)
+		with dt.DecisionTrace(path) as log:
+			S = L2.greedy_mesh_topology(n, T, delta, delta, batch_size = batch_size, trace = log)
+		R = dt.replay(dt.read_trace(path))
+		if sorted(S.edges()) != sorted(R.edges()):
+			errors += 1
+			print('ERR - instance #%d (n = %d, delta = %d, batch_size = %d): the replayed topology is different' % (i, n, delta, batch_size))
+finally:
+	if os.path.exists(path):
+		os.remove(path)
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
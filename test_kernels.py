@@ -0,0 +1,69 @@
+import random
+import numpy
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import graph_topologies as gt
+import flow_utilities as flows
+import kernels
+
+# Water filling: the walk over the graph's attributes and the array kernel ("kernels.water_fill_arrays") give
+# bit-identical flows
+print('controllo water_fill (grafo / kernels.water_fill_arrays):')
+random.seed(0)
+errors = 0
+backend = kernels.BACKEND
+for i in range(10):
+	n = random.randint(8, 12)
+	T = tm.random_TM(n, 0.5, 1.5)
+	G = gt.unloaded_copy(L2.greedy_ring_topology(n, T, 3, 3))
+	for (u, v) in G.edges():
+		G.edge[u][v]['flow'] = random.uniform(0, 10)
+	for j in range(10):
+		s, d = random.sample(range(n), 2)
+		paths = flows.find_paths(G, s, d, 6)[0]
+		f = random.uniform(0.1, 20)
+		results = []
+		for kernels.BACKEND in ('numpy', 'numba'):
+			H = flows.water_fill(G.copy(), paths, f)
+			results.append(sorted((u, v, x['flow']) for (u, v, x) in H.edges(data = True)))
+		kernels.BACKEND = backend
+		if results[0] != results[1]:
+			errors += 1
+			print('ERR - instance #%d, demand %d->%d: the flows differ' % (i, s, d))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Backends: the 'numba' kernels (JIT compiled loops) and the NumPy ones give bit-identical results
+# (checked only if numba is installed)
+print('controllo backend numba / numpy (kernels):')
+if kernels.numba is None:
+	print('numba non installato: controllo saltato')
+else:
+	random.seed(1)
+	numpy.random.seed(1)
+	errors = 0
+	loops_water_fill = kernels.numba.njit(kernels.water_fill_loops)
+	loops_max_pair = kernels.numba.njit(kernels.max_pair_loops)
+	for i in range(200):
+		k = random.randint(1, 8)
+		lengths = [random.randint(1, 6) for j in range(k)]
+		offsets = numpy.cumsum([0] + lengths).astype(numpy.int64)
+		# Simple paths: no edge twice in the same path
+		path_edges = numpy.concatenate([numpy.random.permutation(20)[:l] for l in lengths]).astype(numpy.int64)
+		load = numpy.random.uniform(0, 10, 20)
+		f = random.uniform(0.1, 30)
+		a = load.copy()
+		b = load.copy()
+		loops_water_fill(a, path_edges, offsets, f)
+		kernels.water_fill_numpy(b, path_edges, offsets, f)
+		if not numpy.array_equal(a, b):
+			errors += 1
+			print('ERR - water filling #%d: the loads differ' % (i))
+		M = numpy.random.randint(0, 5, (7, 9)).astype(float)
+		if tuple(loops_max_pair(M)) != tuple(kernels.max_pair_numpy(M)):
+			errors += 1
+			print('ERR - max pair #%d: %s, %s' % (i, loops_max_pair(M), kernels.max_pair_numpy(M)))
+	print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
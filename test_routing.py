@@ -0,0 +1,50 @@
+import random
+import networkx as nx
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import graph_topologies as gt
+import flow_utilities as flows
+
+# "route_many" must give the same flows of a separate routing of every traffic matrix
+print('controllo route_many:')
+random.seed(0)
+errors = 0
+for routing in ('water_fill', 'ecmp'):
+	for i in range(5):
+		n = random.randint(6, 10)
+		delta = random.randint(2, 3)
+		TMs = [tm.random_TM(n, 0.5, 1.5) for j in range(4)]
+		T = L2.greedy_ring_topology(n, TMs[0], delta, delta)
+		edges, loads = flows.route_many(T, TMs, routing)
+		for (j, TM) in enumerate(TMs):
+			G = flows.route(gt.unloaded_copy(T), TM, routing)
+			difference = max(abs(loads[j][k] - G.edge[u][v]['flow']) for (k, (u, v)) in enumerate(edges))
+			if difference > 1e-9:
+				errors += 1
+				print('ERR - %s, instance #%d, traffic matrix #%d: flows differ by %g' % (routing, i, j, difference))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Link failures: the flows are restored exactly after every failure, so the result does not depend on the order
+# of evaluation of the edges: sequential, parallel and fresh-copy evaluations give the same values
+print('controllo link_failure_analysis:')
+random.seed(1)
+errors = 0
+for i in range(3):
+	n = random.randint(8, 10)
+	TM = tm.random_TM(n, 0.5, 1.5)
+	res = L2.solve('ring', n, TM, 3, 3)
+	serial = L2.link_failure_analysis(res, TM)
+	parallel = L2.link_failure_analysis(res, TM, processes = 3)
+	for e in res['topology'].edges():
+		S = nx.DiGraph(res['topology'])
+		state = flows.copy_routing_state(res['routing_state'])
+		update = flows.update_routing(S, state, TM, removed = [e], skip_disconnected = True)
+		fresh = (flows.max_flow(S)[0], update['disconnected'])
+		if (serial[e]['max_flow'], serial[e]['disconnected']) != fresh or parallel[e] != serial[e]:
+			errors += 1
+			print('ERR - instance #%d, edge %s: %s (sequential), %s (parallel), %s (fresh copy)' % (i, e, serial[e], parallel[e], fresh))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
@@ -0,0 +1,41 @@
+import random
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import ltd_service as service
+
+# Solve service: the queued requests are dispatched in batches, each request gets the answer of "LAB2_OpRes.solve",
+# and a repeated request reuses the answer of the completed one
+print('controllo servizio (SolveService):')
+random.seed(0)
+errors = 0
+requests = []
+for i in range(6):
+	n = 8
+	T = tm.random_TM(n, 0.5, 1.5)
+	requests.append({'approach': 'ring', 'traffic_matrix': T, 'delta_in': 2, 'delta_out': 2})
+requests.append({'approach': 'ring', 'traffic_matrix': [[0, 1], [1, 0]], 'delta_in': 0, 'delta_out': 2})
+s = service.SolveService(processes = 2)
+jobs = [s.submit(r) for r in requests]
+for (i, job) in enumerate(jobs):
+	job.done.wait()
+	r = requests[i]
+	if i == len(requests) - 1:
+		if job.error is None:
+			errors += 1
+			print('ERR - request #%d: the invalid request has no error' % (i))
+		continue
+	res = L2.solve(r['approach'], len(r['traffic_matrix']), r['traffic_matrix'], r['delta_in'], r['delta_out'])
+	if job.error is not None or abs(job.result['max_flow'] - res['max_flow']) > 1e-9:
+		errors += 1
+		print('ERR - request #%d: answer %s, max flow %f expected' % (i, job.result if job.error is None else job.error, res['max_flow']))
+answer = s.solve(requests[0])
+m = s.metrics()
+if 'result' not in answer or m['reused'] != 1:
+	errors += 1
+	print('ERR - the repeated request has not reused the completed answer (reused %d)' % (m['reused']))
+if m['batches'] >= len(requests):
+	errors += 1
+	print('ERR - %d requests dispatched in %d batches' % (len(requests), m['batches']))
+s.close()
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
@@ -0,0 +1,74 @@
+import os
+import sys
+import subprocess
+import multiprocessing
+import numpy
+import shared_arrays as sa
+
+
+def worker_sum(name):
+	'''
+	Job of a pool worker: it attaches the shared arrays and returns their sums
+	'''
+	arrays = sa.attach(name)
+	return dict((k, float(a.sum())) for (k, a) in arrays.items())
+
+def segments(name):
+	return [f for f in os.listdir(sa.SHARED_DIR) if f.startswith(name + '.')]
+
+
+# Shared arrays: other processes attach them with the same content, and the segments are removed by "close"
+# (or at the exit of the owner process)
+print('controllo shared arrays (SharedArrays, attach):')
+errors = 0
+numpy.random.seed(0)
+arrays = {
+	'traffic_matrix': numpy.random.uniform(0.5, 1.5, (7, 7)),
+	'edges': numpy.array([[0, 1], [1, 2], [2, 0]], dtype = numpy.int32),
+	'empty': numpy.zeros(0)
+}
+with sa.SharedArrays(arrays) as shared:
+	attached = sa.attach(shared.name)
+	for (k, a) in arrays.items():
+		if k not in attached or attached[k].dtype != a.dtype or not numpy.array_equal(attached[k], a):
+			errors += 1
+			print('ERR - the attached array "%s" differs from the shared one' % (k))
+	try:
+		attached['traffic_matrix'][0, 0] = 0.0
+		errors += 1
+		print('ERR - the attached arrays are writable')
+	except ValueError:
+		pass
+	pool = multiprocessing.Pool(2)
+	try:
+		sums = pool.map(worker_sum, [shared.name] * 4)
+	finally:
+		pool.close()
+		pool.join()
+	expected = dict((k, float(a.sum())) for (k, a) in arrays.items())
+	if any(s != expected for s in sums):
+		errors += 1
+		print('ERR - the workers see different arrays: %s' % (sums))
+	name = shared.name
+if len(segments(name)) > 0:
+	errors += 1
+	print('ERR - segments not removed by "close": %s' % (segments(name)))
+# Arrays already attached can still be used
+if float(attached['traffic_matrix'].sum()) != expected['traffic_matrix']:
+	errors += 1
+	print('ERR - the attached arrays changed after "close"')
+sa.attached.clear()
+try:
+	sa.attach(name)
+	errors += 1
+	print('ERR - removed arrays can be attached')
+except ValueError:
+	pass
+# Process creating shared arrays without removing them
+owner = 'import numpy, shared_arrays as sa; print(sa.SharedArrays({"x": numpy.arange(5.0)}).name)'
+name = subprocess.check_output([sys.executable, '-c', owner], cwd = os.path.dirname(os.path.abspath(sa.__file__))).strip()
+if len(segments(name)) > 0:
+	errors += 1
+	print('ERR - segments not removed at the exit of the owner process: %s' % (segments(name)))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
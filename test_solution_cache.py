@@ -0,0 +1,74 @@
+import os
+import time
+import random
+import shutil
+import tempfile
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import solution_cache as sc
+
+random.seed(0)
+directory = tempfile.mkdtemp()
+try:
+	TMs = [tm.random_TM(10, 0.5, 1.5) for i in range(4)]
+	solutions = [L2.solve('ring', 10, T, 2, 2) for T in TMs[:3]]
+	parameters = {'delta_in': 2, 'delta_out': 2}
+
+	# A stored solution is returned with the same topology and max flow; a solution of an older version of the
+	# algorithm is never returned
+	print('controllo cache (get / put, versioni):')
+	errors = 0
+	cache = sc.SolutionCache(directory)
+	cache.put('ring', TMs[0], parameters, solutions[0])
+	res = cache.get('ring', TMs[0], parameters)
+	if res is None or sorted(res['topology'].edges()) != sorted(solutions[0]['topology'].edges()) or abs(res['max_flow'] - solutions[0]['max_flow']) > 1e-9:
+		errors += 1
+		print('ERR - the cached solution differs from the stored one')
+	if cache.get('ring', TMs[1], parameters) is not None or cache.get('ring', TMs[0], {'delta_in': 3, 'delta_out': 3}) is not None:
+		errors += 1
+		print('ERR - a solution of another problem is returned')
+	sc.ALGORITHM_VERSIONS['ring'] += 1
+	try:
+		if cache.get('ring', TMs[0], parameters) is not None:
+			errors += 1
+			print('ERR - a solution of the previous version of the algorithm is returned')
+	finally:
+		sc.ALGORITHM_VERSIONS['ring'] -= 1
+	# The version saved in the file is checked too
+	path = cache.path(cache.key('ring', TMs[0], parameters))
+	sc.ALGORITHM_VERSIONS['ring'] += 1
+	try:
+		cache.put('ring', TMs[0], parameters, solutions[0])
+		os.rename(cache.path(cache.key('ring', TMs[0], parameters)), path)
+	finally:
+		sc.ALGORITHM_VERSIONS['ring'] -= 1
+	if cache.get('ring', TMs[0], parameters) is not None or os.path.exists(path):
+		errors += 1
+		print('ERR - a file of another version of the algorithm is returned')
+	print('ok' if errors == 0 else '%d errors' % (errors))
+	print('END')
+
+
+
+	# When the cache exceeds its maximum size, the least recently used solutions are removed
+	print('controllo cache (eviction):')
+	errors = 0
+	shutil.rmtree(directory)
+	cache = sc.SolutionCache(directory)
+	for i in range(3):
+		cache.put('ring', TMs[i], parameters, solutions[i])
+		os.utime(cache.path(cache.key('ring', TMs[i], parameters)), (time.time() - 100 + i, time.time() - 100 + i))
+	size = cache.size()
+	# Use the oldest solution: the second one becomes the least recently used
+	cache.get('ring', TMs[0], parameters)
+	cache.max_bytes = size
+	# Same file size of the second solution: only one solution has to be removed
+	cache.put('ring', TMs[3], parameters, solutions[1])
+	present = [cache.get('ring', T, parameters) is not None for T in TMs]
+	if present != [True, False, True, True] or cache.size() > cache.max_bytes:
+		errors += 1
+		print('ERR - cached solutions after the eviction: %s (size %d, max %d)' % (present, cache.size(), cache.max_bytes))
+	print('ok' if errors == 0 else '%d errors' % (errors))
+	print('END')
+finally:
+	shutil.rmtree(directory, ignore_errors = True)
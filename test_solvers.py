@@ -0,0 +1,162 @@
+import time
+import pickle
+import random
+import networkx as nx
+import LAB2_OpRes as L2
+import graph_traffic_matrix as tm
+import ltd_utilities as ltd
+
+# Simulated annealing: the result satisfies the delta constraints and, within a budget of 100 moves, it improves the
+# starting topology (by default, the "greedy_LTD_ring" one)
+print('controllo simulated annealing (LTD_simulated_annealing):')
+errors = 0
+for seed in range(6):
+	random.seed(seed)
+	n = 10
+	delta = 2 + seed % 2
+	T = tm.random_TM(n, 0.5, 1.5)
+	start = L2.greedy_LTD_ring(n, T, delta, delta, userView = False, withLabels = False)
+	res = L2.LTD_simulated_annealing(n, T, delta, delta, max_iterations = 100, max_time = 600.0, userView = False, withLabels = False)
+	if res is None or not ltd.check_global_delta_constraints(res['topology'], delta, delta):
+		errors += 1
+		print('ERR - seed %d (delta = %d): the result violates the delta constraints' % (seed, delta))
+	elif res['max_flow'] >= start['max_flow']:
+		errors += 1
+		print('ERR - seed %d (delta = %d): max flow %f, not better than the starting one (%f)' % (seed, delta, res['max_flow'], start['max_flow']))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Warm start: on slightly changed traffic matrices, it takes less time than a solution from scratch and it changes
+# only a few edges (at most 4 per swap, with the default "max_swaps" = 2)
+print('controllo warm start (LTD_warm_start):')
+random.seed(11)
+errors = 0
+n = 14
+delta = 3
+T = tm.random_TM(n, 0.5, 1.5)
+previous = L2.greedy_LTD_mesh(n, T, delta, delta, userView = False, withLabels = False)
+cold_time = 0.0
+warm_time = 0.0
+for step in range(4):
+	T = [[x * random.uniform(0.95, 1.05) for x in row] for row in T]
+	initial_time = time.time()
+	L2.greedy_LTD_mesh(n, T, delta, delta, userView = False, withLabels = False)
+	cold_time += time.time() - initial_time
+	initial_time = time.time()
+	res = L2.LTD_warm_start(previous, T, delta, delta, userView = False, withLabels = False)
+	warm_time += time.time() - initial_time
+	if res is None or not ltd.check_global_delta_constraints(res['topology'], delta, delta):
+		errors += 1
+		print('ERR - step %d: the result violates the delta constraints' % (step))
+		break
+	if res['edge_changes'] > 8:
+		errors += 1
+		print('ERR - step %d: %d edges changed' % (step, res['edge_changes']))
+	previous = res
+if warm_time >= cold_time:
+	errors += 1
+	print('ERR - warm start time %f s, not lower than the time from scratch (%f s)' % (warm_time, cold_time))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Manhattan placement refinement: it is kept only if it lowers the max flow, so the result is never worse than the
+# greedy placement
+print('controllo raffinamento Manhattan (manhattan_smart_topology):')
+errors = 0
+for seed in range(4):
+	random.seed(seed)
+	T = tm.random_TM(16, 0.5, 1.5)
+	greedy = L2.solve('manhattan_smart', 16, T, 4, 4, nr = 4, nc = 4)
+	refined = L2.solve('manhattan_smart', 16, T, 4, 4, nr = 4, nc = 4, refine_iterations = 500)
+	if refined['max_flow'] > greedy['max_flow'] + 1e-9:
+		errors += 1
+		print('ERR - seed %d: max flow %f with the refinement, %f without it' % (seed, refined['max_flow'], greedy['max_flow']))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Side-effect free API: the result of "solve" is frozen (dictionary, flow statistics and topology), it survives
+# pickling, and it has the same max flow of the corresponding LTD function
+print('controllo solve (risultato congelato):')
+errors = 0
+random.seed(3)
+n = 10
+T = tm.random_TM(n, 0.5, 1.5)
+res = L2.solve('ring', n, T, 2, 2)
+attempts = [
+	('result', lambda: res.__setitem__('max_flow', 0.0)),
+	('result', lambda: res.update({'max_flow': 0.0})),
+	('result', lambda: res.pop('topology')),
+	('flow statistics', lambda: res['flow_stats'].__setitem__('max', 0.0)),
+	('topology', lambda: res['topology'].add_edge(0, 5, flow = 0.0)),
+	('topology', lambda: res['topology'].remove_edge(*res['topology'].edges()[0]))
+]
+for (what, attempt) in attempts:
+	try:
+		attempt()
+		errors += 1
+		print('ERR - the %s can be modified' % (what))
+	except (TypeError, nx.NetworkXError):
+		pass
+copy = pickle.loads(pickle.dumps(res))
+if not isinstance(copy, ltd.Solution) or copy['max_flow'] != res['max_flow']:
+	errors += 1
+	print('ERR - the pickled result is different')
+start = L2.greedy_LTD_ring(n, T, 2, 2, userView = False, withLabels = False)
+if res['max_flow'] != start['max_flow'] or sorted(res['topology'].edges()) != sorted(start['topology'].edges()):
+	errors += 1
+	print('ERR - max flow %f, %f expected' % (res['max_flow'], start['max_flow']))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Local search: the result satisfies the delta constraints and it is never worse than the starting topology
+print('controllo local search (LTD_local_search):')
+errors = 0
+for seed in range(4):
+	random.seed(seed)
+	n = 10
+	delta = 2 + seed % 2
+	T = tm.random_TM(n, 0.5, 1.5)
+	for start in (L2.greedy_LTD_mesh(n, T, delta, delta, userView = False, withLabels = False), L2.greedy_LTD_ring(n, T, delta, delta, userView = False, withLabels = False)):
+		if start is None:
+			continue
+		res = L2.LTD_local_search(start['topology'], T, delta, delta, max_iterations = 50, max_time = 600.0, userView = False, withLabels = False)
+		if res is None or not ltd.check_global_delta_constraints(res['topology'], delta, delta):
+			errors += 1
+			print('ERR - seed %d (delta = %d): the result violates the delta constraints' % (seed, delta))
+		elif res['max_flow'] > start['max_flow'] + 1e-9:
+			errors += 1
+			print('ERR - seed %d (delta = %d): max flow %f, worse than the starting one (%f)' % (seed, delta, res['max_flow'], start['max_flow']))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Warm start: the swap search never makes the result worse than the updated previous topology (the result
+# without any search), and the result satisfies the delta constraints
+print('controllo warm start (ricerca mai peggiorativa):')
+errors = 0
+for seed in range(4):
+	random.seed(seed)
+	n = 10
+	delta = 2 + seed % 2
+	T = tm.random_TM(n, 0.5, 1.5)
+	previous = L2.greedy_LTD_ring(n, T, delta, delta, userView = False, withLabels = False)
+	T = [[x * random.uniform(0.8, 1.2) for x in row] for row in T]
+	start = L2.LTD_warm_start(previous, T, delta, delta, max_iterations = 0, userView = False, withLabels = False)
+	res = L2.LTD_warm_start(previous, T, delta, delta, max_iterations = 50, max_time = 600.0, max_swaps = None, userView = False, withLabels = False)
+	if res is None or not ltd.check_global_delta_constraints(res['topology'], delta, delta):
+		errors += 1
+		print('ERR - seed %d (delta = %d): the result violates the delta constraints' % (seed, delta))
+	elif res['max_flow'] > start['max_flow'] + 1e-9:
+		errors += 1
+		print('ERR - seed %d (delta = %d): max flow %f, worse than the one without search (%f)' % (seed, delta, res['max_flow'], start['max_flow']))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
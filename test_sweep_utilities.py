@@ -0,0 +1,48 @@
+import random
+import numpy
+import sweep_utilities as sw
+
+# Running statistics: same mean and sample variance of the ones computed on the whole sequence, also when the values
+# have a large offset (where the one-pass sum of squares loses all the digits of the variance)
+print('controllo statistiche (RunningStats):')
+random.seed(0)
+errors = 0
+for i in range(50):
+	offset = random.choice([0.0, 1e3, 1e9])
+	values = [offset + random.gauss(0, 1) for j in range(random.randint(2, 200))]
+	stats = sw.RunningStats()
+	for x in values:
+		stats.add(x)
+	mean = numpy.mean(values)
+	variance = numpy.var(numpy.array(values) - mean, ddof = 1)
+	if stats.n != len(values) or abs(stats.mean - mean) > 1e-9 * max(1.0, abs(mean)) or abs(stats.variance() - variance) > 1e-6 * variance:
+		errors += 1
+		print('ERR - sequence #%d (offset %g): mean %r, variance %r; expected %r, %r' % (i, offset, stats.mean, stats.variance(), mean, variance))
+stats = sw.RunningStats()
+stats.add(3.0)
+if stats.variance() != 0.0 or stats.half_width() != float('inf') or stats.converged(0.05):
+	errors += 1
+	print('ERR - a single value has variance %r and half width %r' % (stats.variance(), stats.half_width()))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')
+
+
+
+# Adaptive simulations: a constant metric stops after "min_simulations", a noisy one after "max_simulations",
+# and the failed simulations are replaced
+print('controllo simulazioni adattive (adaptive_simulations):')
+errors = 0
+stats = sw.adaptive_simulations(lambda s: {'x': 1.0}, ['x'], min_simulations = 3, max_simulations = 20)
+if stats['x'].n != 3:
+	errors += 1
+	print('ERR - constant metric: %d simulations' % (stats['x'].n))
+stats = sw.adaptive_simulations(lambda s: {'x': float(s % 2) * 100 + 1}, ['x'], min_simulations = 3, max_simulations = 20)
+if stats['x'].n != 20:
+	errors += 1
+	print('ERR - noisy metric: %d simulations' % (stats['x'].n))
+stats = sw.adaptive_simulations(lambda s: None if s % 2 == 0 else {'x': 1.0}, ['x'], min_simulations = 3, max_simulations = 20)
+if stats['x'].n != 3:
+	errors += 1
+	print('ERR - failed simulations: %d valid simulations' % (stats['x'].n))
+print('ok' if errors == 0 else '%d errors' % (errors))
+print('END')